@@ -0,0 +1,315 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter, namedtuple
+from pathlib import PurePosixPath
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, BadZipFile, ZipFile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from converter.sniffing import FormatMismatch, resolve_source_format, sniff_file
+from converter.storage import JobStorage, free_input_file_name, input_file_name, input_upload_to
+
+READ_BLOCK_SIZE = 64 * 1024
+# Nom du bilan ajouté à la fin de l'archive (statut de chaque fichier)
+STATUS_MEMBER = "batch_status.json"
+# Sorties déjà compressées : stockées telles quelles dans l'archive
+COMPRESSED_FORMATS = ["png", "jpeg", "jpg", "gif", "webp", "pdf", "zip", "docx", "xlsx", "pptx", "odt", "odp"]
+
+# Un fichier du lot : chemin de stockage, format, empreinte, taille, durée d'écriture et,
+# pour un fichier d'archive non reconnu, l'erreur (le format est alors None)
+BatchItem = namedtuple("BatchItem", ["storage_name", "source_format", "sha256", "size", "write_time", "error"])
+
+
+class BatchError(Exception):
+    """Lot refusé (archive invalide, trop de fichiers), avec le code HTTP à renvoyer."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_max_files():
+    """Nombre maximal de fichiers dans un lot (archives décompressées comprises)."""
+    return getattr(settings, "CONVERTER_BATCH_MAX_FILES", 1000)
+
+
+def get_poll_interval():
+    """Intervalle entre deux vérifications des conversions du lot pendant le téléchargement."""
+    return getattr(settings, "CONVERTER_BATCH_POLL_INTERVAL", 0.5)
+
+
+def get_wait_timeout():
+    """Durée maximale d'attente des conversions en cours pendant le téléchargement."""
+    return getattr(settings, "CONVERTER_BATCH_WAIT_TIMEOUT", 3600)
+
+
+def expand_uploads(handler, input_files):
+    """
+    Liste les fichiers du lot : les fichiers envoyés, et le contenu des archives
+    ZIP, extraites dans le répertoire du lot (l'archive est ensuite supprimée).
+
+    Raises:
+        BatchError: archive illisible, lot trop volumineux ou trop nombreux.
+    """
+    items = []
+    extracted = 0
+    for input_file in input_files:
+        if input_file.source_format != "zip":
+            items.append(BatchItem(input_file.storage_name, input_file.source_format, input_file.sha256,
+                                   input_file.size, input_file.write_time, None))
+            continue
+        archive_path = os.path.join(settings.MEDIA_ROOT, input_file.storage_name)
+        try:
+            for item in extract_archive(handler, archive_path):
+                extracted += item.size
+                items.append(item)
+                _check_limits(items, extracted)
+        except BadZipFile as e:
+            raise BatchError(f"Invalid archive {os.path.basename(archive_path)}: {e}")
+        finally:
+            os.remove(archive_path)
+    if len(items) > get_max_files():
+        raise BatchError(f"Too many files (maximum {get_max_files()})", 413)
+    return items
+
+
+def _check_limits(items, extracted):
+    max_size = getattr(settings, "CONVERTER_UPLOAD_MAX_SIZE", None)
+    if max_size and extracted > max_size:
+        raise BatchError(f"Archive too large once extracted (maximum {max_size} bytes)", 413)
+    if len(items) > get_max_files():
+        raise BatchError(f"Too many files (maximum {get_max_files()})", 413)
+
+
+def extract_archive(job, archive_path):
+    """
+    Extrait une archive ZIP dans le répertoire du job (uploads/<token>/) en
+    conservant son arborescence, et reconnaît le format de chaque fichier.
+
+    Les chemins absolus ou remontant au-dessus de l'archive sont ramenés dans
+    le répertoire du job ; les fichiers cachés et les métadonnées macOS sont
+    ignorés. Un fichier non reconnu est retourné avec son erreur, sans format.
+    """
+    from converter.models import Conversion
+
+    max_length = Conversion._meta.get_field("input_file").max_length
+    storage = JobStorage()
+    with ZipFile(archive_path) as archive:
+        for member in archive.infolist():
+            parts = [part for part in PurePosixPath(member.filename.replace("\\", "/")).parts if part not in ("/", "..")]
+            if member.is_dir() or not parts or parts[0] == "__MACOSX" or any(part.startswith(".") for part in parts):
+                continue
+            storage_name = input_upload_to(job, "/".join(storage.get_valid_name(part) for part in parts))
+            if len(storage_name) > max_length:
+                storage_name = input_file_name(job, parts[-1], max_length)
+            path = os.path.join(settings.MEDIA_ROOT, storage_name)
+            if os.path.exists(path):
+                # Deux fichiers du même nom (l'un à la racine, l'autre raccourci)
+                storage_name = free_input_file_name(job, parts[-1], max_length)
+                path = os.path.join(settings.MEDIA_ROOT, storage_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            digest = hashlib.sha256()
+            size = 0
+            started = time.perf_counter()
+            # Taille réelle comptée pendant l'écriture : celle annoncée par l'archive n'est pas fiable
+            with archive.open(member) as source, open(path, "wb") as destination:
+                while block := source.read(READ_BLOCK_SIZE):
+                    destination.write(block)
+                    digest.update(block)
+                    size += len(block)
+            write_time = time.perf_counter() - started
+
+            try:
+                source_format, error = resolve_source_format(parts[-1], sniff_file(path)), None
+            except FormatMismatch as e:
+                source_format, error = None, str(e)
+            yield BatchItem(storage_name, source_format, digest.hexdigest(), size, write_time, error)
+
+
+def check_batch_admission(items, target_format):
+    """Vérifie que les voies concernées peuvent accueillir toutes les conversions du lot (lève LaneFull)."""
+    from converter.scheduler import check_admission
+
+    for source_format, count in Counter(item.source_format for item in items if item.source_format).items():
+        check_admission(source_format, target_format, count=count)
+
+
+def create_batch(token, items, target_format, options):
+    """
+    Crée le lot et une conversion par fichier. Un fichier non reconnu donne
+    directement une conversion en échec, qui figure dans le bilan du lot.
+    """
+    from converter.models import Conversion, ConversionBatch, ConversionStage
+
+    with transaction.atomic():
+        batch = ConversionBatch.objects.create(token=token, target_format=target_format, options=options)
+        conversions = []
+        for item in items:
+            conversion = Conversion(
+                batch=batch,
+                source_format=item.source_format or _extension(item.storage_name),
+                target_format=target_format,
+                options=dict(options),
+                input_sha256=item.sha256,
+            )
+            conversion.input_file.name = item.storage_name
+            if item.error:
+                conversion.status = Conversion.Status.FAILED
+                conversion.error_message = item.error[:255]
+                conversion.finished_at = conversion.last_accessed_at = timezone.now()
+                conversion.input_size = item.size
+            conversions.append(conversion)
+        Conversion.objects.bulk_create(conversions)
+        ConversionStage.objects.bulk_create([
+            ConversionStage(conversion=conversion, name="upload_write", duration=item.write_time,
+                            bytes_in=item.size, bytes_out=item.size)
+            for conversion, item in zip(conversions, items)
+        ])
+    return batch, [conversion for conversion in conversions if conversion.status == Conversion.Status.QUEUED]
+
+
+def _extension(storage_name):
+    return os.path.splitext(storage_name)[1].lstrip(".").lower()[:10]
+
+
+def item_name(batch, conversion):
+    """
+    Nom d'un fichier du lot : son chemin dans l'envoi (arborescence des archives
+    comprise), ou le nom du résultat une fois le fichier envoyé supprimé par la
+    rétention.
+    """
+    prefix = input_upload_to(batch, "")
+    name = conversion.input_file.name or (conversion.output_file.name if conversion.output_file else "")
+    if not name:
+        return str(conversion.token)
+    return name[len(prefix):] if name.startswith(prefix) else os.path.basename(name)
+
+
+def batch_status_payload(batch):
+    """Construit la réponse JSON décrivant l'état d'un lot et de chacun de ses fichiers."""
+    from converter.models import Conversion
+
+    conversions = list(batch.conversions.order_by("pk"))
+    counts = Counter(conversion.status for conversion in conversions)
+    succeeded = counts[Conversion.Status.SUCCEEDED] + counts[Conversion.Status.CACHED]
+    pending = counts[Conversion.Status.QUEUED] + counts[Conversion.Status.RUNNING]
+    if pending:
+        status = Conversion.Status.QUEUED if counts[Conversion.Status.QUEUED] == len(conversions) else Conversion.Status.RUNNING
+    elif succeeded == len(conversions):
+        status = Conversion.Status.SUCCEEDED
+    elif succeeded:
+        status = "partial"
+    elif counts[Conversion.Status.EXPIRED]:
+        status = Conversion.Status.EXPIRED
+    else:
+        status = Conversion.Status.FAILED
+
+    items = []
+    for conversion in conversions:
+        item = {"name": item_name(batch, conversion), "status": conversion.status}
+        if conversion.status == Conversion.Status.FAILED:
+            item["message"] = conversion.error_message or "Conversion failed"
+        elif conversion.status == Conversion.Status.EXPIRED:
+            item["message"] = "Conversion result expired"
+        items.append(item)
+    return {
+        "status": status,
+        "token": str(batch.token),
+        "target_format": batch.target_format,
+        "total": len(conversions),
+        "pending": pending,
+        "succeeded": succeeded,
+        "failed": counts[Conversion.Status.FAILED],
+        "expired": counts[Conversion.Status.EXPIRED],
+        "status_url": f"/converter/batch/{batch.token}/",
+        "download_url": f"/converter/batch/{batch.token}/download/",
+        "items": items,
+    }
+
+
+class _ZipStream:
+    """Destination non positionnable d'un ZipFile : les octets écrits sont repris par le générateur."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _member_name(batch, conversion, names):
+    """Nom du résultat dans l'archive : chemin du fichier envoyé, extension de la sortie, sans doublon."""
+    root = os.path.splitext(item_name(batch, conversion))[0]
+    extension = os.path.splitext(conversion.output_file.name)[1]
+    name = root + extension
+    index = 2
+    while name in names:
+        name = f"{root}-{index}{extension}"
+        index += 1
+    names.add(name)
+    return name
+
+
+def stream_batch_archive(batch, poll_interval=None, timeout=None):
+    """
+    Produit l'archive ZIP des résultats d'un lot, morceau par morceau, dans
+    l'ordre où les conversions se terminent : un résultat est envoyé dès qu'il
+    est prêt, pendant que les workers traitent les suivants.
+
+    L'archive se termine par un bilan (STATUS_MEMBER) donnant le statut de
+    chaque fichier ; les conversions encore en cours après `timeout` secondes
+    y figurent comme telles.
+    """
+    from converter.models import Conversion
+
+    poll_interval = get_poll_interval() if poll_interval is None else poll_interval
+    deadline = time.monotonic() + (get_wait_timeout() if timeout is None else timeout)
+    pending_statuses = [Conversion.Status.QUEUED, Conversion.Status.RUNNING]
+    stream = _ZipStream()
+    sent = set()
+    names = set()
+
+    with ZipFile(stream, "w") as archive:
+        while True:
+            finished = batch.conversions.exclude(status__in=pending_statuses).exclude(pk__in=sent).order_by("pk")
+            for conversion in finished:
+                sent.add(conversion.pk)
+                if not conversion.converted or not conversion.output_file:
+                    continue
+                path = conversion.output_file.path
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                name = _member_name(batch, conversion, names)
+                compression = ZIP_STORED if _extension(name) in COMPRESSED_FORMATS else ZIP_DEFLATED
+                archive.compression = compression
+                with open(path, "rb") as source, archive.open(name, "w", force_zip64=size >= ZIP64_LIMIT) as member:
+                    while block := source.read(READ_BLOCK_SIZE):
+                        member.write(block)
+                        if stream.chunks:
+                            yield stream.drain()
+                # Descripteur de données écrit à la fermeture du membre
+                yield stream.drain()
+
+            if not batch.conversions.filter(status__in=pending_statuses).exists() or time.monotonic() >= deadline:
+                break
+            time.sleep(poll_interval)
+
+        archive.compression = ZIP_DEFLATED
+        archive.writestr(STATUS_MEMBER, json.dumps(batch_status_payload(batch), indent=2))
+    yield stream.drain()
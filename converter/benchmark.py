@@ -0,0 +1,247 @@
+import csv
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from converter.converters import route_conversion
+from converter.fixtures import FIXTURE_SIZES, create_fake_file
+from converter.formats import image_formats, writer_formats, table_formats, slide_formats, pdf_format
+from converter.utils import normalize_format
+
+ALL_FORMATS = image_formats + writer_formats + table_formats + slide_formats + pdf_format
+
+RESULT_FIELDS = [
+    "source_format",
+    "target_format",
+    "size",
+    "engine",
+    "status",
+    "wall_time",
+    "cpu_time",
+    "peak_rss_kb",
+    "input_bytes",
+    "output_bytes",
+    "throughput_mb_s",
+    "error",
+]
+
+# Métriques comparées avec la référence
+COMPARED_METRICS = ["wall_time", "cpu_time", "peak_rss_kb", "output_bytes"]
+MIN_COMPARED_TIME = 0.01
+MEGABYTE = 1024 * 1024
+
+
+def _cpu_time():
+    """Temps CPU consommé par le processus et ses enfants (soffice, pdftoppm...)."""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_kb():
+    """Pic de mémoire résidente du processus et de ses enfants, en kilo-octets."""
+    if resource is None:
+        return 0
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    peak = max(own, children)
+    # ru_maxrss est en octets sur macOS et en kilo-octets sur Linux
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def measure_conversion(input_path, source_format, target_format, options=None):
+    """
+    Exécute une conversion et mesure temps réel, temps CPU, pic de mémoire et
+    taille de sortie. Appelée dans un processus dédié pour isoler le pic RSS.
+    """
+    engine, converter = route_conversion(source_format, target_format)
+    result = {
+        "engine": engine or "",
+        "input_bytes": os.path.getsize(input_path),
+        "output_bytes": 0,
+        "error": "",
+    }
+    if converter is None:
+        return {**result, "status": "unsupported", "wall_time": 0, "cpu_time": 0, "peak_rss_kb": _peak_rss_kb()}
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        cpu_start = _cpu_time()
+        wall_start = time.perf_counter()
+        try:
+            output_path = converter(input_path, output_dir, source_format, target_format, options or {})
+            result["status"] = "ok"
+            result["output_bytes"] = os.path.getsize(output_path)
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e)[:200]
+        result["wall_time"] = time.perf_counter() - wall_start
+        result["cpu_time"] = _cpu_time() - cpu_start
+
+    result["peak_rss_kb"] = _peak_rss_kb()
+    return result
+
+
+def throughput(result):
+    """Débit d'entrée en Mo/s (taille du fichier source divisée par le temps réel)."""
+    if result.get("status") != "ok" or not result.get("wall_time") or not result.get("input_bytes"):
+        return ""
+    return round(result["input_bytes"] / MEGABYTE / result["wall_time"], 3)
+
+
+def _measure_in_child(connection, *args):
+    try:
+        connection.send(measure_conversion(*args))
+    except Exception as e:
+        connection.send({"status": "error", "error": str(e)[:200]})
+    finally:
+        connection.close()
+
+
+def measure_isolated(input_path, source_format, target_format, options=None):
+    """Mesure une conversion dans un processus neuf (fork), pour un pic RSS propre à ce cas."""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return measure_conversion(input_path, source_format, target_format, options)
+
+    context = multiprocessing.get_context("fork")
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_measure_in_child, args=(child_connection, input_path, source_format, target_format, options)
+    )
+    process.start()
+    child_connection.close()
+    try:
+        result = parent_connection.recv()
+    except EOFError:
+        result = {"status": "error", "error": f"Benchmark process died (exit code {process.exitcode})"}
+    process.join()
+    return result
+
+
+def run_benchmarks(sources=None, targets=None, sizes=None, repeat=1, options=None, progress=None):
+    """
+    Exécute la matrice de benchmarks et retourne la liste des résultats.
+
+    Pour chaque cas, la médiane des `repeat` mesures est conservée.
+    """
+    sources = sources or ALL_FORMATS
+    targets = targets or ALL_FORMATS
+    sizes = sizes or list(FIXTURE_SIZES)
+    results = []
+
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        for size in sizes:
+            for source_format in sources:
+                input_path = os.path.join(fixtures_dir, f"bench_{size}.{source_format}")
+                if not create_fake_file(input_path, source_format, size):
+                    continue
+
+                for target_format in targets:
+                    if normalize_format(source_format) == normalize_format(target_format):
+                        continue
+                    engine, _ = route_conversion(normalize_format(source_format), normalize_format(target_format))
+                    if engine is None:
+                        continue
+
+                    runs = [
+                        measure_isolated(input_path, normalize_format(source_format), normalize_format(target_format), options)
+                        for _ in range(repeat)
+                    ]
+                    result = {field: "" for field in RESULT_FIELDS}
+                    result.update(runs[-1])
+                    for metric in ["wall_time", "cpu_time", "peak_rss_kb"]:
+                        values = [run[metric] for run in runs if isinstance(run.get(metric), (int, float))]
+                        if values:
+                            result[metric] = statistics.median(values)
+                    result["throughput_mb_s"] = throughput(result)
+                    result.update({"source_format": source_format, "target_format": target_format, "size": size})
+                    results.append(result)
+                    if progress:
+                        progress(result)
+    return results
+
+
+def save_results(results, output_path):
+    """Enregistre les résultats en JSON ou en CSV selon l'extension du fichier."""
+    if output_path.lower().endswith(".csv"):
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "results": results,
+            }, f, indent=2)
+
+
+def load_results(input_path):
+    """Charge des résultats enregistrés par save_results."""
+    if input_path.lower().endswith(".csv"):
+        with open(input_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for metric in COMPARED_METRICS:
+                row[metric] = float(row[metric]) if row.get(metric) not in (None, "") else None
+        return rows
+    with open(input_path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare_results(results, baseline, threshold=0.25):
+    """
+    Compare des résultats à une référence et retourne la liste des régressions.
+
+    Une métrique régresse si elle dépasse la référence de plus de `threshold`
+    (0.25 = +25 %), ou si un cas qui réussissait échoue désormais.
+    """
+    def case_key(row):
+        return row["source_format"], row["target_format"], row["size"]
+
+    baseline_by_case = {case_key(row): row for row in baseline}
+    regressions = []
+
+    for row in results:
+        reference = baseline_by_case.get(case_key(row))
+        if reference is None:
+            continue
+        if reference.get("status") == "ok" and row.get("status") != "ok":
+            regressions.append({
+                "source_format": row["source_format"],
+                "target_format": row["target_format"],
+                "size": row["size"],
+                "metric": "status",
+                "baseline": "ok",
+                "current": row.get("status"),
+            })
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = reference.get(metric), row.get(metric)
+            if not before or after in (None, ""):
+                continue
+            # En dessous de 10 ms, les temps mesurés sont surtout du bruit
+            if metric in ("wall_time", "cpu_time") and max(before, after) < MIN_COMPARED_TIME:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append({
+                    "source_format": row["source_format"],
+                    "target_format": row["target_format"],
+                    "size": row["size"],
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": after / before - 1,
+                })
+    return regressions
@@ -0,0 +1,307 @@
+import glob
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter, namedtuple
+
+from django import db
+from django.utils import timezone
+
+from converter.converters.registry import load_engine, plan_conversion, plan_engine, run_plan
+from converter.utils import normalize_format
+
+MANIFEST_NAME = ".convert_bulk.jsonl"
+# Répertoire de travail, sous la racine de sortie pour que la publication soit un renommage
+SCRATCH_NAME = ".convert_bulk_tmp"
+# Les conversions enregistrées en base (option record) sont insérées par lots
+RECORD_BATCH_SIZE = 500
+MEGABYTE = 1024 * 1024
+
+# Un fichier à convertir : chemin absolu, chemin relatif dans l'arborescence reproduite, format, taille, date
+BulkItem = namedtuple("BulkItem", ["path", "relative_path", "source_format", "size", "mtime"])
+
+
+def pattern_root(pattern):
+    """Répertoire fixe d'un motif glob (la partie qui précède le premier joker)."""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or "."
+
+
+def find_inputs(paths, target_format):
+    """
+    Liste les fichiers à convertir : répertoires parcourus récursivement ou
+    motifs glob (** accepté). Seuls les fichiers dont le format (d'après
+    l'extension) peut être converti vers `target_format` sont retenus.
+
+    Le chemin relatif de chaque fichier est pris par rapport au répertoire
+    donné, ou à la partie fixe du motif : c'est l'arborescence reproduite
+    dans le répertoire de sortie.
+    """
+    target_format = normalize_format(target_format)
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            root = path
+            candidates = (
+                os.path.join(directory, name)
+                for directory, names in _walk_sorted(path)
+                for name in names
+            )
+        else:
+            root = pattern_root(path) if glob.has_magic(path) else os.path.dirname(path) or "."
+            candidates = sorted(glob.iglob(path, recursive=True))
+
+        for candidate in candidates:
+            absolute = os.path.abspath(candidate)
+            if absolute in seen or not os.path.isfile(absolute):
+                continue
+            source_format = normalize_format(os.path.splitext(candidate)[1].lstrip("."))
+            if not source_format or source_format == target_format or not plan_conversion(source_format, target_format):
+                continue
+            seen.add(absolute)
+            stat = os.stat(absolute)
+            yield BulkItem(absolute, os.path.relpath(absolute, os.path.abspath(root)), source_format,
+                           stat.st_size, stat.st_mtime)
+
+
+def _walk_sorted(path):
+    for directory, subdirectories, names in os.walk(path):
+        subdirectories.sort()
+        yield directory, sorted(names)
+
+
+def output_stems(items, output_root):
+    """
+    Chemin de sortie (sans extension) de chaque fichier. Deux fichiers du même
+    répertoire qui ne diffèrent que par l'extension (photo.png, photo.gif)
+    gardent leur extension d'origine dans le nom (photo.png.pdf, photo.gif.pdf).
+    """
+    stems = Counter(os.path.splitext(item.relative_path)[0] for item in items)
+    return {
+        item.path: os.path.join(output_root, stem if stems[stem] == 1 else item.relative_path)
+        for item in items
+        for stem in [os.path.splitext(item.relative_path)[0]]
+    }
+
+
+def load_manifest(manifest_path):
+    """
+    Lit le manifeste d'un traitement précédent : {(chemin d'entrée, format cible):
+    dernier résultat}. Une ligne tronquée (arrêt brutal pendant l'écriture) est ignorée.
+    """
+    entries = {}
+    if not os.path.exists(manifest_path):
+        return entries
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[(entry["input"], entry["target_format"])] = entry
+    return entries
+
+
+def is_done(item, entry, options):
+    """
+    Un fichier est déjà converti si le manifeste le dit (avec les mêmes options),
+    qu'il n'a pas changé depuis et que la sortie existe.
+    """
+    return (
+        entry is not None
+        and entry["status"] == "succeeded"
+        and entry["options"] == options
+        and entry["size"] == item.size
+        and entry["mtime"] == item.mtime
+        and os.path.exists(entry["output"])
+    )
+
+
+def existing_output(stem, target_format):
+    """Sortie déjà présente dans l'arborescence de sortie (fichier cible ou ZIP de pages), ou None."""
+    for extension in (target_format, "zip"):
+        if os.path.exists(f"{stem}.{extension}"):
+            return f"{stem}.{extension}"
+    return None
+
+
+def _init_worker(engines):
+    # Les processus héritent de la connexion du parent : chacun ouvre la sienne au besoin
+    db.connections.close_all()
+    for engine in engines:
+        load_engine(engine)
+
+
+def convert_item(task):
+    """
+    Convertit un fichier (dans un processus du pool) vers son emplacement dans
+    l'arborescence de sortie.
+
+    Le fichier est produit dans le répertoire de travail puis renommé : une
+    sortie présente est toujours complète, même après une interruption.
+    """
+    item, target_format, stem, scratch_root, options = task
+    plan = plan_conversion(item.source_format, target_format)
+    started = time.perf_counter()
+    result = {
+        "input": item.path, "size": item.size, "mtime": item.mtime, "source_format": item.source_format,
+        "target_format": target_format, "options": options, "engine": plan_engine(plan), "output": "", "status": "failed", "error": "",
+    }
+    try:
+        scratch_dir = tempfile.mkdtemp(dir=scratch_root)
+        try:
+            output_path = run_plan(plan, item.path, scratch_dir, options)
+            final_path = stem + os.path.splitext(output_path)[1]
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(output_path, final_path)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        result.update(status="succeeded", output=final_path, output_size=os.path.getsize(final_path))
+    except Exception as e:
+        result["error"] = str(e)[:500]
+    result["duration"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+class BulkReport:
+    """Compteurs d'un traitement : fichiers, volumes et débit."""
+
+    def __init__(self, total):
+        self.total = total
+        self.started = time.perf_counter()
+        self.counts = Counter()
+        self.engines = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, result):
+        self.counts[result["status"]] += 1
+        if result["status"] == "succeeded":
+            self.engines[result["engine"]] += 1
+            self.bytes_in += result["size"]
+            self.bytes_out += result.get("output_size", 0)
+
+    @property
+    def processed(self):
+        return self.counts["succeeded"] + self.counts["failed"]
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.processed / elapsed if elapsed else 0
+        remaining = self.total - self.processed - self.counts["skipped"]
+        return {
+            "total": self.total,
+            "succeeded": self.counts["succeeded"],
+            "failed": self.counts["failed"],
+            "skipped": self.counts["skipped"],
+            "elapsed": round(elapsed, 2),
+            "files_per_second": round(rate, 2),
+            "mb_per_second": round(self.bytes_in / MEGABYTE / elapsed, 2) if elapsed else 0,
+            "input_mb": round(self.bytes_in / MEGABYTE, 2),
+            "output_mb": round(self.bytes_out / MEGABYTE, 2),
+            "eta": round(remaining / rate) if rate else None,
+            "engines": dict(self.engines),
+        }
+
+
+def _record(results):
+    """Enregistre un lot de conversions terminées (sans fichier sous MEDIA_ROOT : chemins du disque)."""
+    from converter.models import Conversion
+
+    finished_at = timezone.now()
+    Conversion.objects.bulk_create([
+        Conversion(
+            input_file=result["input"], output_file=result["output"] or None,
+            source_format=result["source_format"], target_format=result["target_format"], options=result["options"],
+            status=Conversion.Status.SUCCEEDED if result["status"] == "succeeded" else Conversion.Status.FAILED,
+            error_message=result["error"][:255] or None,
+            engine=result["engine"], duration=result["duration"], finished_at=finished_at,
+        )
+        for result in results
+    ], batch_size=RECORD_BATCH_SIZE)
+
+
+def run_bulk(items, target_format, output_root, options=None, workers=1, manifest_path=None,
+             skip_existing=False, record=False, max_tasks_per_child=None, progress=None, progress_interval=10):
+    """
+    Convertit une liste de fichiers (voir find_inputs) dans un pool de processus,
+    sans passer par HTTP ni par le stockage des jobs.
+
+    Chaque résultat est ajouté au manifeste (JSON Lines) dès qu'il arrive : un
+    traitement interrompu reprend là où il s'était arrêté, les fichiers déjà
+    convertis (et inchangés) étant ignorés. Avec `skip_existing`, un fichier
+    dont la sortie existe déjà est aussi ignoré, même sans manifeste.
+
+    Args:
+        record: enregistre aussi chaque conversion dans la table Conversion (par lots).
+        progress: fonction appelée avec BulkReport.summary() toutes les `progress_interval` secondes.
+
+    Returns:
+        dict: bilan du traitement (BulkReport.summary()).
+    """
+    target_format = normalize_format(target_format)
+    options = options or {}
+    output_root = os.path.abspath(output_root)
+    os.makedirs(output_root, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(output_root, MANIFEST_NAME)
+    done = load_manifest(manifest_path)
+
+    # Répertoire de travail d'un traitement interrompu : son contenu est incomplet
+    scratch_root = os.path.join(output_root, SCRATCH_NAME)
+    shutil.rmtree(scratch_root, ignore_errors=True)
+    os.makedirs(scratch_root)
+
+    items = list(items)
+    stems = output_stems(items, output_root)
+    report = BulkReport(len(items))
+    tasks = []
+    for item in items:
+        if is_done(item, done.get((item.path, target_format)), options) or (skip_existing and existing_output(stems[item.path], target_format)):
+            report.counts["skipped"] += 1
+        else:
+            tasks.append((item, target_format, stems[item.path], scratch_root, options))
+
+    engines = sorted({edge.engine for item, *_ in tasks for edge in plan_conversion(item.source_format, target_format)})
+    pending_records = []
+    last_progress = time.perf_counter()
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest:
+        def collect(result):
+            nonlocal last_progress
+            manifest.write(json.dumps(result) + "\n")
+            manifest.flush()
+            report.add(result)
+            if record:
+                pending_records.append(result)
+                if len(pending_records) >= RECORD_BATCH_SIZE:
+                    _record(pending_records)
+                    pending_records.clear()
+            if progress and time.perf_counter() - last_progress >= progress_interval:
+                last_progress = time.perf_counter()
+                progress(report.summary())
+
+        if workers <= 1:
+            for engine in engines:
+                load_engine(engine)
+            for task in tasks:
+                collect(convert_item(task))
+        elif tasks:
+            # Connexions fermées avant le fork : aucun processus ne partage celle du parent
+            db.connections.close_all()
+            chunksize = max(1, min(32, len(tasks) // (workers * 8)))
+            with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engines,),
+                                      maxtasksperchild=max_tasks_per_child) as pool:
+                for result in pool.imap_unordered(convert_item, tasks, chunksize=chunksize):
+                    collect(result)
+
+    shutil.rmtree(scratch_root, ignore_errors=True)
+    if pending_records:
+        _record(pending_records)
+    return report.summary()
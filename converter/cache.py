@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Occupation relevée à la dernière éviction (voir usage)
+USAGE_FILE = ".usage.json"
+
+# Part de la taille maximale écrite par un processus avant de relancer l'éviction
+EVICT_FRACTION = 0.1
+
+# Octets ajoutés au cache par ce processus depuis sa dernière éviction
+_stored_bytes = 0
+_stored_lock = threading.Lock()
+
+
+def is_enabled():
+    """Indique si le cache des résultats de conversion est actif."""
+    return getattr(settings, "CONVERTER_CACHE_ENABLED", True)
+
+
+def get_cache_dir():
+    """Retourne le répertoire du cache (créé si nécessaire)."""
+    cache_dir = getattr(settings, "CONVERTER_CACHE_DIR", None) or os.path.join(settings.MEDIA_ROOT, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def get_max_bytes():
+    """Taille maximale du cache sur disque, en octets."""
+    return getattr(settings, "CONVERTER_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+
+
+def compute_file_hash(file_path):
+    """Calcule le SHA-256 d'un fichier par blocs."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(input_hash, source_format, target_format, options, version):
+    """
+    Construit la clé de cache d'une conversion.
+
+    La version du convertisseur fait partie de la clé : l'augmenter invalide
+    toutes les entrées produites par l'ancienne version.
+    """
+    payload = json.dumps(
+        {
+            "input": input_hash,
+            "source": source_format,
+            "target": target_format,
+            "options": options or {},
+            "version": version,
+            "salt": getattr(settings, "CONVERTER_CACHE_VERSION", 1),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_dir(key):
+    return os.path.join(get_cache_dir(), key[:2])
+
+
+def _access_marker(entry_path):
+    """
+    Fichier témoin du dernier accès à une entrée (sa date de modification).
+
+    La date de l'entrée elle-même ne peut pas servir : les résultats servis
+    depuis le cache en sont des liens physiques, dont la date de modification
+    donne l'ETag et le Last-Modified des téléchargements.
+    """
+    entry_dir, name = os.path.split(entry_path)
+    return os.path.join(entry_dir, f".used_{os.path.splitext(name)[0]}")
+
+
+def _last_used(entry_path, stat):
+    try:
+        return os.stat(_access_marker(entry_path)).st_mtime
+    except FileNotFoundError:
+        return stat.st_mtime
+
+
+def _remove_entry(entry_path):
+    for path in (entry_path, _access_marker(entry_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _find_entry(key):
+    entry_dir = _entry_dir(key)
+    if not os.path.isdir(entry_dir):
+        return None
+    for name in os.listdir(entry_dir):
+        if name.startswith(key):
+            return os.path.join(entry_dir, name)
+    return None
+
+
+def lookup(key):
+    """
+    Retourne le chemin du résultat en cache pour cette clé, ou None.
+
+    Un accès réussi rafraîchit le témoin d'accès de l'entrée, utilisé pour
+    l'éviction LRU ; l'entrée elle-même n'est pas modifiée.
+    """
+    entry_path = _find_entry(key)
+    if entry_path is None:
+        return None
+
+    marker = _access_marker(entry_path)
+    with open(marker, "a"):
+        os.utime(marker)
+    if not os.path.exists(entry_path):
+        # Entrée supprimée entre-temps par une éviction concurrente
+        _remove_entry(entry_path)
+        return None
+    return entry_path
+
+
+def store(key, output_path):
+    """
+    Ajoute le résultat d'une conversion au cache.
+
+    La limite de taille n'est pas appliquée à chaque ajout (l'éviction parcourt
+    tout le cache) : seulement quand ce processus a écrit EVICT_FRACTION de la
+    taille maximale depuis sa dernière éviction, et à chaque balayage de la
+    rétention.
+    """
+    global _stored_bytes
+    _, ext = os.path.splitext(output_path)
+    entry_dir = _entry_dir(key)
+    os.makedirs(entry_dir, exist_ok=True)
+    entry_path = os.path.join(entry_dir, f"{key}{ext}")
+
+    # Écriture dans un fichier temporaire puis renommage atomique
+    fd, temp_path = tempfile.mkstemp(dir=entry_dir, prefix=".tmp_")
+    os.close(fd)
+    try:
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, entry_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    with _stored_lock:
+        _stored_bytes += os.path.getsize(entry_path)
+        due = _stored_bytes >= get_max_bytes() * EVICT_FRACTION
+        if due:
+            _stored_bytes = 0
+    if due:
+        evict()
+    return entry_path
+
+
+def copy_entry(entry_path, target_path):
+    """Place une entrée du cache à l'emplacement de sortie (lien physique si possible)."""
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(entry_path, target_path)
+    except OSError:
+        shutil.copyfile(entry_path, target_path)
+
+
+def _entries():
+    """Entrées du cache : (chemin, taille, date du dernier accès)."""
+    cache_dir = get_cache_dir()
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            # Fichiers temporaires et témoins d'accès
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_size, _last_used(path, stat)
+
+
+def evict(max_bytes=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la limite."""
+    max_bytes = get_max_bytes() if max_bytes is None else max_bytes
+    entries = list(_entries())
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+
+    for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+        if total <= max_bytes:
+            break
+        _remove_entry(path)
+        total -= size
+        removed += 1
+    _write_usage(len(entries) - removed, total)
+    return removed
+
+
+def _write_usage(entries, size_bytes):
+    cache_dir = get_cache_dir()
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=".tmp_")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"entries": entries, "size_bytes": size_bytes}, f)
+    os.replace(temp_path, os.path.join(cache_dir, USAGE_FILE))
+
+
+def usage():
+    """
+    Occupation du cache relevée à la dernière éviction (entries, size_bytes),
+    sans parcourir le cache : les évictions ont lieu à chaque balayage de la
+    rétention et au fil des ajouts (voir store).
+    """
+    try:
+        with open(os.path.join(get_cache_dir(), USAGE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        entries = list(_entries())
+        size_bytes = sum(size for _, size, _ in entries)
+        _write_usage(len(entries), size_bytes)
+        return {"entries": len(entries), "size_bytes": size_bytes}
+
+
+def clear():
+    """Vide complètement le cache (par exemple après la modification d'un convertisseur)."""
+    cache_dir = get_cache_dir()
+    removed = 0
+    for path, _, _ in list(_entries()):
+        _remove_entry(path)
+        removed += 1
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if os.path.isdir(entry_dir) and not os.listdir(entry_dir):
+            os.rmdir(entry_dir)
+    _write_usage(0, 0)
+    return removed
+
+
+def stats():
+    """
+    Retourne l'occupation du cache et ses succès et échecs, tous processus
+    confondus : ils sont déduits des conversions enregistrées (un échec est
+    une conversion calculée alors que le cache était consulté).
+    """
+    from converter.models import Conversion
+
+    entries = list(_entries())
+    return {
+        "hits": Conversion.objects.filter(from_cache=True).count(),
+        "misses": Conversion.objects.filter(from_cache=False, finished_at__isnull=False)
+        .exclude(engine="").exclude(input_sha256="").count(),
+        "entries": len(entries),
+        "size_bytes": sum(size for _, size, _ in entries),
+        "max_bytes": get_max_bytes(),
+    }
@@ -0,0 +1,204 @@
+import hashlib
+import math
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from converter.sniffing import resolve_source_format, sniff_file
+from converter.storage import input_file_name
+
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """Le morceau envoyé est invalide (index, taille ou somme de contrôle)."""
+
+
+class SessionExpired(Exception):
+    """La session d'upload a expiré."""
+
+
+class SessionFinalized(Exception):
+    """La session a déjà été finalisée, par exemple par une requête concurrente."""
+
+
+def get_chunk_size(requested=None):
+    """Taille des morceaux, bornée par CONVERTER_UPLOAD_MAX_CHUNK_SIZE."""
+    default = getattr(settings, "CONVERTER_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+    maximum = getattr(settings, "CONVERTER_UPLOAD_MAX_CHUNK_SIZE", 64 * 1024 * 1024)
+    return max(1, min(int(requested or default), maximum))
+
+
+def get_session_ttl():
+    """Durée de vie d'une session sans activité."""
+    return timedelta(seconds=getattr(settings, "CONVERTER_UPLOAD_SESSION_TTL", 24 * 3600))
+
+
+def create_session(file_name, total_size, target_format, options=None, chunk_size=None):
+    """Crée une session d'upload et réserve le fichier dans le répertoire du job."""
+    from converter.models import Conversion, UploadSession
+
+    file_name = os.path.basename(file_name or "")
+    if not file_name:
+        raise ChunkError("Missing file name")
+    total_size = int(total_size)
+    if total_size <= 0:
+        raise ChunkError("Invalid total size")
+    max_size = getattr(settings, "CONVERTER_UPLOAD_MAX_SIZE", None)
+    if max_size and total_size > max_size:
+        raise ChunkError(f"File too large (maximum {max_size} bytes)")
+
+    chunk_size = get_chunk_size(chunk_size)
+    session = UploadSession(
+        file_name=file_name,
+        total_size=total_size,
+        chunk_size=chunk_size,
+        total_chunks=math.ceil(total_size / chunk_size),
+        target_format=target_format or "",
+        options=options or {},
+    )
+    # Le fichier est écrit directement à son emplacement final, sous le token
+    # qui deviendra celui de la conversion
+    session.file_name = input_file_name(session, file_name, Conversion._meta.get_field("input_file").max_length)
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(total_size)
+    session.save()
+    return session
+
+
+def session_path(session):
+    return os.path.join(settings.MEDIA_ROOT, session.file_name)
+
+
+def is_expired(session):
+    return session.updated_at is not None and session.updated_at < timezone.now() - get_session_ttl()
+
+
+def expected_chunk_length(session, index):
+    """Taille attendue d'un morceau (le dernier peut être plus court)."""
+    if index < 0 or index >= session.total_chunks:
+        raise ChunkError(f"Invalid chunk index {index}")
+    return min(session.chunk_size, session.total_size - index * session.chunk_size)
+
+
+def write_chunk(session, index, stream, checksum=None):
+    """
+    Écrit un morceau à sa position dans le fichier du job, en le lisant par
+    blocs depuis la requête et en calculant son SHA-256 au passage.
+    """
+    from converter.models import UploadChunk
+
+    if session.finalized:
+        raise ChunkError("Upload already finalized")
+    if is_expired(session):
+        raise SessionExpired("Upload session expired")
+
+    expected = expected_chunk_length(session, index)
+    digest = hashlib.sha256()
+    written = 0
+
+    with open(session_path(session), "r+b") as f:
+        f.seek(index * session.chunk_size)
+        while written < expected:
+            block = stream.read(min(READ_BLOCK_SIZE, expected - written))
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            written += len(block)
+        if stream.read(1):
+            raise ChunkError(f"Chunk {index} is larger than {expected} bytes")
+
+    if written != expected:
+        raise ChunkError(f"Chunk {index} has {written} bytes, expected {expected}")
+    sha256 = digest.hexdigest()
+    if checksum and checksum.lower() != sha256:
+        raise ChunkError(f"Checksum mismatch for chunk {index}")
+
+    try:
+        UploadChunk.objects.update_or_create(session=session, index=index, defaults={"size": written, "sha256": sha256})
+    except IntegrityError:
+        # Même morceau envoyé deux fois en parallèle : le contenu est identique
+        pass
+    # Marque l'activité de la session pour repousser son expiration
+    type(session).objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return sha256
+
+
+def received_chunks(session):
+    return sorted(session.chunks.values_list("index", flat=True))
+
+
+def missing_chunks(session):
+    received = set(received_chunks(session))
+    return [index for index in range(session.total_chunks) if index not in received]
+
+
+def check_complete(session):
+    """
+    Vérifie que tous les morceaux sont présents (lève ChunkError). Les morceaux
+    d'une session finalisée entre-temps par une requête concurrente ont été
+    supprimés : c'est alors SessionFinalized qui est levée.
+    """
+    missing = missing_chunks(session)
+    if not missing:
+        return
+    if type(session).objects.filter(pk=session.pk, finalized=True).exists():
+        raise SessionFinalized("Upload already finalized")
+    raise ChunkError(f"Missing chunks: {missing[:20]}")
+
+
+def session_source_format(session):
+    """Format réel du fichier assemblé (lève FormatMismatch s'il contredit l'extension)."""
+    return resolve_source_format(os.path.basename(session.file_name), sniff_file(session_path(session)))
+
+
+def finalize_session(session, source_format=None):
+    """
+    Vérifie que tous les morceaux sont présents et crée la conversion correspondante.
+
+    La session est marquée finalisée par un UPDATE conditionnel, dans la même
+    transaction que la création de la conversion : de deux finalisations
+    simultanées, une seule crée la conversion, l'autre lève SessionFinalized.
+    """
+    from converter.models import Conversion, UploadSession
+
+    check_complete(session)
+    source_format = source_format or session_source_format(session)
+    with transaction.atomic():
+        if not UploadSession.objects.filter(pk=session.pk, finalized=False).update(finalized=True):
+            raise SessionFinalized("Upload already finalized")
+        session.finalized = True
+        conversion = Conversion(
+            token=session.token,
+            source_format=source_format,
+            target_format=session.target_format,
+            options=session.options,
+        )
+        conversion.input_file.name = session.file_name
+        conversion.save()
+        session.chunks.all().delete()
+    return conversion
+
+
+def expire_sessions():
+    """
+    Supprime les sessions inactives. Les fichiers partiels des sessions non
+    finalisées sont supprimés ; ceux des sessions finalisées appartiennent
+    désormais à leur conversion.
+    """
+    from converter.models import UploadSession
+
+    stale = UploadSession.objects.filter(updated_at__lt=timezone.now() - get_session_ttl())
+    count = 0
+    for session in stale.filter(finalized=False).iterator():
+        shutil.rmtree(os.path.dirname(session_path(session)), ignore_errors=True)
+        count += 1
+    stale.delete()
+    return count
@@ -1,13 +1,79 @@
-from converter.utils import conversion_default_exception, handle_conversion_error, unsupported_format
-from converter.formats import image_formats, writer_formats, table_formats, slide_formats, pdf_format
-from .image_converter import convert_image
-from .writer_converter import (
-    convert_writer_to_pdf,
-    convert_writer_to_writer,
-)
-from .pdf_converter import convert_pdf_to_images
+import os
+import time
+
+from converter import cache as result_cache
+from converter.instrumentation import file_size, record_stages, save_stages, stage
+from converter.metrics import record_conversion
+from converter.storage import job_scratch_dir, publish_output
+from converter.utils import conversion_default_exception, handle_conversion_error, save_final_state, unsupported_format
+# Les moteurs (pandas, python-docx, fpdf, pdf2image, Pillow...) ne sont pas
+# importés ici : le registre les charge au premier usage (voir registry.get_converter)
+from .registry import get_converter, plan_conversion, plan_engine, plan_version, run_plan
+
+def route_conversion(source_format, target_format):
+    """
+    Retourne le convertisseur (nom, fonction) à utiliser, ou (None, None) si non supporté.
+
+    Pour une conversion en plusieurs étapes (docx -> pdf -> png), la fonction
+    retournée enchaîne les étapes du plan.
+    """
+    plan = plan_conversion(source_format, target_format)
+    if not plan:
+        return None, None
+    if len(plan) == 1:
+        return plan[0].engine, get_converter(plan[0].engine)
+
+    def convert_chain(input_path, output_dir, source_format, target_format, options=None):
+        return run_plan(plan, input_path, output_dir, options)
+    return plan_engine(plan), convert_chain
+
+class IntermediateCache:
+    """Réutilise les résultats intermédiaires d'un plan (le PDF de docx -> pdf -> png) via le cache des résultats."""
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    def key(self, steps):
+        return result_cache.cache_key(
+            self.instance.input_sha256,
+            self.instance.source_format,
+            steps[-1].target_format,
+            self.instance.options,
+            plan_version(steps),
+        )
+
+    def lookup(self, steps, step_dir):
+        with stage("cache_lookup"):
+            cached_path = result_cache.lookup(self.key(steps))
+        if cached_path is None:
+            return None
+        file_root, _ = os.path.splitext(os.path.basename(self.instance.input_file.name))
+        _, ext = os.path.splitext(cached_path)
+        target_path = os.path.join(step_dir, f"{file_root}{ext}")
+        result_cache.copy_entry(cached_path, target_path)
+        return target_path
+
+    def store(self, steps, output_path):
+        with stage("cache_store"):
+            result_cache.store(self.key(steps), output_path)
 
 def convert_file(instance):
+    """
+    Effectue la conversion du fichier en mesurant la durée de chaque étape.
+
+    Les convertisseurs ne font que mettre à jour l'instance : son état final
+    (statut, sortie, erreur, durée) est enregistré en une seule écriture.
+    """
+    started = time.perf_counter()
+    with record_stages() as stages:
+        _convert_file(instance)
+        instance.duration = time.perf_counter() - started
+        with stage("db_save"):
+            save_final_state(instance)
+    save_stages(instance, stages)
+    record_conversion(instance, stages)
+
+def _convert_file(instance):
     """Effectue la conversion du fichier selon les formats source et cible."""
     from converter.utils import normalize_format
 
@@ -25,26 +91,53 @@ def convert_file(instance):
         return
 
     try:
-        # Redirection vers les convertisseurs selon le format
-        
-        # image_converter.py
-        if instance.source_format in image_formats and instance.target_format in image_formats + pdf_format:
-            convert_image(instance)
-            
-        # writer_converter.py
-        elif instance.source_format in writer_formats and instance.target_format in pdf_format:
-            convert_writer_to_pdf(instance)
-        elif instance.source_format in writer_formats and instance.target_format in writer_formats:
-            convert_writer_to_writer(instance)
-            
-        # table_converter.py
-        
-        # slide_converter.py
-        
-        # pdf_converter.py 
-        elif instance.source_format in pdf_format and instance.target_format in image_formats:
-            convert_pdf_to_images(instance)
-        else:
+        # Plan de conversion (une ou plusieurs étapes) pré-calculé par le registre
+        plan = plan_conversion(instance.source_format, instance.target_format)
+        if not plan:
             unsupported_format(instance)
+            return
+        instance.engine = plan_engine(plan)
+
+        key = None
+        step_cache = None
+        if result_cache.is_enabled():
+            if not instance.input_sha256:
+                with stage("hash", bytes_in=file_size(instance.input_file.path)):
+                    instance.input_sha256 = result_cache.compute_file_hash(instance.input_file.path)
+            step_cache = IntermediateCache(instance)
+            key = step_cache.key(plan)
+            with stage("cache_lookup"):
+                cached_path = result_cache.lookup(key)
+            if cached_path is not None:
+                _use_cached_result(instance, cached_path)
+                return
+
+        instance.from_cache = False
+        with job_scratch_dir(instance) as scratch_dir:
+            output_path = run_plan(plan, instance.input_file.path, scratch_dir, instance.options, step_cache)
+            if key is not None:
+                with stage("cache_store"):
+                    result_cache.store(key, output_path)
+            with stage("publish"):
+                publish_output(instance, output_path)
+
+        _mark_converted(instance)
     except Exception as e:
         conversion_default_exception(instance, e)
+
+def _use_cached_result(instance, cached_path):
+    """Publie un résultat trouvé dans le cache comme sortie de la conversion."""
+    with job_scratch_dir(instance) as scratch_dir, stage("publish"):
+        file_root, _ = os.path.splitext(os.path.basename(instance.input_file.name))
+        _, ext = os.path.splitext(cached_path)
+        temp_path = os.path.join(scratch_dir, f"{file_root}{ext}")
+        result_cache.copy_entry(cached_path, temp_path)
+        publish_output(instance, temp_path)
+
+    instance.from_cache = True
+    _mark_converted(instance)
+
+def _mark_converted(instance):
+    """Marque le succès de la conversion (résultat calculé ou repris du cache)."""
+    instance.status = instance.Status.CACHED if instance.from_cache else instance.Status.SUCCEEDED
+    instance.error_message = None
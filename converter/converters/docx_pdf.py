@@ -0,0 +1,937 @@
+import io
+import re
+import zipfile
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+
+from converter.instrumentation import stage
+from .image_pdf import read_image
+from .pdf_writer import PAGE_SIZES, PdfStreamWriter, escape_pdf_text, get_char_widths, to_pdf_text
+
+RENDERERS = ["auto", "native", "libreoffice"]
+
+# Éléments que le rendu natif ne reproduit pas : leur présence dans le XML
+# du document (ou d'un en-tête, d'un pied de page) le confie à LibreOffice.
+UNSUPPORTED_MARKUP = [
+    ("tracked changes", rb"<w:(?:ins|del|moveFrom|moveTo)[ >]"),
+    ("comments or notes", rb"<w:(?:commentReference|footnoteReference|endnoteReference)[ />]"),
+    ("floating objects", rb"<(?:wp:anchor|w:framePr)[ >]"),
+    ("shapes or embedded objects", rb"<(?:w:pict|w:object|mc:AlternateContent|w:txbxContent)[ >]"),
+    ("charts or diagrams", rb'<a:graphicData uri="(?!http://schemas\.openxmlformats\.org/drawingml/2006/picture")'),
+    ("equations", rb"<m:oMath(?:Para)?[ >]"),
+    ("symbols", rb"<w:sym "),
+    ("content controls", rb"<w:(?:sdt|customXml|smartTag)[ >]"),
+    ("vertically merged cells", rb"<w:vMerge[ />]"),
+    ("multiple columns", rb'<w:cols [^>]*w:num="(?:[2-9]|\d\d)'),
+    ("right-to-left text", rb"<w:(?:bidi|rtl)[ />]"),
+    ("different first page headers", rb'<w:titlePg(?! w:val="(?:0|false|off)")[ />]'),
+    ("fields", rb"<w:instrText[^>]*>(?!\s*(?:PAGE|NUMPAGES|HYPERLINK)\b)"),
+    ("fields", rb'<w:fldSimple [^>]*w:instr="(?!\s*(?:PAGE|NUMPAGES)\b)'),
+]
+UNSUPPORTED_PATTERNS = [(reason, re.compile(pattern)) for reason, pattern in UNSUPPORTED_MARKUP]
+# Les en-têtes et pieds de page sont rendus comme du texte simple
+UNSUPPORTED_IN_HEADERS = re.compile(rb"<w:(?:drawing|tbl)[ >]")
+HEADER_PART = re.compile(r"word/(?:header|footer)\d*\.xml")
+TABLE_MARKUP = re.compile(rb"<(/?)w:tbl>")
+TEXT_MARKUP = re.compile(rb"<w:t(?: [^>]*)?>([^<]*)</w:t>")
+
+EMU_PER_POINT = 12700
+TWIPS_PER_POINT = 20
+# Taille de police de Word quand le document n'en déclare pas (en points)
+DEFAULT_FONT_SIZE = 10
+DEFAULT_MARGIN = 72
+# Hauteur d'une ligne et descente, en fraction de la taille de police
+LINE_HEIGHT = 1.17
+DESCENT = 0.22
+TAB_STOP = 36
+CELL_PADDING_X = 5.4
+CELL_PADDING_Y = 2
+BORDER_WIDTH = 0.5
+# Champs recalculés à chaque page dans les en-têtes et pieds de page
+PAGE_FIELDS = ["PAGE", "NUMPAGES"]
+BULLET = "•"
+SERIF_FONTS = ["times", "georgia", "garamond", "cambria", "palatino", "book antiqua", "serif"]
+MONOSPACE_FONTS = ["courier", "consolas", "mono"]
+ALIGNMENTS = {0: "left", 1: "center", 2: "right", 3: "justify", 4: "justify"}
+ROMAN_NUMERALS = [
+    (1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+    (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i"),
+]
+
+# Éléments d'un paragraphe : mots (ou espaces), images, tabulations et sauts
+TextStyle = namedtuple("TextStyle", ["font", "size", "color", "underline", "strike", "rise"])
+Word = namedtuple("Word", ["text", "style", "width", "space"])
+Picture = namedtuple("Picture", ["key", "blob", "width", "height"])
+Gap = namedtuple("Gap", ["width"])
+LINE_BREAK = "\n"
+PAGE_BREAK = "\f"
+# Lignes mises en page : parties positionnées par rapport au haut de la ligne
+Line = namedtuple("Line", ["height", "parts", "page_break"])
+TextPart = namedtuple("TextPart", ["x", "baseline", "style", "text", "width", "word_spacing"])
+ImagePart = namedtuple("ImagePart", ["x", "baseline", "picture"])
+ParagraphFormat = namedtuple("ParagraphFormat", [
+    "align", "left", "right", "first_line", "space_before", "space_after",
+    "line_spacing", "exact_height", "page_break_before", "style",
+])
+
+
+def get_docx_renderer(options=None):
+    """Rendu demandé par l'option "renderer" (ou CONVERTER_DOCX_RENDERER) : auto, native ou libreoffice."""
+    renderer = (options or {}).get("renderer") or getattr(settings, "CONVERTER_DOCX_RENDERER", "auto")
+    return renderer if renderer in RENDERERS else "auto"
+
+
+def choose_docx_renderer(input_path, options=None):
+    """Retourne "native" ou "libreoffice" ; en mode "auto", la sonde probe_docx décide."""
+    renderer = get_docx_renderer(options)
+    if renderer != "auto":
+        return renderer
+    with stage("probe"):
+        return "libreoffice" if probe_docx(input_path) else "native"
+
+
+def probe_docx(input_path):
+    """
+    Cherche, dans le XML brut du document (sans le charger avec python-docx),
+    ce que le rendu natif ne sait pas reproduire : suivi des modifications,
+    objets flottants, formes, notes, champs, sections multiples, tableaux
+    imbriqués, caractères hors des polices standard...
+
+    Returns:
+        str: raison pour laquelle le document doit passer par LibreOffice, ou None.
+    """
+    try:
+        with zipfile.ZipFile(input_path) as archive:
+            names = archive.namelist()
+            if "word/document.xml" not in names:
+                return "unexpected package layout"
+            document = archive.read("word/document.xml")
+            reason = _probe_markup(document) or _probe_structure(document)
+            if reason:
+                return reason
+            for name in names:
+                if HEADER_PART.fullmatch(name):
+                    part = archive.read(name)
+                    reason = _probe_markup(part)
+                    if reason or UNSUPPORTED_IN_HEADERS.search(part):
+                        return f"{reason or 'images or tables'} in headers or footers"
+            if "word/settings.xml" in names and b"<w:evenAndOddHeaders" in archive.read("word/settings.xml"):
+                return "different odd and even headers"
+    except (OSError, zipfile.BadZipFile, KeyError):
+        return "unreadable package"
+    return None
+
+
+def _probe_markup(xml):
+    for reason, pattern in UNSUPPORTED_PATTERNS:
+        if pattern.search(xml):
+            return reason
+    if not xml.isascii():
+        # Texte que les polices standard (WinAnsi) ne peuvent pas afficher
+        try:
+            for match in TEXT_MARKUP.finditer(xml):
+                match.group(1).decode("utf-8").encode("cp1252")
+        except UnicodeError:
+            return "characters outside the standard PDF fonts"
+    return None
+
+
+def _probe_structure(xml):
+    if xml.count(b"<w:sectPr") > 1:
+        return "multiple sections"
+    depth = 0
+    for match in TABLE_MARKUP.finditer(xml):
+        depth += -1 if match.group(1) else 1
+        if depth > 1:
+            return "nested tables"
+    return None
+
+
+def render_docx_pdf(input_path, output_path, options=None):
+    """
+    Rend un document DOCX simple en PDF, sans LibreOffice.
+
+    Le document est lu avec python-docx et mis en page dans l'ordre : titres et
+    paragraphes (gras, italique, souligné, taille, couleur, alignement, retraits,
+    espacements), listes numérotées ou à puces, tableaux (colonnes fusionnées,
+    lignes d'en-tête répétées, lignes coupées entre deux pages), images en ligne,
+    sauts de page, en-têtes et pieds de page (avec numéros de page). Chaque page
+    est écrite dès qu'elle est pleine, avec les polices standard du PDF.
+
+    Les documents qui utilisent d'autres fonctions sont repérés par probe_docx
+    et confiés à LibreOffice (voir writer_converter).
+
+    Returns:
+        int: nombre de pages écrites.
+    """
+    from docx import Document
+
+    document = Document(input_path)
+    section = document.sections[0]
+    page_size = (
+        section.page_width.pt if section.page_width else PAGE_SIZES["a4"][0],
+        section.page_height.pt if section.page_height else PAGE_SIZES["a4"][1],
+    )
+    with PdfStreamWriter(output_path, page_size=page_size) as pdf:
+        renderer = _DocxRenderer(document, section, pdf)
+        renderer.render()
+        return pdf.page_count
+
+
+class _DocxRenderer:
+    """Met en page le corps d'un document, page par page, dans un PdfStreamWriter."""
+
+    def __init__(self, document, section, pdf):
+        self.document = document
+        self.pdf = pdf
+        self.page_width, self.page_height = pdf.page_size
+        self.left = _points(section.left_margin, DEFAULT_MARGIN)
+        self.top = _points(section.top_margin, DEFAULT_MARGIN)
+        self.bottom = self.page_height - _points(section.bottom_margin, DEFAULT_MARGIN)
+        self.width = self.page_width - self.left - _points(section.right_margin, DEFAULT_MARGIN)
+        self.header_top = _points(section.header_distance, DEFAULT_MARGIN / 2)
+        self.footer_bottom = self.page_height - _points(section.footer_distance, DEFAULT_MARGIN / 2)
+        self.header = None if section.header.is_linked_to_previous else section.header
+        self.footer = None if section.footer.is_linked_to_previous else section.footer
+        # Avec NUMPAGES, les pages attendent la fin du document pour être écrites
+        self.needs_total = any(story is not None and "NUMPAGES" in story._element.xml
+                               for story in (self.header, self.footer))
+
+        self.defaults = _document_defaults(document)
+        self.numbering = _Numbering(document)
+        self._styles = None
+        self._style_cache = {}
+        self._char_widths = {}
+        self._image_ids = {}
+        self._pending_pages = []
+        self._page_number = 0
+        self._start_page()
+
+    # Pages
+
+    def _start_page(self):
+        self.ops, self.images = [], {}
+        self.y = self.top
+        self.page_used = False
+
+    def _end_page(self):
+        self._page_number += 1
+        page = (self.ops, self.images, self._page_number)
+        if self.needs_total:
+            self._pending_pages.append(page)
+        else:
+            self._write_page(*page)
+
+    def new_page(self):
+        self._end_page()
+        self._start_page()
+
+    def _write_page(self, ops, images, number, total=None):
+        fields = {"PAGE": str(number), "NUMPAGES": str(total or number)}
+        if self.header is not None:
+            y = self.header_top
+            for line in self._story_lines(self.header, fields):
+                self._draw_line(line, self.left, y, ops, images)
+                y += line.height
+        if self.footer is not None:
+            lines = self._story_lines(self.footer, fields)
+            y = self.footer_bottom - sum(line.height for line in lines)
+            for line in lines:
+                self._draw_line(line, self.left, y, ops, images)
+                y += line.height
+        self.pdf.add_page("\n".join(ops).encode("latin-1"), self.page_width, self.page_height, images)
+
+    def render(self):
+        from docx.table import Table
+
+        for block in self.document.iter_inner_content():
+            if isinstance(block, Table):
+                self._render_table(block)
+            else:
+                self._render_paragraph(block)
+        self._end_page()
+        for page in self._pending_pages:
+            self._write_page(*page, total=self._page_number)
+
+    def _render_paragraph(self, paragraph):
+        fmt, lines = self.paragraph_lines(paragraph, self.width)
+        if fmt.page_break_before and self.page_used:
+            self.new_page()
+        if self.page_used:
+            self.y += fmt.space_before
+        for line in lines:
+            if self.y + line.height > self.bottom and self.page_used:
+                self.new_page()
+            self._draw_line(line, self.left, self.y, self.ops, self.images)
+            self.y += line.height
+            self.page_used = True
+            if line.page_break:
+                self.new_page()
+        self.y += fmt.space_after
+
+    # Tableaux
+
+    def _render_table(self, table):
+        from docx.table import _Cell
+
+        tbl = table._tbl
+        columns = tbl.tblGrid.gridCol_lst if tbl.tblGrid is not None else []
+        grid = [column.w.pt if column.w else 0 for column in columns]
+        if not grid or not all(grid):
+            count = max((len(tr.tc_lst) for tr in tbl.tr_lst), default=1)
+            grid = [self.width / count] * count
+        scale = min(1, self.width / sum(grid))
+        grid = [width * scale for width in grid]
+        borders = _has_borders(table)
+
+        header_rows, in_header = [], True
+        for tr in tbl.tr_lst:
+            cells, column = [], 0
+            for tc in tr.tc_lst:
+                span = max(1, tc.grid_span)
+                x, width = sum(grid[:column]), sum(grid[column:column + span])
+                column += span
+                cells.append((x, width, self._cell_lines(_Cell(tc, table), width - 2 * CELL_PADDING_X)))
+            is_header = in_header and bool(_xpath(tr, "w:trPr/w:tblHeader[not(@w:val='0' or @w:val='false')]"))
+            in_header = is_header
+            self._render_row(cells, borders, [] if is_header else header_rows)
+            if is_header:
+                header_rows.append(cells)
+
+    def _cell_lines(self, cell, width):
+        lines = []
+        for index, paragraph in enumerate(cell.paragraphs):
+            fmt, paragraph_lines = self.paragraph_lines(paragraph, width)
+            if index and fmt.space_before:
+                lines.append(Line(fmt.space_before, (), False))
+            lines.extend(line._replace(page_break=False) for line in paragraph_lines)
+            if index < len(cell.paragraphs) - 1 and fmt.space_after:
+                lines.append(Line(fmt.space_after, (), False))
+        return lines
+
+    def _render_row(self, cells, borders, header_rows):
+        """
+        Dessine une ligne de tableau. Une ligne qui ne tient pas dans la fin de
+        la page passe à la page suivante (après les lignes d'en-tête) ; une
+        ligne plus haute qu'une page est coupée entre plusieurs pages.
+        """
+        pending = [lines for _, _, lines in cells]
+        can_move = True
+        while True:
+            full_height = max(sum(line.height for line in lines) for lines in pending) + 2 * CELL_PADDING_Y
+            if can_move and self.page_used and self.y + full_height > self.bottom:
+                self._continue_table(header_rows, borders)
+                can_move = False
+                continue
+
+            room = self.bottom - self.y - 2 * CELL_PADDING_Y
+            taken = []
+            for lines in pending:
+                count, used = 0, 0
+                while count < len(lines) and (used + lines[count].height <= room or count == 0):
+                    used += lines[count].height
+                    count += 1
+                taken.append((count, used))
+            height = max(used for _, used in taken) + 2 * CELL_PADDING_Y
+
+            for (x, width, _), lines, (count, _) in zip(cells, pending, taken):
+                y = self.y + CELL_PADDING_Y
+                for line in lines[:count]:
+                    self._draw_line(line, self.left + x + CELL_PADDING_X, y, self.ops, self.images)
+                    y += line.height
+                if borders:
+                    self.ops.append(
+                        f"{BORDER_WIDTH} w 0 G {self.left + x:.2f} {self.page_height - self.y - height:.2f} "
+                        f"{width:.2f} {height:.2f} re S"
+                    )
+            self.y += height
+            self.page_used = True
+            pending = [lines[count:] for lines, (count, _) in zip(pending, taken)]
+            if not any(pending):
+                return
+            self._continue_table(header_rows, borders)
+
+    def _continue_table(self, header_rows, borders):
+        self.new_page()
+        for cells in header_rows:
+            self._render_row(cells, borders, [])
+
+    # Paragraphes
+
+    def paragraph_lines(self, paragraph, width, fields=None):
+        """Met en page un paragraphe sur une largeur : (ParagraphFormat, lignes)."""
+        from docx.text.run import Run
+
+        fmt = self._paragraph_format(paragraph)
+        paragraph_style = self._style(paragraph._p.style, "paragraph")
+        style_fonts = self._fonts(paragraph_style)
+        items, run_styles = [], {}
+        for run_element, kind, value in _iter_run_content(paragraph._p):
+            if run_element not in run_styles:
+                run_fonts = [Run(run_element, paragraph).font] + self._fonts(self._style(run_element.style, "character"))
+                run_styles[run_element] = self._text_style(run_fonts + style_fonts)
+            style = run_styles[run_element]
+            if kind == "text":
+                items.extend(self._words(value, style))
+            elif kind == "field":
+                name, cached = value
+                items.extend(self._words(fields[name] if fields and name in fields else cached, style))
+            elif kind == "picture":
+                picture = self._picture(paragraph, value)
+                if picture is not None:
+                    items.append(picture)
+            else:
+                items.append(value)
+
+        label = self.numbering.label(paragraph._p, paragraph_style)
+        if label is not None:
+            text, left, hanging = label
+            label_style = run_styles[next(iter(run_styles))] if run_styles else fmt.style
+            label = Word(to_pdf_text(text), label_style, self._text_width(to_pdf_text(text), label_style), False)
+            if fmt.left is None:
+                fmt = fmt._replace(left=left, first_line=-hanging)
+        fmt = fmt._replace(left=fmt.left or 0, first_line=fmt.first_line or 0)
+        return fmt, self._layout(items, width, fmt, label)
+
+    def _paragraph_format(self, paragraph):
+        style = self._style(paragraph._p.style, "paragraph")
+        formats = [paragraph.paragraph_format] + self._paragraph_formats(style)
+        defaults = self.defaults
+        alignment = _first(format.alignment for format in formats)
+        line_spacing = _first(format.line_spacing for format in formats)
+        exact_height = None
+        if line_spacing is None:
+            line_spacing = defaults["line_spacing"]
+        elif not isinstance(line_spacing, float):
+            # Interligne fixe ou minimal (une longueur)
+            exact_height, line_spacing = line_spacing.pt, 1.0
+        left = _first(format.left_indent for format in formats)
+        first_line = _first(format.first_line_indent for format in formats)
+        return ParagraphFormat(
+            align=ALIGNMENTS.get(int(alignment), "left") if alignment is not None else "left",
+            left=left.pt if left is not None else None,
+            right=_points(_first(format.right_indent for format in formats), 0),
+            first_line=first_line.pt if first_line is not None else None,
+            space_before=_points(_first(format.space_before for format in formats), defaults["space_before"]),
+            space_after=_points(_first(format.space_after for format in formats), defaults["space_after"]),
+            line_spacing=line_spacing,
+            exact_height=exact_height,
+            page_break_before=bool(_first(format.page_break_before for format in formats)),
+            style=self._paragraph_text_style(style),
+        )
+
+    def _style(self, style_id, style_type):
+        """
+        Style d'un identifiant (ou style par défaut de son type). python-docx
+        parcourt tous les styles à chaque recherche : ils sont indexés une fois.
+        """
+        if self._styles is None:
+            from docx.enum.style import WD_STYLE_TYPE
+
+            self._styles = {style.style_id: style for style in self.document.styles}
+            self._default_styles = {
+                "paragraph": self.document.styles.default(WD_STYLE_TYPE.PARAGRAPH),
+                "character": self.document.styles.default(WD_STYLE_TYPE.CHARACTER),
+            }
+        return self._styles.get(style_id) or self._default_styles[style_type]
+
+    def _paragraph_formats(self, style):
+        key = ("paragraph", style.style_id if style is not None else None)
+        if key not in self._style_cache:
+            self._style_cache[key] = [item.paragraph_format for item in _style_chain(style)]
+        return self._style_cache[key]
+
+    def _paragraph_text_style(self, style):
+        key = ("text", style.style_id if style is not None else None)
+        if key not in self._style_cache:
+            self._style_cache[key] = self._text_style(self._fonts(style))
+        return self._style_cache[key]
+
+    def _fonts(self, style):
+        """Polices (python-docx) d'un style et de ses styles parents, du plus précis au plus général."""
+        key = ("fonts", style.style_id if style is not None else None)
+        if key not in self._style_cache:
+            self._style_cache[key] = [item.font for item in _style_chain(style)]
+        return self._style_cache[key]
+
+    def _text_style(self, fonts):
+        size = _first(font.size for font in fonts)
+        size = size.pt if size is not None else self.defaults["font_size"]
+        bold, italic = _first(font.bold for font in fonts), _first(font.italic for font in fonts)
+        family = _font_family(_first(font.name for font in fonts) or self.defaults["font_name"])
+        rise = 0
+        if _first(font.superscript for font in fonts):
+            size, rise = size * 0.65, size * 0.33
+        elif _first(font.subscript for font in fonts):
+            size, rise = size * 0.65, -size * 0.14
+        color = _first(font.color.rgb for font in fonts)
+        return TextStyle(
+            font=family + ("B" if bold else "") + ("I" if italic else ""),
+            size=size,
+            color=tuple(component / 255 for component in color) if color is not None else (0, 0, 0),
+            underline=bool(_first(font.underline for font in fonts)),
+            strike=bool(_first(font.strike for font in fonts)),
+            rise=rise,
+        )
+
+    def _widths(self, font):
+        if font not in self._char_widths:
+            char_widths = get_char_widths(font)
+            self._char_widths[font] = [char_widths.get(chr(code), 600) / 1000 for code in range(256)]
+        return self._char_widths[font]
+
+    def _text_width(self, text, style):
+        widths = self._widths(style.font)
+        return sum(widths[ord(char)] for char in text) * style.size
+
+    def _words(self, text, style):
+        """Découpe un texte (d'un même style) en mots et espaces, mesurés."""
+        for token in re.findall(r"[^ ]+| +", to_pdf_text(text)):
+            yield Word(token, style, self._text_width(token, style), token[0] == " ")
+
+    def _picture(self, paragraph, drawing):
+        extent = _xpath(drawing, ".//wp:extent")
+        embed = _xpath(drawing, ".//a:blip/@r:embed")
+        if not extent or not embed or embed[0] not in paragraph.part.related_parts:
+            return None
+        part = paragraph.part.related_parts[embed[0]]
+        return Picture(
+            key=str(part.partname), blob=part.blob,
+            width=int(extent[0].get("cx")) / EMU_PER_POINT, height=int(extent[0].get("cy")) / EMU_PER_POINT,
+        )
+
+    def _layout(self, items, width, fmt, label=None):
+        """Coupe les éléments d'un paragraphe en lignes, coupées de préférence sur une espace."""
+        rows = []
+        row, row_width = [], 0.0
+        wrapped = False
+        first_start = fmt.left + fmt.first_line
+        if label is not None:
+            first_start = max(fmt.left, first_start + label.width + label.style.size * 0.3)
+
+        def available():
+            start = first_start if not rows else fmt.left
+            return max(1.0, width - start - fmt.right)
+
+        def finish(page_break=False, forced=False):
+            nonlocal row, row_width
+            while row and isinstance(row[-1], Word) and row[-1].space:
+                row.pop()
+            rows.append((row, page_break, forced))
+            row, row_width = [], 0.0
+
+        for item in items:
+            if item == LINE_BREAK or item == PAGE_BREAK:
+                finish(page_break=item == PAGE_BREAK, forced=True)
+                wrapped = False
+                continue
+            if item == "\t":
+                item = Gap(TAB_STOP - row_width % TAB_STOP)
+            elif isinstance(item, Picture) and item.width > available():
+                scale = available() / item.width
+                item = item._replace(width=item.width * scale, height=item.height * scale)
+            elif isinstance(item, Word) and item.space:
+                if not row and wrapped:
+                    continue
+                row.append(item)
+                row_width += item.width
+                continue
+
+            if row and row_width + item.width > available():
+                spaces = [index for index, part in enumerate(row) if isinstance(part, Word) and part.space]
+                carry = row[spaces[-1] + 1:] if spaces else []
+                row = row[:spaces[-1]] if spaces else row
+                finish()
+                wrapped = True
+                row, row_width = carry, sum(part.width for part in carry)
+            while isinstance(item, Word) and item.width > available() and len(item.text) > 1:
+                # Mot plus long que la ligne : coupé entre deux caractères
+                head, item = self._split_word(item, available() - row_width)
+                row.append(head)
+                finish()
+                wrapped = True
+            row.append(item)
+            row_width += item.width
+        finish()
+        if len(rows) > 1 and not rows[-1][0] and rows[-2][2]:
+            # Un saut en fin de paragraphe ne crée pas de ligne vide
+            rows.pop()
+
+        lines = []
+        for index, (row, page_break, forced) in enumerate(rows):
+            start = first_start if index == 0 else fmt.left
+            last = index == len(rows) - 1 or forced
+            lines.append(self._line(row, start, width - start - fmt.right, fmt, last, page_break,
+                                    label if index == 0 else None))
+        return lines
+
+    def _split_word(self, word, room):
+        widths = self._widths(word.style.font)
+        used, end = 0.0, 0
+        while end < len(word.text) - 1 and used + widths[ord(word.text[end])] * word.style.size <= room:
+            used += widths[ord(word.text[end])] * word.style.size
+            end += 1
+        end = max(end, 1)
+        head, tail = word.text[:end], word.text[end:]
+        return (word._replace(text=head, width=self._text_width(head, word.style)),
+                word._replace(text=tail, width=self._text_width(tail, word.style)))
+
+    def _line(self, row, start, available, fmt, last, page_break, label):
+        """Positionne les éléments d'une ligne (alignement, justification) et calcule sa hauteur."""
+        sizes = [item.style.size for item in row if isinstance(item, Word)] or [fmt.style.size]
+        if label is not None:
+            sizes.append(label.style.size)
+        pictures = [item.height for item in row if isinstance(item, Picture)]
+        descent = max(sizes) * DESCENT * fmt.line_spacing
+        if fmt.exact_height:
+            height = fmt.exact_height
+            baseline = height - descent
+        else:
+            baseline = max([max(sizes) * (LINE_HEIGHT - DESCENT) * fmt.line_spacing] + pictures)
+            height = baseline + descent
+
+        used = sum(item.width for item in row)
+        spare = max(0.0, available - used)
+        x, word_spacing = start, 0.0
+        if fmt.align == "center":
+            x += spare / 2
+        elif fmt.align == "right":
+            x += spare
+        elif fmt.align == "justify" and not last:
+            space_count = sum(item.text.count(" ") for item in row if isinstance(item, Word) and item.space)
+            word_spacing = spare / space_count if space_count else 0.0
+
+        parts = []
+        if label is not None:
+            parts.append(TextPart(fmt.left + fmt.first_line, baseline, label.style, label.text, label.width, 0.0))
+        chunk = None
+        for item in row:
+            if isinstance(item, Word):
+                width = item.width + (item.text.count(" ") * word_spacing if item.space else 0)
+                if chunk is not None and chunk.style == item.style:
+                    chunk = chunk._replace(text=chunk.text + item.text, width=chunk.width + width)
+                else:
+                    if chunk is not None:
+                        parts.append(chunk)
+                    chunk = TextPart(x, baseline, item.style, item.text, width, word_spacing)
+                x += width
+                continue
+            if chunk is not None:
+                parts.append(chunk)
+                chunk = None
+            if isinstance(item, Picture):
+                parts.append(ImagePart(x, baseline, item))
+            x += item.width
+        if chunk is not None:
+            parts.append(chunk)
+        return Line(height, parts, page_break)
+
+    def _draw_line(self, line, left, top, ops, images):
+        """Ajoute aux opérateurs de la page le dessin d'une ligne dont le haut est à `top`."""
+        for part in line.parts:
+            baseline = self.page_height - top - part.baseline
+            if isinstance(part, ImagePart):
+                picture = part.picture
+                name = self._image_resource(picture, images)
+                ops.append(f"q {picture.width:.2f} 0 0 {picture.height:.2f} {left + part.x:.2f} {baseline:.2f} cm "
+                           f"/{name} Do Q")
+                continue
+            style = part.style
+            color = " ".join(f"{component:.3f}" for component in style.color)
+            text_ops = f"BT /{self.pdf.font(style.font)} {style.size:.2f} Tf {color} rg "
+            if part.word_spacing:
+                text_ops += f"{part.word_spacing:.3f} Tw "
+            if style.rise:
+                text_ops += f"{style.rise:.2f} Ts "
+            ops.append(text_ops + f"{left + part.x:.2f} {baseline:.2f} Td ({escape_pdf_text(part.text)}) Tj ET")
+            text = part.text.rstrip(" ")
+            decoration_width = part.width - (len(part.text) - len(text)) * (
+                self._widths(style.font)[32] * style.size + part.word_spacing)
+            for flag, offset in ((style.underline, -0.12), (style.strike, 0.3)):
+                if flag and decoration_width > 0:
+                    y = baseline + style.rise + style.size * offset
+                    ops.append(f"{style.size * 0.05:.2f} w {color} RG {left + part.x:.2f} {y:.2f} m "
+                               f"{left + part.x + decoration_width:.2f} {y:.2f} l S")
+
+    def _image_resource(self, picture, images):
+        """Embarque une image une seule fois par document et la référence dans la page."""
+        if picture.key not in self._image_ids:
+            image, _ = read_image(io.BytesIO(picture.blob))
+            self._image_ids[picture.key] = self.pdf.add_image(**image)
+        image_id = self._image_ids[picture.key]
+        for name, existing in images.items():
+            if existing == image_id:
+                return name
+        name = f"Im{len(images) + 1}"
+        images[name] = image_id
+        return name
+
+    def _story_lines(self, story, fields):
+        """Lignes d'un en-tête ou d'un pied de page, avec les numéros de page de la page courante."""
+        lines = []
+        for paragraph in story.paragraphs:
+            _, paragraph_lines = self.paragraph_lines(paragraph, self.width, fields)
+            lines.extend(line._replace(page_break=False) for line in paragraph_lines)
+        return lines
+
+
+class _Numbering:
+    """Numéros et puces des listes, d'après la partie numbering du document."""
+
+    def __init__(self, document):
+        try:
+            self._numbering = document.part.numbering_part.element
+        except (KeyError, NotImplementedError):
+            self._numbering = None
+        self._levels = {}
+        self._counters = {}
+
+    def label(self, p, style):
+        """
+        Retourne (texte, retrait, retrait négatif) de l'étiquette d'un paragraphe
+        de liste, en avançant son compteur ; None pour un paragraphe hors liste.
+        """
+        num_pr = p.pPr.numPr if p.pPr is not None else None
+        for item in _style_chain(style):
+            if num_pr is not None and num_pr.numId is not None:
+                break
+            p_pr = item.element.pPr
+            num_pr = p_pr.numPr if p_pr is not None else None
+        if num_pr is None or num_pr.numId is None or not num_pr.numId.val or self._numbering is None:
+            return None
+        num_id = num_pr.numId.val
+        level = num_pr.ilvl.val if num_pr.ilvl is not None else 0
+        definition = self._level(num_id, level)
+        if definition is None:
+            return None
+
+        counters = self._counters.setdefault(num_id, {})
+        counters[level] = counters[level] + 1 if level in counters else definition["start"]
+        for deeper in [key for key in counters if key > level]:
+            del counters[deeper]
+
+        if definition["format"] == "bullet":
+            text = definition["text"]
+            if not text or any(ord(char) >= 0xE000 for char in text) or to_pdf_text(text) != text:
+                text = BULLET
+        else:
+            def number(match):
+                index = int(match.group(1)) - 1
+                parent = self._level(num_id, index)
+                value = counters.get(index, parent["start"] if parent else 1)
+                return _format_number(value, parent["format"] if parent else "decimal")
+            text = re.sub(r"%(\d)", number, definition["text"])
+        return text, definition["left"], definition["hanging"]
+
+    def _level(self, num_id, level):
+        key = (num_id, level)
+        if key not in self._levels:
+            self._levels[key] = self._read_level(num_id, level)
+        return self._levels[key]
+
+    def _read_level(self, num_id, level):
+        numbering = self._numbering
+        num_id, level = str(num_id), str(level)
+        abstract_ids = _xpath(numbering, "w:num[@w:numId=$num]/w:abstractNumId/@w:val", num=num_id)
+        if not abstract_ids:
+            return None
+        levels = _xpath(numbering, "w:abstractNum[@w:abstractNumId=$abstract]/w:lvl[@w:ilvl=$level]",
+                        abstract=abstract_ids[0], level=level)
+        if not levels:
+            return None
+        lvl = levels[0]
+
+        def value(path, default=None):
+            found = _xpath(lvl, path)
+            return found[0] if found else default
+
+        start = _xpath(numbering, "w:num[@w:numId=$num]/w:lvlOverride[@w:ilvl=$level]/w:startOverride/@w:val",
+                       num=num_id, level=level) or [value("w:start/@w:val", "1")]
+        indent = value("w:pPr/w:ind")
+        left = hanging = 0
+        if indent is not None:
+            left = int(indent.get(_w("left")) or indent.get(_w("start")) or 0) / TWIPS_PER_POINT
+            hanging = int(indent.get(_w("hanging")) or 0) / TWIPS_PER_POINT
+        return {
+            "format": value("w:numFmt/@w:val", "decimal"),
+            "text": value("w:lvlText/@w:val", ""),
+            "start": int(start[0]),
+            "left": left,
+            "hanging": hanging,
+        }
+
+
+def _iter_run_content(p):
+    """
+    Parcourt le contenu d'un paragraphe dans l'ordre : (élément w:r, type, valeur)
+    avec les types "text", "picture", "field" (nom, résultat enregistré) et
+    "break" (tabulation, saut de ligne ou de page). Les champs PAGE et NUMPAGES
+    sont remplacés par un élément "field" ; le résultat des autres est gardé.
+    """
+    from docx.oxml.ns import qn
+
+    field = {"mode": None, "instr": "", "name": None, "emitted": False}
+    containers = {qn(f"w:{tag}") for tag in ("hyperlink", "ins", "smartTag", "customXml", "sdt", "sdtContent")}
+    tags = {name: qn(f"w:{name}") for name in (
+        "r", "t", "tab", "br", "cr", "noBreakHyphen", "drawing", "fldChar", "instrText", "fldSimple", "rPr",
+    )}
+
+    def walk(element):
+        for child in element:
+            if child.tag == tags["r"]:
+                yield from run_content(child)
+            elif child.tag == tags["fldSimple"]:
+                name = _field_name(child.get(qn("w:instr")))
+                if name in PAGE_FIELDS:
+                    runs = list(child.iterchildren(tags["r"]))
+                    if runs:
+                        cached = "".join(t.text or "" for run in runs for t in run.iterchildren(tags["t"]))
+                        yield runs[0], "field", (name, cached)
+                else:
+                    yield from walk(child)
+            elif child.tag in containers:
+                yield from walk(child)
+
+    def run_content(r):
+        for child in r:
+            tag = child.tag
+            if tag == tags["fldChar"]:
+                kind = child.get(qn("w:fldCharType"))
+                if kind == "begin":
+                    field.update(mode="instr", instr="", name=None, emitted=False)
+                elif kind == "separate":
+                    field["name"] = _field_name(field["instr"])
+                    field["mode"] = "result"
+                    if field["name"] in PAGE_FIELDS:
+                        field["emitted"] = True
+                        yield r, "field", (field["name"], "")
+                elif kind == "end":
+                    if field["mode"] == "instr" and _field_name(field["instr"]) in PAGE_FIELDS:
+                        yield r, "field", (_field_name(field["instr"]), "")
+                    field["mode"] = None
+                continue
+            if tag == tags["instrText"]:
+                if field["mode"] == "instr":
+                    field["instr"] += child.text or ""
+                continue
+            if field["mode"] == "instr" or (field["mode"] == "result" and field["emitted"]):
+                continue
+            if tag == tags["t"]:
+                if child.text:
+                    yield r, "text", child.text
+            elif tag == tags["tab"]:
+                yield r, "break", "\t"
+            elif tag == tags["br"]:
+                yield r, "break", PAGE_BREAK if child.get(qn("w:type")) == "page" else LINE_BREAK
+            elif tag == tags["cr"]:
+                yield r, "break", LINE_BREAK
+            elif tag == tags["noBreakHyphen"]:
+                yield r, "text", "-"
+            elif tag == tags["drawing"]:
+                yield r, "picture", child
+
+    yield from walk(p)
+
+
+def _field_name(instruction):
+    words = (instruction or "").split()
+    return words[0].upper() if words else None
+
+
+def _document_defaults(document):
+    """Police et espacements par défaut du document (docDefaults de styles.xml)."""
+    element = document.styles.element
+
+    def value(path):
+        found = _xpath(element, path)
+        return found[0] if found else None
+
+    size = value("w:docDefaults/w:rPrDefault/w:rPr/w:sz/@w:val")
+    line = value("w:docDefaults/w:pPrDefault/w:pPr/w:spacing/@w:line")
+    line_rule = value("w:docDefaults/w:pPrDefault/w:pPr/w:spacing/@w:lineRule")
+    before = value("w:docDefaults/w:pPrDefault/w:pPr/w:spacing/@w:before")
+    after = value("w:docDefaults/w:pPrDefault/w:pPr/w:spacing/@w:after")
+    return {
+        "font_size": int(size) / 2 if size else DEFAULT_FONT_SIZE,
+        "font_name": value("w:docDefaults/w:rPrDefault/w:rPr/w:rFonts/@w:ascii"),
+        "line_spacing": int(line) / 240 if line and line_rule in (None, "auto") else 1.0,
+        "space_before": int(before) / TWIPS_PER_POINT if before else 0,
+        "space_after": int(after) / TWIPS_PER_POINT if after else 0,
+    }
+
+
+def _has_borders(table):
+    """Bordures du tableau, déclarées sur le tableau ou sur son style."""
+    candidates = [table._tbl] + [style.element for style in _style_chain(table.style)]
+    for element in candidates:
+        borders = _xpath(element, "w:tblPr/w:tblBorders/*")
+        if borders:
+            return any(border.get(_w("val")) not in ("nil", "none") for border in borders)
+    return False
+
+
+@lru_cache(maxsize=None)
+def _compile_xpath(path):
+    from lxml import etree
+    from docx.oxml.ns import nsmap
+    return etree.XPath(path, namespaces=nsmap)
+
+
+def _xpath(element, path, **variables):
+    """XPath avec les préfixes de python-docx, y compris sur les éléments qu'il ne modélise pas."""
+    return _compile_xpath(path)(element, **variables)
+
+
+def _style_chain(style):
+    while style is not None:
+        yield style
+        style = style.base_style
+
+
+def _first(values, default=None):
+    """Première valeur définie (les propriétés non renseignées valent None dans python-docx)."""
+    for value in values:
+        if value is not None:
+            return value
+    return default
+
+
+def _points(length, default):
+    return length.pt if length is not None else default
+
+
+def _w(name):
+    from docx.oxml.ns import qn
+    return qn(f"w:{name}")
+
+
+def _font_family(name):
+    """Police standard la plus proche d'une police du document."""
+    name = (name or "").lower()
+    if any(keyword in name for keyword in MONOSPACE_FONTS):
+        return "courier"
+    if "sans" not in name and any(keyword in name for keyword in SERIF_FONTS):
+        return "times"
+    return "helvetica"
+
+
+def _format_number(value, number_format):
+    if number_format in ("lowerLetter", "upperLetter"):
+        letters = ""
+        while value > 0:
+            value, remainder = divmod(value - 1, 26)
+            letters = chr(ord("a") + remainder) + letters
+        return letters.upper() if number_format == "upperLetter" else letters
+    if number_format in ("lowerRoman", "upperRoman"):
+        numeral = ""
+        for amount, symbol in ROMAN_NUMERALS:
+            count, value = divmod(value, amount)
+            numeral += symbol * count
+        return numeral.upper() if number_format == "upperRoman" else numeral
+    if number_format == "decimalZero":
+        return f"{value:02d}"
+    if number_format == "none":
+        return ""
+    return str(value)
@@ -0,0 +1,179 @@
+import io
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+from PIL import GifImagePlugin, Image, ImageSequence, TiffImagePlugin
+
+from converter.instrumentation import file_size, stage
+from converter.utils import build_output_path
+from .image_converter import (
+    RESIZE_SETTINGS, convert_image, get_image_options, get_save_params, merge_images_pdf, prepare_mode,
+)
+from .image_pdf import image_dpi, render_frames_pdf
+
+# Formats déjà compressés : inutile de les recompresser dans le ZIP
+COMPRESSED_FORMATS = ["PNG", "JPEG", "GIF", "WEBP"]
+# Durée d'une image d'animation qui n'en déclare pas (ms)
+DEFAULT_FRAME_DURATION = 100
+# Index de palette réservé à la transparence dans les GIF produits
+GIF_TRANSPARENT_INDEX = 255
+
+
+def count_frames(input_path):
+    """Nombre d'images d'un fichier, lu sans décoder les pixels."""
+    with Image.open(input_path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def convert_frames(input_path, output_dir, source_format, target_format, options=None):
+    """
+    Convertit une image à plusieurs frames (GIF ou WEBP animé, TIFF multipage).
+
+    Les frames sont lues une à une (ImageSequence) et écrites au fur et à
+    mesure : en animation (GIF, WEBP), en pages (TIFF, PDF) ou dans un ZIP
+    d'images pour les autres formats. Seules une ou deux frames sont en mémoire.
+    Une image à une seule frame, ou l'option "first_frame", est convertie comme
+    une image simple. Plusieurs images fusionnées en PDF (option "merge") sont
+    confiées à merge_images_pdf.
+    """
+    options = options or {}
+    if target_format.lower() == "pdf" and options.get("merge"):
+        return merge_images_pdf(input_path, output_dir, options)
+    if options.get("first_frame") or count_frames(input_path) == 1:
+        return convert_image(input_path, output_dir, source_format, target_format, options)
+
+    save_format = "JPEG" if target_format.lower() in ["jpg", "jpeg"] else target_format.upper()
+    image_options = get_image_options(options)
+
+    with Image.open(input_path) as source, stage("frames", bytes_in=file_size(input_path)) as info:
+        if save_format == "PDF":
+            output_path = build_output_path(input_path, output_dir, "pdf")
+            frames = _iter_frames(source, image_options, None)
+            render_frames_pdf((frame for frame, _ in frames), output_path, _scaled_dpi(source, image_options))
+        elif save_format == "GIF":
+            output_path = build_output_path(input_path, output_dir, target_format)
+            _write_gif(source, output_path, image_options)
+        elif save_format == "WEBP":
+            output_path = build_output_path(input_path, output_dir, target_format)
+            _write_webp(source, output_path, image_options)
+        elif save_format == "TIFF":
+            output_path = build_output_path(input_path, output_dir, target_format)
+            _write_tiff(source, output_path, image_options)
+        else:
+            output_path = build_output_path(input_path, output_dir, "zip")
+            _write_zip(source, output_path, target_format, save_format, image_options)
+        info["bytes_out"] = file_size(output_path)
+    return output_path
+
+
+def _transform(frame, image_options, save_format):
+    """Copie une frame (détachée de la source) réduite et au mode du format cible."""
+    frame = frame.copy()
+    if image_options["max_width"] or image_options["max_height"]:
+        resize = RESIZE_SETTINGS["fast" if image_options["preset"] == "fast" else "default"]
+        frame.thumbnail((image_options["max_width"] or frame.width, image_options["max_height"] or frame.height),
+                        **resize)
+    return prepare_mode(frame, save_format) if save_format else frame
+
+
+def _iter_frames(source, image_options, save_format):
+    """Génère (frame transformée, durée en ms), une frame décodée à la fois."""
+    for frame in ImageSequence.Iterator(source):
+        yield _transform(frame, image_options, save_format), frame.info.get("duration") or DEFAULT_FRAME_DURATION
+
+
+def _scaled_dpi(source, image_options):
+    """Résolution des pages PDF : une frame réduite garde la taille physique de l'original."""
+    dpi = image_dpi(source.info)
+    width, height = source.size
+    max_width, max_height = image_options["max_width"] or width, image_options["max_height"] or height
+    scale = min(max_width / width, max_height / height, 1)
+    return dpi[0] * scale, dpi[1] * scale
+
+
+def _write_gif(source, output_path, image_options):
+    """
+    Écrit un GIF animé frame par frame avec les fonctions d'écriture de Pillow
+    (getheader, getdata) : Image.save(save_all=True) garde toutes les frames
+    en mémoire pour les comparer.
+    """
+    with open(output_path, "wb") as f:
+        for index, (frame, duration) in enumerate(_iter_frames(source, image_options, "GIF")):
+            frame, transparency = _to_palette(frame)
+            if index == 0:
+                header, _ = GifImagePlugin.getheader(frame, info={"loop": source.info.get("loop", 0)})
+                f.write(b"".join(header))
+            params = {"duration": duration, "disposal": 2, "include_color_table": True}
+            if transparency is not None:
+                params["transparency"] = transparency
+            for chunk in GifImagePlugin.getdata(frame, **params):
+                f.write(chunk)
+        f.write(b";")
+
+
+def _to_palette(frame):
+    """Convertit une frame en palette ; les pixels transparents prennent l'index GIF_TRANSPARENT_INDEX."""
+    if frame.mode in ("P", "L"):
+        return frame, frame.info.get("transparency")
+    if frame.mode != "RGBA":
+        return frame.convert("RGB").convert("P", palette=Image.Palette.ADAPTIVE), None
+    paletted = frame.convert("RGB").convert("P", palette=Image.Palette.ADAPTIVE, colors=GIF_TRANSPARENT_INDEX)
+    transparent = frame.getchannel("A").point(lambda alpha: 255 if alpha < 128 else 0)
+    paletted.paste(GIF_TRANSPARENT_INDEX, mask=transparent)
+    return paletted, GIF_TRANSPARENT_INDEX
+
+
+class _LazyFrames:
+    """
+    Frames transformées à la demande, passées en `append_images` à l'encodeur
+    WEBP de Pillow : il les parcourt lui-même avec seek(), et une seule frame
+    transformée existe à la fois.
+    """
+
+    def __init__(self, source, transform, first):
+        self._source = source
+        self._transform = transform
+        self._first = first
+        self.n_frames = source.n_frames - first
+        self.seek(0)
+
+    def seek(self, index):
+        self._source.seek(self._first + index)
+        self._frame = self._transform(self._source)
+
+    def __getattr__(self, name):
+        return getattr(self._frame, name)
+
+
+def _write_webp(source, output_path, image_options):
+    # Les durées sont lues avant l'encodage : l'encodeur les attend en une liste
+    durations = [frame.info.get("duration") or DEFAULT_FRAME_DURATION for frame in ImageSequence.Iterator(source)]
+
+    def transform(frame):
+        return _transform(frame, image_options, "WEBP")
+
+    source.seek(0)
+    first = transform(source)
+    first.save(
+        output_path, "WEBP", save_all=True, append_images=[_LazyFrames(source, transform, 1)],
+        duration=durations, loop=source.info.get("loop", 0), **get_save_params("WEBP", image_options),
+    )
+
+
+def _write_tiff(source, output_path, image_options):
+    """TIFF multipage écrit page par page (comme Image.save(save_all=True), mais avec les frames transformées)."""
+    params = get_save_params("TIFF", image_options)
+    with TiffImagePlugin.AppendingTiffWriter(output_path, new=True) as tiff:
+        for frame, _ in _iter_frames(source, image_options, "TIFF"):
+            frame.save(tiff, "TIFF", **params)
+            tiff.newFrame()
+
+
+def _write_zip(source, output_path, target_format, save_format, image_options):
+    """ZIP d'une image par frame (frame_1.png, frame_2.png...), chacune écrite puis libérée."""
+    params = get_save_params(save_format, image_options)
+    compression = ZIP_STORED if save_format in COMPRESSED_FORMATS else ZIP_DEFLATED
+    with ZipFile(output_path, "w", compression=compression) as archive:
+        for index, (frame, _) in enumerate(_iter_frames(source, image_options, save_format), start=1):
+            buffer = io.BytesIO()
+            frame.save(buffer, save_format, **params)
+            archive.writestr(f"frame_{index}.{target_format}", buffer.getvalue())
@@ -1,22 +1,156 @@
 import os
-from PIL import Image
+
 from django.conf import settings
+from PIL import Image
+
+from converter.instrumentation import file_size, stage
+from converter.utils import build_output_path
+from .image_pdf import render_images_pdf
+
+# Réglages des encodeurs Pillow par préréglage ("balanced" : valeurs par défaut)
+ENCODER_PRESETS = {
+    "fast": {
+        "JPEG": {"optimize": False, "progressive": False},
+        "PNG": {"compress_level": 1},
+        "WEBP": {"method": 0},
+        "TIFF": {"compression": "raw"},
+    },
+    "balanced": {},
+    "small": {
+        "JPEG": {"optimize": True, "progressive": True},
+        "PNG": {"compress_level": 9, "optimize": True},
+        "WEBP": {"method": 6},
+        "GIF": {"optimize": True},
+        "TIFF": {"compression": "tiff_adobe_deflate"},
+    },
+}
+QUALITY_FORMATS = ["JPEG", "WEBP"]
+
+# Modes enregistrés tels quels par chaque format ; les autres images sont
+# converties en RGBA si le format garde la transparence, en RGB sinon
+SAVE_MODES = {
+    "JPEG": {"L", "RGB", "CMYK"},
+    "PNG": {"1", "L", "LA", "P", "RGB", "RGBA"},
+    "WEBP": {"RGB", "RGBA"},
+    "GIF": {"L", "P", "RGB", "RGBA"},
+    "TIFF": {"1", "L", "LA", "P", "RGB", "RGBA", "CMYK"},
+    "ICO": {"RGB", "RGBA"},
+    "BMP": {"1", "L", "P", "RGB"},
+}
+ALPHA_MODES = {"RGBA", "LA", "PA"}
+# Couleur de fond des images transparentes enregistrées sans transparence
+FLATTEN_BACKGROUND = (255, 255, 255)
+
+# Réduction à la lecture : les JPEG sont décodés directement à 1/2, 1/4 ou 1/8
+# (draft) puis réduits par moyenne de blocs (reduce), tant que l'image reste au
+# moins `reducing_gap` fois plus grande que la cible ; le rééchantillonnage
+# final ne porte donc que sur peu de pixels.
+RESIZE_SETTINGS = {
+    "fast": {"resample": Image.Resampling.BILINEAR, "reducing_gap": 2.0},
+    "default": {"resample": Image.Resampling.LANCZOS, "reducing_gap": 3.0},
+}
+
+
+def get_merged_paths(input_path, options):
+    """
+    Chemins des images à fusionner dans un même PDF : l'image principale puis
+    celles de l'option "merge" (noms de fichiers du même répertoire de job).
+    """
+    input_dir = os.path.dirname(input_path)
+    names = (options or {}).get("merge") or []
+    return [input_path] + [os.path.join(input_dir, os.path.basename(name)) for name in names]
+
+
+def get_image_options(options):
+    """
+    Extrait les options d'encodage d'image : dimensions maximales (l'image est
+    réduite en gardant ses proportions, jamais agrandie), qualité (JPEG, WEBP)
+    et préréglage des encodeurs ("fast", "balanced", "small").
+    """
+    options = options or {}
+    preset = options.get("preset") or getattr(settings, "CONVERTER_IMAGE_PRESET", "balanced")
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"Unknown image preset: {preset} (expected one of {', '.join(ENCODER_PRESETS)})")
+    quality = options.get("quality")
+    return {
+        "max_width": int(options["max_width"]) if options.get("max_width") else None,
+        "max_height": int(options["max_height"]) if options.get("max_height") else None,
+        "quality": max(1, min(int(quality), 95)) if quality else None,
+        "preset": preset,
+    }
+
+
+def get_save_params(save_format, image_options):
+    """Paramètres de `Image.save` pour un format, selon le préréglage et la qualité demandée."""
+    params = dict(ENCODER_PRESETS[image_options["preset"]].get(save_format, {}))
+    if image_options["quality"] and save_format in QUALITY_FORMATS:
+        params["quality"] = image_options["quality"]
+    return params
+
+
+def prepare_mode(img, save_format):
+    """
+    Adapte le mode de l'image au format cible : la transparence est gardée si
+    le format la supporte, sinon l'image est aplatie sur un fond blanc.
+    """
+    modes = SAVE_MODES.get(save_format)
+    if modes is None or img.mode in modes:
+        return img
+    has_alpha = img.mode in ALPHA_MODES or "transparency" in img.info
+    if not has_alpha:
+        return img.convert("RGB")
+    rgba = img.convert("RGBA")
+    if "RGBA" in modes:
+        return rgba
+    background = Image.new("RGBA", rgba.size, FLATTEN_BACKGROUND + (255,))
+    return Image.alpha_composite(background, rgba).convert("RGB")
+
+
+def load_image(input_path, image_options):
+    """
+    Décode une image, réduite dès le décodage si des dimensions maximales sont
+    demandées (voir RESIZE_SETTINGS).
+    """
+    img = Image.open(input_path)
+    max_width, max_height = image_options["max_width"], image_options["max_height"]
+    if max_width or max_height:
+        resize = RESIZE_SETTINGS["fast" if image_options["preset"] == "fast" else "default"]
+        # thumbnail() applique draft() puis reduce() avant le rééchantillonnage
+        img.thumbnail((max_width or img.width, max_height or img.height), **resize)
+    else:
+        img.load()
+    return img
+
+
+def merge_images_pdf(input_path, output_dir, options=None):
+    """
+    Écrit dans un même PDF l'image principale et celles de l'option "merge" :
+    une page par image, et par frame pour un TIFF multipage ou une animation,
+    quel que soit le format de la première image.
+    """
+    target_path = build_output_path(input_path, output_dir, "pdf")
+    image_paths = get_merged_paths(input_path, options)
+    with stage("render", bytes_in=sum(file_size(path) for path in image_paths)) as info:
+        render_images_pdf(image_paths, target_path)
+        info["bytes_out"] = file_size(target_path)
+    return target_path
 
-from converter.utils import conversion_default_exception
 
-def convert_image(instance):
-    try:
-        file_name = os.path.basename(instance.input_file.name)
-        file_root, _ = os.path.splitext(file_name)
-        target_path = os.path.join(settings.MEDIA_ROOT, f"converted/{file_root}.{instance.target_format}")
+def convert_image(input_path, output_dir, source_format, target_format, options=None):
+    """Convertit une image vers un autre format d'image ou en PDF (une page par image)."""
+    if target_format.lower() == "pdf":
+        return merge_images_pdf(input_path, output_dir, options)
 
-        format_to_save = "JPEG" if instance.target_format.lower() in ["jpg", "jpeg"] else instance.target_format.upper()
+    target_path = build_output_path(input_path, output_dir, target_format)
+    format_to_save = "JPEG" if target_format.lower() in ["jpg", "jpeg"] else target_format.upper()
+    image_options = get_image_options(options)
 
-        img = Image.open(instance.input_file.path).convert("RGB")
-        img.save(target_path, format_to_save)
-        instance.output_file.name = target_path
-        instance.converted = True
-        instance.error_message = None
-        instance.save()
-    except Exception as e:
-        conversion_default_exception(instance, e)
+    with stage("decode", bytes_in=file_size(input_path)):
+        img = load_image(input_path, image_options)
+    with stage("encode") as info:
+        with img:
+            prepare_mode(img, format_to_save).save(
+                target_path, format_to_save, **get_save_params(format_to_save, image_options)
+            )
+        info["bytes_out"] = file_size(target_path)
+    return target_path
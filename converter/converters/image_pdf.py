@@ -0,0 +1,178 @@
+import contextlib
+import struct
+
+from .pdf_writer import PdfStreamWriter
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Types de couleur PNG dont le flux IDAT peut être embarqué tel quel :
+# (espace de couleur PDF, nombre de composantes). Les types avec alpha (4, 6)
+# doivent être décodés pour séparer le masque.
+PNG_COLOR_TYPES = {
+    0: ("DeviceGray", 1),
+    2: ("DeviceRGB", 3),
+    3: ("Indexed", 1),
+}
+JPEG_COLOR_SPACES = {
+    "L": "DeviceGray",
+    "RGB": "DeviceRGB",
+}
+# Résolution supposée d'une image qui n'en déclare pas (celle de Pillow)
+DEFAULT_DPI = 72
+
+
+def render_images_pdf(image_paths, output_path):
+    """
+    Écrit une page par image dans un PDF, en flux : chaque image est lue,
+    écrite dans le fichier puis libérée avant la suivante.
+
+    Les JPEG (niveaux de gris ou RGB) et les PNG sans transparence ni
+    entrelacement sont embarqués sans être décodés, donc sans perte ni
+    recompression. Les autres images sont décodées et compressées sans perte,
+    à raison d'une page par frame (TIFF multipage, GIF ou WEBP animé).
+    La taille de chaque page est celle de l'image à sa résolution.
+
+    Returns:
+        dict: nombre de pages embarquées telles quelles ("passthrough") et décodées ("decoded").
+    """
+    from PIL import Image, ImageSequence
+
+    counts = {"passthrough": 0, "decoded": 0}
+    with PdfStreamWriter(output_path) as pdf:
+        for path in image_paths:
+            image, dpi = _read_passthrough(path)
+            if image is not None:
+                _add_image_page(pdf, image, dpi)
+                counts["passthrough"] += 1
+                continue
+            with Image.open(path) as decoded:
+                # Frames décodées une à une
+                for frame in ImageSequence.Iterator(decoded):
+                    _add_image_page(pdf, _pixel_image(frame), image_dpi(frame.info))
+                    counts["decoded"] += 1
+    return counts
+
+
+def render_frames_pdf(frames, output_path, dpi):
+    """
+    Écrit une page par image d'une suite d'images déjà décodées (pages d'un
+    TIFF, images d'une animation), consommée au fur et à mesure.
+
+    Returns:
+        int: nombre de pages écrites.
+    """
+    with PdfStreamWriter(output_path) as pdf:
+        for frame in frames:
+            _add_image_page(pdf, _pixel_image(frame), dpi)
+        return pdf.page_count
+
+
+def read_image(source):
+    """
+    Lit une image (chemin ou fichier binaire) pour PdfStreamWriter.add_image :
+    embarquée telle quelle si possible, décodée sinon.
+
+    Returns:
+        tuple: (arguments de add_image, résolution).
+    """
+    from PIL import Image
+
+    image, dpi = _read_passthrough(source)
+    if image is None:
+        with _open_binary(source) as f, Image.open(f) as decoded:
+            image, dpi = _pixel_image(decoded), image_dpi(decoded.info)
+    return image, dpi
+
+
+def _add_image_page(pdf, image, dpi):
+    """Ajoute une page à la taille de l'image (à sa résolution), occupée par l'image."""
+    image_id = pdf.add_image(**image)
+    page_width, page_height = image["width"] * 72 / dpi[0], image["height"] * 72 / dpi[1]
+    pdf.add_page(
+        f"q {page_width:.2f} 0 0 {page_height:.2f} 0 0 cm /Im1 Do Q".encode("ascii"),
+        page_width, page_height, images={"Im1": image_id},
+    )
+
+
+def image_dpi(info):
+    """Résolution (horizontale, verticale) déclarée par l'image, ou DEFAULT_DPI."""
+    dpi = info.get("dpi") or (DEFAULT_DPI, DEFAULT_DPI)
+    return tuple(float(value) if value and value > 1 else DEFAULT_DPI for value in dpi[:2])
+
+
+def _open_binary(source):
+    """Ouvre un chemin, ou rembobine un fichier déjà ouvert (qui reste ouvert à la sortie)."""
+    if hasattr(source, "read"):
+        source.seek(0)
+        return contextlib.nullcontext(source)
+    return open(source, "rb")
+
+
+def _read_passthrough(path):
+    """Lit une image embarquable sans décodage : (arguments de add_image, dpi), ou (None, None)."""
+    from PIL import Image
+
+    with _open_binary(path) as f, Image.open(f) as image:
+        fmt, mode, size, info = image.format, image.mode, image.size, dict(image.info)
+    dpi = image_dpi(info)
+
+    if fmt == "JPEG" and mode in JPEG_COLOR_SPACES:
+        with _open_binary(path) as f:
+            data = f.read()
+        return {
+            "data": data, "width": size[0], "height": size[1],
+            "color_space": JPEG_COLOR_SPACES[mode], "filter_name": "DCTDecode",
+        }, dpi
+    if fmt == "PNG" and "transparency" not in info:
+        return _read_png(path), dpi
+    return None, None
+
+
+def _read_png(path):
+    """
+    Extrait le flux IDAT d'un PNG (déjà compressé en Flate avec les prédicteurs
+    PNG, que le PDF sait lire). Retourne None si le PNG ne s'y prête pas.
+    """
+    palette = None
+    idat = []
+    with _open_binary(path) as f:
+        if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">I4s", header)
+            data = f.read(length)
+            f.seek(4, 1)  # CRC
+            if chunk_type == b"IHDR":
+                width, height, bits, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data)
+                if color_type not in PNG_COLOR_TYPES or interlace or bits > 8:
+                    return None
+            elif chunk_type == b"PLTE":
+                palette = data
+            elif chunk_type == b"tRNS":
+                return None
+            elif chunk_type == b"IDAT":
+                idat.append(data)
+            elif chunk_type == b"IEND":
+                break
+
+    color_space, colors = PNG_COLOR_TYPES[color_type]
+    if color_space == "Indexed":
+        if palette is None:
+            return None
+        color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]".encode("ascii")
+    return {
+        "data": b"".join(idat), "width": width, "height": height, "color_space": color_space, "bits": bits,
+        "filter_name": "FlateDecode",
+        "decode_parms": f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bits} /Columns {width} >>".encode("ascii"),
+    }
+
+
+def _pixel_image(image):
+    """Pixels bruts d'une image (niveaux de gris ou RGB), compressés sans perte dans le PDF."""
+    image = image.convert("L" if image.mode in ("1", "L") else "RGB")
+    return {
+        "data": image.tobytes(), "width": image.width, "height": image.height,
+        "color_space": "DeviceGray" if image.mode == "L" else "DeviceRGB", "compress": True,
+    }
@@ -0,0 +1,351 @@
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+# Filtres d'export LibreOffice selon le format cible et le type de document chargé
+EXPORT_FILTERS = {
+    "pdf": {
+        "text": "writer_pdf_Export",
+        "spreadsheet": "calc_pdf_Export",
+        "presentation": "impress_pdf_Export",
+    },
+    "docx": {"text": "MS Word 2007 XML"},
+    "odt": {"text": "writer8"},
+    "txt": {"text": "Text"},
+    "xlsx": {"spreadsheet": "Calc MS Excel 2007 XML"},
+    "xls": {"spreadsheet": "MS Excel 97"},
+    "csv": {"spreadsheet": "Text - txt - csv (StarCalc)"},
+    "pptx": {"presentation": "Impress MS PowerPoint 2007 XML"},
+    "odp": {"presentation": "impress8"},
+}
+
+DOCUMENT_SERVICES = {
+    "presentation": "com.sun.star.presentation.PresentationDocument",
+    "spreadsheet": "com.sun.star.sheet.SpreadsheetDocument",
+    "text": "com.sun.star.text.TextDocument",
+}
+
+
+class LibreOfficeUnavailable(Exception):
+    """Le pool LibreOffice ne peut pas traiter la conversion (UNO absent, démarrage impossible...)."""
+
+
+class LibreOfficeTimeout(Exception):
+    """Un document n'a pas été converti à temps : l'instance a été tuée."""
+
+
+def get_job_timeout():
+    """Durée maximale (en secondes) du chargement et de l'export d'un document."""
+    return _setting("CONVERTER_LIBREOFFICE_JOB_TIMEOUT", 300)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _profile_url(profile_dir):
+    return Path(profile_dir).resolve().as_uri()
+
+
+class LibreOfficeInstance:
+    """Instance headless de LibreOffice, avec son propre profil, pilotée via UNO."""
+
+    def __init__(self, binary):
+        self.binary = binary
+        self.pipe_name = f"file_converter_{uuid.uuid4().hex}"
+        self.profile_dir = None
+        self.process = None
+        self.desktop = None
+        self.jobs = 0
+        self.timed_out = False
+
+    def start(self):
+        """Démarre le processus soffice et se connecte à lui."""
+        self.profile_dir = tempfile.mkdtemp(prefix="lo_profile_")
+        command = [
+            self.binary,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            "--nodefault",
+            f"-env:UserInstallation={_profile_url(self.profile_dir)}",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.jobs = 0
+        self._connect(timeout=_setting("CONVERTER_LIBREOFFICE_START_TIMEOUT", 30))
+
+    def _connect(self, timeout):
+        """Se connecte au processus via le pipe UNO, en réessayant jusqu'au timeout."""
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process.poll() is not None:
+                raise LibreOfficeUnavailable("soffice exited during startup")
+            try:
+                context = resolver.resolve(f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext")
+                break
+            except NoConnectException:
+                if time.monotonic() > deadline:
+                    raise LibreOfficeUnavailable("Timed out while connecting to soffice")
+                time.sleep(0.2)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def is_healthy(self):
+        """Vérifie que le processus tourne et répond aux appels UNO."""
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, input_path, output_path, target_format):
+        """Convertit un document en le chargeant dans l'instance puis en l'exportant."""
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def properties(**values):
+            result = []
+            for name, value in values.items():
+                prop = PropertyValue()
+                prop.Name = name
+                prop.Value = value
+                result.append(prop)
+            return tuple(result)
+
+        def load_and_store():
+            document = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(input_path)), "_blank", 0, properties(Hidden=True, ReadOnly=True)
+            )
+            if document is None:
+                raise ValueError(f"LibreOffice could not load {input_path}")
+
+            try:
+                filter_name = _export_filter(document, target_format)
+                document.storeToURL(
+                    uno.systemPathToFileUrl(os.path.abspath(output_path)), properties(FilterName=filter_name, Overwrite=True)
+                )
+            finally:
+                document.close(True)
+
+        self.run_with_watchdog(load_and_store, get_job_timeout())
+        self.jobs += 1
+
+    def run_with_watchdog(self, call, timeout):
+        """
+        Exécute un appel UNO bloquant. S'il dure plus de `timeout` secondes
+        (document qui fait boucler LibreOffice), le processus est tué, ce qui
+        débloque l'appel, et LibreOfficeTimeout est levée : l'instance doit
+        alors être redémarrée.
+        """
+        self.timed_out = False
+        watchdog = threading.Timer(timeout, self.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            return call()
+        except Exception:
+            if self.timed_out:
+                raise LibreOfficeTimeout(f"LibreOffice conversion timed out after {timeout} seconds") from None
+            raise
+        finally:
+            watchdog.cancel()
+
+    def kill(self):
+        """Tue le processus sans attendre LibreOffice (appel UNO bloqué)."""
+        self.timed_out = True
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def stop(self):
+        """Arrête le processus et supprime son profil."""
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+def _export_filter(document, target_format):
+    """Choisit le filtre d'export adapté au document chargé."""
+    filters = EXPORT_FILTERS.get(target_format)
+    if not filters:
+        raise ValueError(f"Unsupported LibreOffice target format: {target_format}")
+    for kind, service in DOCUMENT_SERVICES.items():
+        if document.supportsService(service) and kind in filters:
+            return filters[kind]
+    raise ValueError(f"Unsupported LibreOffice conversion to {target_format}")
+
+
+class LibreOfficePool:
+    """
+    Pool d'instances LibreOffice persistantes.
+
+    Les instances sont démarrées à la demande, vérifiées avant chaque conversion,
+    redémarrées en cas d'échec (ou de dépassement du délai de conversion) et
+    recyclées après `max_jobs` conversions.
+    """
+
+    def __init__(self, size, max_jobs, binary="soffice", instance_class=LibreOfficeInstance):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.binary = binary
+        self.instance_class = instance_class
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                instance = self.instance_class(self.binary)
+                self._all.append(instance)
+                return instance
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise LibreOfficeUnavailable("No LibreOffice instance available")
+
+    def convert(self, input_path, output_path, target_format, timeout=None):
+        """Convertit un document avec une instance libre du pool."""
+        timeout = timeout or _setting("CONVERTER_LIBREOFFICE_ACQUIRE_TIMEOUT", 60)
+        instance = self._acquire(timeout)
+        try:
+            if not instance.is_healthy():
+                instance.restart()
+            try:
+                instance.convert(input_path, output_path, target_format)
+            except Exception:
+                # Une instance qui a échoué n'est pas réutilisée telle quelle
+                instance.restart()
+                raise
+            if instance.jobs >= self.max_jobs:
+                instance.restart()
+        except LibreOfficeUnavailable:
+            instance.stop()
+            raise
+        finally:
+            self._idle.put(instance)
+
+    def shutdown(self):
+        """Arrête toutes les instances du pool."""
+        with self._lock:
+            for instance in self._all:
+                instance.stop()
+            self._all = []
+            self._created = 0
+            self._idle = queue.LifoQueue()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Retourne le pool LibreOffice du processus, ou None s'il est désactivé ou si
+    le module UNO (pyuno) n'est pas disponible.
+    """
+    global _pool
+    size = _setting("CONVERTER_LIBREOFFICE_POOL_SIZE", 0)
+    if not size:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            try:
+                import uno  # noqa: F401
+            except ImportError:
+                return None
+            _pool = LibreOfficePool(
+                size=size,
+                max_jobs=_setting("CONVERTER_LIBREOFFICE_MAX_JOBS", 200),
+                binary=_setting("CONVERTER_LIBREOFFICE_BINARY", "soffice"),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def convert_with_soffice(input_path, output_path, target_format):
+    """
+    Conversion ponctuelle via `soffice --convert-to`, avec un profil temporaire
+    propre à l'appel pour que deux conversions simultanées ne se bloquent pas.
+    """
+    output_dir = os.path.dirname(output_path)
+    profile_dir = tempfile.mkdtemp(prefix="lo_profile_")
+    try:
+        command = [
+            _setting("CONVERTER_LIBREOFFICE_BINARY", "soffice"),
+            "--headless",
+            "--invisible",
+            f"-env:UserInstallation={_profile_url(profile_dir)}",
+            "--convert-to", target_format,
+            "--outdir", output_dir,
+            input_path,
+        ]
+        try:
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+                           timeout=get_job_timeout())
+        except subprocess.TimeoutExpired:
+            raise LibreOfficeTimeout(f"LibreOffice conversion timed out after {get_job_timeout()} seconds") from None
+    finally:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+    # soffice nomme la sortie d'après le fichier d'entrée
+    produced_path = os.path.join(output_dir, f"{Path(input_path).stem}.{target_format}")
+    if produced_path != output_path and os.path.exists(produced_path):
+        os.replace(produced_path, output_path)
+
+
+def convert_via_libreoffice(input_path, output_path, target_format):
+    """Convertit un fichier avec le pool LibreOffice, ou en ponctuel si le pool est indisponible."""
+    pool = get_pool()
+    if pool is not None:
+        try:
+            pool.convert(input_path, output_path, target_format)
+            return
+        except LibreOfficeUnavailable:
+            pass
+    convert_with_soffice(input_path, output_path, target_format)
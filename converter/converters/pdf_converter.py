@@ -1,52 +1,164 @@
+import io
+import multiprocessing
 import os
-from pdf2image import convert_from_path
-from zipfile import ZipFile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+from pdf2image import convert_from_path, pdfinfo_from_path
 from django.conf import settings
-from converter.utils import conversion_default_exception, delete_temporary_files
-
-def convert_pdf_to_images(instance):
-    """Convertit un fichier PDF en images et les sauvegarde dans un fichier ZIP."""
-    try:
-        # Déterminer le chemin vers Poppler si nécessaire
-        poppler_path = None
-        if os.name == "nt":  # Windows
-            poppler_path = r"C:/Program Files/poppler-24.08.0/Library/bin"
-
-        # Création du répertoire temporaire
-        temp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
-        os.makedirs(temp_dir, exist_ok=True)
-
-        fmt = "JPEG" if instance.target_format.lower() in ["jpg", "jpeg"] else instance.target_format.upper()
-
-        # Conversion du PDF en images
-        images = convert_from_path(
-            instance.input_file.path,
-            output_folder=temp_dir,
-            fmt=fmt,
-            poppler_path=poppler_path
-        )
-
-        # Création du fichier ZIP
-        file_name = os.path.basename(instance.input_file.name)
-        file_root, _ = os.path.splitext(file_name)
-        zip_path = os.path.join(settings.MEDIA_ROOT, f"converted/{file_root}.zip")
-
-        with ZipFile(zip_path, "w") as zipf:
-            for i, image in enumerate(images):
-                image_path = os.path.join(temp_dir, f"page_{i + 1}.{instance.target_format}")
-                try:
-                    image.save(image_path, fmt.upper())
-                    zipf.write(image_path, os.path.basename(image_path))
-                except Exception as e:
-                    raise ValueError(f"Error saving image {i + 1}: {e}")
-
-        # Mise à jour de l'instance après succès
-        instance.output_file.name = zip_path
-        instance.converted = True
-        instance.error_message = None
-        instance.save()
-
-    except Exception as e:
-        conversion_default_exception(instance, e)
-    finally:
-        delete_temporary_files(temp_dir)
+from converter.instrumentation import add_stage, file_size
+from converter.utils import build_output_path
+
+# Formats déjà compressés : inutile de les recompresser dans le ZIP
+COMPRESSED_FORMATS = ["png", "jpeg", "jpg", "gif", "webp"]
+
+
+def get_poppler_path():
+    """Détermine le chemin vers Poppler si nécessaire."""
+    if os.name == "nt":  # Windows
+        return r"C:/Program Files/poppler-24.08.0/Library/bin"
+    return None
+
+
+def get_render_options(options):
+    """Extrait les options de rendu (DPI, pages, niveaux de gris) des options de conversion."""
+    options = options or {}
+    return {
+        "dpi": int(options.get("dpi", getattr(settings, "CONVERTER_PDF_DPI", 200))),
+        "first_page": int(options["first_page"]) if options.get("first_page") else None,
+        "last_page": int(options["last_page"]) if options.get("last_page") else None,
+        "grayscale": bool(options.get("grayscale", False)),
+    }
+
+
+def get_render_workers():
+    """
+    Nombre de processus de rendu d'une conversion (CONVERTER_PDF_RENDER_WORKERS).
+
+    Par défaut, les coeurs sont partagés entre les conversions que la voie
+    pdf-raster exécute en même temps : sans cela, chacune lancerait autant de
+    processus que de coeurs.
+    """
+    workers = getattr(settings, "CONVERTER_PDF_RENDER_WORKERS", None)
+    if workers:
+        return workers
+    from converter.scheduler import get_lanes
+
+    concurrency = get_lanes()["pdf-raster"]["concurrency"]
+    return max(1, (os.cpu_count() or 1) // max(1, concurrency))
+
+
+def get_page_count(input_path):
+    """Retourne le nombre de pages d'un PDF."""
+    return int(pdfinfo_from_path(input_path, poppler_path=get_poppler_path())["Pages"])
+
+
+def image_save_format(target_format):
+    """Retourne le nom de format Pillow correspondant au format cible."""
+    return "JPEG" if target_format.lower() in ["jpg", "jpeg"] else target_format.upper()
+
+
+def render_pages(input_path, first_page, last_page, target_format, dpi=200, grayscale=False):
+    """
+    Rend un lot de pages et retourne la liste des pages encodées [(numéro, octets)].
+
+    Les images sont encodées en mémoire et libérées une par une : seul le lot
+    courant est présent en mémoire.
+    """
+    fmt = image_save_format(target_format)
+    images = convert_from_path(
+        input_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        grayscale=grayscale,
+        poppler_path=get_poppler_path(),
+    )
+
+    pages = []
+    for page_number, image in enumerate(images, start=first_page):
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, fmt)
+        image.close()
+        pages.append((page_number, buffer.getvalue()))
+    images.clear()
+    return pages
+
+
+def iter_rendered_pages(input_path, target_format, dpi=200, first_page=None, last_page=None, grayscale=False,
+                        batch_size=None, workers=None):
+    """
+    Génère les pages encodées (numéro, octets) dans l'ordre, rendues par lots en parallèle.
+
+    Le nombre de lots en cours est borné par le nombre de workers, ce qui garde
+    la mémoire constante quel que soit le nombre de pages.
+    """
+    batch_size = batch_size or getattr(settings, "CONVERTER_PDF_BATCH_SIZE", 8)
+    workers = workers or get_render_workers()
+    if multiprocessing.current_process().daemon:
+        # Processus d'un multiprocessing.Pool (convert_bulk) : il ne peut pas lancer
+        # de processus, et le pool occupe déjà les coeurs
+        workers = 1
+
+    page_count = get_page_count(input_path)
+    first_page = max(1, first_page or 1)
+    last_page = min(page_count, last_page or page_count)
+    if first_page > last_page:
+        raise ValueError(f"Invalid page range: {first_page}-{last_page} (document has {page_count} pages)")
+
+    batches = [
+        (start, min(start + batch_size - 1, last_page))
+        for start in range(first_page, last_page + 1, batch_size)
+    ]
+    render_args = (target_format, dpi, grayscale)
+
+    if workers == 1 or len(batches) == 1:
+        for start, end in batches:
+            yield from render_pages(input_path, start, end, *render_args)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+        pending = []
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            # Garde au plus `workers` lots en vol
+            while next_batch < len(batches) and len(pending) < workers:
+                start, end = batches[next_batch]
+                pending.append(executor.submit(render_pages, input_path, start, end, *render_args))
+                next_batch += 1
+            yield from pending.pop(0).result()
+
+
+def convert_pdf_to_images(input_path, output_dir, source_format, target_format, options=None, entry_name="page"):
+    """
+    Convertit un fichier PDF en images et les écrit directement dans un fichier ZIP.
+
+    Les images sont nommées `<entry_name>_<numéro>.<format>` ("slide" pour les présentations).
+    """
+    render_options = get_render_options(options)
+    zip_path = build_output_path(input_path, output_dir, "zip")
+
+    compression = ZIP_STORED if target_format.lower() in COMPRESSED_FORMATS else ZIP_DEFLATED
+    render_time = zip_time = 0.0
+    rendered_bytes = 0
+    with ZipFile(zip_path, "w", compression=compression) as zipf:
+        pages = iter_rendered_pages(input_path, target_format, **render_options)
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            render_time += time.perf_counter() - started
+            if page is None:
+                break
+
+            page_number, data = page
+            started = time.perf_counter()
+            zipf.writestr(f"{entry_name}_{page_number}.{target_format}", data)
+            zip_time += time.perf_counter() - started
+            rendered_bytes += len(data)
+
+    add_stage("rasterize", render_time, bytes_in=file_size(input_path), bytes_out=rendered_bytes)
+    add_stage("zip", zip_time, bytes_in=rendered_bytes, bytes_out=file_size(zip_path))
+    return zip_path
@@ -0,0 +1,205 @@
+import zlib
+from functools import lru_cache
+
+# Formats de page en points (1/72 de pouce)
+PAGE_SIZES = {
+    "a3": (841.89, 1190.55),
+    "a4": (595.28, 841.89),
+    "a5": (419.53, 595.28),
+    "letter": (612.0, 792.0),
+    "legal": (612.0, 1008.0),
+}
+
+# Polices standard PDF : aucune police à embarquer
+CORE_FONTS = {
+    "helvetica": "Helvetica",
+    "helveticaB": "Helvetica-Bold",
+    "helveticaI": "Helvetica-Oblique",
+    "helveticaBI": "Helvetica-BoldOblique",
+    "courier": "Courier",
+    "courierB": "Courier-Bold",
+    "courierI": "Courier-Oblique",
+    "courierBI": "Courier-BoldOblique",
+    "times": "Times-Roman",
+    "timesB": "Times-Bold",
+    "timesI": "Times-Italic",
+    "timesBI": "Times-BoldItalic",
+}
+
+
+def get_page_size(name="a4", landscape=False):
+    """Retourne (largeur, hauteur) en points pour un format de page."""
+    width, height = PAGE_SIZES.get((name or "a4").lower(), PAGE_SIZES["a4"])
+    return (height, width) if landscape else (width, height)
+
+
+def to_pdf_text(text):
+    """Convertit un texte vers le jeu de caractères des polices standard (WinAnsi)."""
+    return text.encode("cp1252", "replace").decode("latin-1")
+
+
+def escape_pdf_text(text):
+    """Échappe une chaîne (déjà en WinAnsi) pour un littéral PDF."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\r", "")
+
+
+@lru_cache(maxsize=None)
+def get_char_widths(font="helvetica"):
+    """
+    Métriques d'une police standard (caractère -> largeur pour 1000 unités).
+    fpdf2 n'est importé qu'ici : son chargement complet est coûteux.
+    """
+    from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+    return CORE_FONTS_CHARWIDTHS[font]
+
+
+def text_width(text, font="helvetica", size=10):
+    """Largeur d'un texte (déjà en WinAnsi) en points, d'après les métriques des polices standard."""
+    widths = get_char_widths(font)
+    return sum(widths.get(char, 600) for char in text) * size / 1000
+
+
+class PdfStreamWriter:
+    """
+    Écrit un PDF au fil de l'eau : chaque page (et chaque image) est écrite dans
+    le fichier dès qu'elle est ajoutée, seuls les numéros d'objets et leurs
+    positions restent en mémoire. La mémoire ne dépend donc pas du nombre de pages.
+
+    Usage :
+        with PdfStreamWriter(path) as pdf:
+            font = pdf.font("helvetica")
+            pdf.add_page(b"BT /" + font.encode() + b" 12 Tf 72 720 Td (Hello) Tj ET")
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, path, page_size=None, compress=True):
+        self.page_size = page_size or PAGE_SIZES["a4"]
+        self.compress = compress
+        self._file = open(path, "wb")
+        self._offsets = {}
+        self._next_id = 3
+        self._page_ids = []
+        self._fonts = {}
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    def _reserve_id(self):
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _write_object(self, object_id, body):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(f"{object_id} 0 obj\n".encode("ascii"))
+        self._file.write(body)
+        self._file.write(b"\nendobj\n")
+
+    def _write_stream(self, object_id, data, extra=b"", compress=None):
+        compress = self.compress if compress is None else compress
+        if compress:
+            data = zlib.compress(data, 6)
+            extra = b"/Filter /FlateDecode " + extra
+        header = b"<< " + extra + f"/Length {len(data)} >>\nstream\n".encode("ascii")
+        self._write_object(object_id, header + data + b"\nendstream")
+
+    def font(self, name="helvetica"):
+        """Retourne le nom de ressource d'une police standard (F1, F2...), en l'écrivant au premier usage."""
+        if name not in self._fonts:
+            object_id = self._reserve_id()
+            resource = f"F{len(self._fonts) + 1}"
+            self._write_object(object_id, (
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{CORE_FONTS[name]} "
+                f"/Encoding /WinAnsiEncoding >>"
+            ).encode("ascii"))
+            self._fonts[name] = (resource, object_id)
+        return self._fonts[name][0]
+
+    def add_image(self, data, width, height, color_space="DeviceRGB", bits=8, filter_name=None,
+                  decode_parms=None, compress=False):
+        """
+        Ajoute une image (XObject) et retourne son numéro d'objet.
+
+        `data` est écrit tel quel : avec filter_name="DCTDecode", un JPEG est
+        embarqué sans être décodé.
+        """
+        object_id = self._reserve_id()
+        extra = f"/Type /XObject /Subtype /Image /Width {width} /Height {height} ".encode("ascii")
+        if isinstance(color_space, bytes):
+            extra += b"/ColorSpace " + color_space + b" "
+        else:
+            extra += f"/ColorSpace /{color_space} ".encode("ascii")
+        extra += f"/BitsPerComponent {bits} ".encode("ascii")
+        if filter_name:
+            extra += f"/Filter /{filter_name} ".encode("ascii")
+        if decode_parms:
+            extra += b"/DecodeParms " + decode_parms + b" "
+        self._write_stream(object_id, data, extra, compress=compress)
+        return object_id
+
+    def add_page(self, content, width=None, height=None, images=None):
+        """
+        Écrit une page et son flux de contenu.
+
+        Args:
+            content (bytes): opérateurs PDF de la page.
+            images (dict): {nom de ressource: numéro d'objet image} utilisés par la page.
+        """
+        width = width or self.page_size[0]
+        height = height or self.page_size[1]
+
+        content_id = self._reserve_id()
+        self._write_stream(content_id, content)
+
+        resources = b"<< "
+        if self._fonts:
+            resources += b"/Font << " + b" ".join(
+                f"/{resource} {object_id} 0 R".encode("ascii") for resource, object_id in self._fonts.values()
+            ) + b" >> "
+        if images:
+            resources += b"/XObject << " + b" ".join(
+                f"/{name} {object_id} 0 R".encode("ascii") for name, object_id in images.items()
+            ) + b" >> "
+        resources += b">>"
+
+        page_id = self._reserve_id()
+        self._write_object(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES_ID} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Contents {content_id} 0 R /Resources "
+        ).encode("ascii") + resources + b" >>")
+        self._page_ids.append(page_id)
+
+    def close(self):
+        """Écrit l'arbre des pages, le catalogue et la table des références."""
+        if self._file.closed:
+            return
+        if not self._page_ids:
+            self.add_page(b"")
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._write_object(self.PAGES_ID, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode("ascii"))
+        self._write_object(self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>".encode("ascii"))
+
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {self._next_id}\n".encode("ascii"))
+        self._file.write(b"0000000000 65535 f \n")
+        for object_id in range(1, self._next_id):
+            self._file.write(f"{self._offsets.get(object_id, 0):010d} 00000 n \n".encode("ascii"))
+        self._file.write((
+            f"trailer\n<< /Size {self._next_id} /Root {self.CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        ).encode("ascii"))
+        self._file.close()
@@ -0,0 +1,215 @@
+import heapq
+import os
+from collections import namedtuple
+from importlib import import_module
+
+from django.utils.module_loading import import_string
+
+from converter.formats import (
+    image_formats, multi_frame_formats, writer_formats, table_formats, slide_formats, pdf_format,
+)
+from converter.instrumentation import file_size, stage
+
+# Une étape de conversion : arête du graphe des formats
+Edge = namedtuple("Edge", ["engine", "source_format", "target_format", "cost", "final"])
+
+# Déclaration des moteurs : fonction de conversion (chemin d'import), version
+# (utilisée dans la clé du cache, à incrémenter dès qu'une modification change
+# le fichier produit), bibliothèques chargées par le préchauffage et arêtes
+# (sources, cibles, coût estimé, final).
+# Une arête "finale" produit un fichier qui ne peut pas être reconverti (ZIP
+# de pages, de feuilles...) : elle ne peut être que la dernière étape.
+ENGINES = {
+    "image": {
+        "converter": "converter.converters.image_converter.convert_image",
+        "version": 4,
+        "preload": ["PIL.Image"],
+        "edges": [
+            ([fmt for fmt in image_formats if fmt not in multi_frame_formats], image_formats + pdf_format, 1, False),
+        ],
+    },
+    # Images à plusieurs frames : animation, pages, ou ZIP d'une image par frame
+    # (une image à une seule frame est confiée au moteur "image")
+    "frames": {
+        "converter": "converter.converters.frame_converter.convert_frames",
+        "version": 2,
+        "preload": ["PIL.Image"],
+        "edges": [
+            (multi_frame_formats, multi_frame_formats + pdf_format, 1, False),
+            # Une image par frame : ZIP
+            (multi_frame_formats, [fmt for fmt in image_formats if fmt not in multi_frame_formats], 1, True),
+        ],
+    },
+    "writer_pdf": {
+        "converter": "converter.converters.writer_converter.convert_writer_to_pdf",
+        "version": 3,
+        "preload": ["docx", "fpdf.fonts"],
+        "edges": [(["docx", "txt"], pdf_format, 2, False), (["odt"], pdf_format, 5, False)],
+    },
+    "writer_writer": {
+        "converter": "converter.converters.writer_converter.convert_writer_to_writer",
+        "version": 1,
+        "preload": [],
+        "edges": [(writer_formats, writer_formats, 5, False)],
+    },
+    "table": {
+        "converter": "converter.converters.table_converter.convert_table",
+        "version": 1,
+        "preload": ["pandas", "openpyxl"],
+        "edges": [
+            (table_formats, ["xlsx"], 1, False),
+            (table_formats, pdf_format, 2, False),
+            (table_formats, ["xls"], 6, False),
+            # Un classeur à plusieurs feuilles donne un ZIP de CSV/TSV
+            (table_formats, ["csv", "tsv"], 1, True),
+        ],
+    },
+    "slides": {
+        "converter": "converter.converters.slide_converter.convert_slides",
+        "version": 1,
+        "preload": ["PIL.Image", "pdf2image"],
+        "edges": [(slide_formats, slide_formats + pdf_format, 5, False), (slide_formats, image_formats, 8, True)],
+    },
+    "pdf_images": {
+        "converter": "converter.converters.pdf_converter.convert_pdf_to_images",
+        "version": 2,
+        "preload": ["PIL.Image", "pdf2image"],
+        "edges": [(pdf_format, image_formats, 4, True)],
+    },
+}
+
+ALL_FORMATS = image_formats + writer_formats + table_formats + slide_formats + pdf_format
+
+
+def build_edges(engines):
+    """Liste les arêtes déclarées par les moteurs, indexées par format source."""
+    edges = {}
+    for engine, config in engines.items():
+        for sources, targets, cost, final in config["edges"]:
+            for source_format in sources:
+                for target_format in targets:
+                    if source_format != target_format:
+                        edges.setdefault(source_format, []).append(
+                            Edge(engine, source_format, target_format, cost, final)
+                        )
+    return edges
+
+
+def find_path(edges, source_format, target_format):
+    """
+    Cherche le chemin de coût minimal (Dijkstra) ; à coût égal, le plus court.
+    Retourne un tuple d'arêtes, vide si aucun chemin n'existe.
+    """
+    queue = [(0, 0, source_format, ())]
+    settled = set()
+    while queue:
+        cost, hops, current, path = heapq.heappop(queue)
+        if current == target_format:
+            return path
+        if current in settled:
+            continue
+        settled.add(current)
+        for edge in edges.get(current, []):
+            if edge.target_format in settled:
+                continue
+            if edge.final and edge.target_format != target_format:
+                continue
+            heapq.heappush(queue, (cost + edge.cost, hops + 1, edge.target_format, path + (edge,)))
+    return ()
+
+
+def build_routes(engines, formats):
+    """Pré-calcule le chemin de chaque couple de formats."""
+    edges = build_edges(engines)
+    routes = {}
+    for source_format in formats:
+        for target_format in formats:
+            if source_format != target_format:
+                path = find_path(edges, source_format, target_format)
+                if path:
+                    routes[(source_format, target_format)] = path
+    return routes
+
+
+# Table de routage construite une fois, à l'import
+ROUTES = build_routes(ENGINES, ALL_FORMATS)
+
+
+def plan_conversion(source_format, target_format):
+    """Retourne les étapes (arêtes) de la conversion, ou un tuple vide si elle n'est pas supportée."""
+    return ROUTES.get((source_format, target_format), ())
+
+
+def plan_engine(plan):
+    """Nom du moteur d'un plan : "writer_pdf+pdf_images" pour une conversion en plusieurs étapes."""
+    return "+".join(edge.engine for edge in plan)
+
+
+def plan_version(plan):
+    """Versions des moteurs d'un plan, pour la clé du cache."""
+    return "+".join(f"{edge.engine}:{ENGINES[edge.engine]['version']}" for edge in plan)
+
+
+def get_converter(engine):
+    """Fonction de conversion d'un moteur (importée au premier appel)."""
+    return import_string(ENGINES[engine]["converter"])
+
+
+def load_engine(engine):
+    """Importe un moteur et les bibliothèques qu'il charge d'ordinaire à la demande."""
+    converter = get_converter(engine)
+    for module_name in ENGINES[engine]["preload"]:
+        import_module(module_name)
+    return converter
+
+
+def prewarm_engines(engines=None):
+    """
+    Importe à l'avance les moteurs listés (paramètre CONVERTER_PREWARM_ENGINES,
+    "all" pour tous). Réservé aux workers : les processus web n'en ont pas besoin.
+    """
+    from django.conf import settings
+
+    engines = getattr(settings, "CONVERTER_PREWARM_ENGINES", []) if engines is None else engines
+    if engines == "all":
+        engines = list(ENGINES)
+    for engine in engines:
+        load_engine(engine)
+    return list(engines)
+
+
+def run_plan(plan, input_path, output_dir, options=None, step_cache=None):
+    """
+    Exécute les étapes d'un plan : la sortie de chaque étape est l'entrée de la
+    suivante. Les fichiers intermédiaires sont écrits dans des sous-répertoires
+    de `output_dir` (le répertoire de travail du job) et supprimés avec lui.
+
+    Args:
+        step_cache: objet optionnel avec `lookup(étapes, répertoire)`, qui place
+            dans le répertoire un résultat intermédiaire déjà produit et retourne
+            son chemin (ou None), et `store(étapes, chemin)`.
+
+    Returns:
+        str: chemin du fichier produit par la dernière étape.
+    """
+    for index, edge in enumerate(plan):
+        last = index == len(plan) - 1
+        step_dir = output_dir
+        if not last:
+            step_dir = os.path.join(output_dir, f"step_{index + 1}_{edge.target_format}")
+            os.makedirs(step_dir, exist_ok=True)
+            if step_cache is not None:
+                cached_path = step_cache.lookup(plan[:index + 1], step_dir)
+                if cached_path is not None:
+                    input_path = cached_path
+                    continue
+
+        with stage("convert", bytes_in=file_size(input_path)) as info:
+            output_path = get_converter(edge.engine)(
+                input_path, step_dir, edge.source_format, edge.target_format, options
+            )
+            info["bytes_out"] = file_size(output_path)
+        if not last and step_cache is not None:
+            step_cache.store(plan[:index + 1], output_path)
+        input_path = output_path
+    return input_path
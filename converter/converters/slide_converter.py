@@ -1 +1,124 @@
-# Voir ancien code dans writer_converter.py
\ No newline at end of file
+import io
+import os
+import re
+from zipfile import ZipFile, BadZipFile
+
+from django.conf import settings
+
+from converter.instrumentation import stage
+from converter.utils import build_output_path, is_file_created, normalize_format
+from .libreoffice import convert_via_libreoffice
+
+# Miniature enregistrée dans le paquet par PowerPoint/python-pptx et par LibreOffice
+EMBEDDED_THUMBNAILS = {
+    "pptx": "docProps/thumbnail.jpeg",
+    "odp": "Thumbnails/thumbnail.png",
+}
+PPTX_SLIDE_PATTERN = re.compile(r"^ppt/slides/slide\d+\.xml$")
+ODP_PAGE_PATTERN = re.compile(rb"<draw:page\b")
+
+
+def get_thumbnail_dpi():
+    """Résolution du rendu des miniatures (option "thumbnails")."""
+    return getattr(settings, "CONVERTER_SLIDE_THUMBNAIL_DPI", 48)
+
+
+def convert_slides(input_path, output_dir, source_format, target_format, options=None):
+    """
+    Convertit une présentation (pptx, odp) en PDF, en une autre présentation, ou
+    en images (une par diapositive, dans un ZIP).
+
+    Le document est exporté une seule fois en PDF par LibreOffice ; les images
+    sont ensuite rendues en parallèle à partir de ce PDF. Avec l'option
+    "preview", seule la miniature enregistrée dans le fichier est extraite,
+    sans LibreOffice.
+    """
+    from converter.formats import image_formats
+
+    options = options or {}
+
+    to_images = target_format in image_formats
+
+    if to_images and options.get("preview"):
+        output_path = build_output_path(input_path, output_dir, target_format)
+        with stage("thumbnail"):
+            if _extract_embedded_thumbnail(input_path, source_format, output_path, target_format):
+                return output_path
+        # Pas de miniature dans le fichier : seule la première diapositive sera rendue
+
+    # Pour les images, le PDF n'est qu'un intermédiaire : il est exporté à part
+    export_format = "pdf" if to_images else target_format
+    export_dir = _intermediate_dir(output_dir) if to_images else output_dir
+    export_path = build_output_path(input_path, export_dir, export_format)
+    with stage("libreoffice"):
+        convert_via_libreoffice(input_path, export_path, export_format)
+    if not is_file_created(export_path):
+        raise FileNotFoundError(f"Converted file not created at {export_path}")
+
+    if not to_images:
+        return export_path
+    return _rasterize(export_path, input_path, output_dir, target_format, options)
+
+
+def _intermediate_dir(output_dir):
+    path = os.path.join(output_dir, "slides")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _rasterize(pdf_path, input_path, output_dir, target_format, options):
+    """Rend les diapositives du PDF exporté, en parallèle, dans un ZIP (ou une image unique pour l'aperçu)."""
+    from .pdf_converter import convert_pdf_to_images, get_render_options, render_pages
+
+    if "dpi" not in options and (options.get("thumbnails") or options.get("preview")):
+        options = {**options, "dpi": get_thumbnail_dpi()}
+
+    if options.get("preview"):
+        render_options = get_render_options(options)
+        output_path = build_output_path(input_path, output_dir, target_format)
+        with stage("rasterize"):
+            [(_, data)] = render_pages(pdf_path, 1, 1, target_format, render_options["dpi"], render_options["grayscale"])
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return output_path
+
+    # Le ZIP porte le nom du PDF intermédiaire, qui est celui de la présentation
+    return convert_pdf_to_images(pdf_path, output_dir, "pdf", target_format, options, entry_name="slide")
+
+
+def _extract_embedded_thumbnail(input_path, source_format, output_path, target_format):
+    """Écrit la miniature incluse dans la présentation au format cible. Retourne False si elle est absente."""
+    from PIL import Image
+    from .pdf_converter import image_save_format
+
+    name = EMBEDDED_THUMBNAILS.get(source_format)
+    try:
+        with ZipFile(input_path) as package:
+            data = package.read(name) if name in package.namelist() else None
+    except (BadZipFile, OSError):
+        return False
+    if data is None:
+        return False
+
+    if normalize_format(os.path.splitext(name)[1].lstrip(".")) == normalize_format(target_format):
+        # Déjà au format demandé : copie des octets, sans décodage
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return True
+
+    fmt = image_save_format(target_format)
+    with Image.open(io.BytesIO(data)) as image:
+        if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output_path, fmt)
+    return True
+
+
+def count_slides(input_path, source_format):
+    """Compte les diapositives en lisant uniquement la structure du paquet."""
+    with ZipFile(input_path) as package:
+        if source_format == "pptx":
+            return sum(1 for name in package.namelist() if PPTX_SLIDE_PATTERN.match(name))
+        if source_format == "odp":
+            return len(ODP_PAGE_PATTERN.findall(package.read("content.xml")))
+    raise ValueError(f"Unsupported slide format: {source_format}")
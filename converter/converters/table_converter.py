@@ -1 +1,255 @@
-# Voir ancien code dans writer_converter.py
\ No newline at end of file
+import csv
+import io
+import os
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from django.conf import settings
+
+from converter.instrumentation import stage
+from converter.utils import build_output_path
+
+from .text_pdf import ENCODING_PREFIX_SIZE, detect_encoding
+
+DELIMITERS = {"csv": ",", "tsv": "\t"}
+TEXT_FORMATS = ["csv", "tsv"]
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def get_chunk_rows():
+    """Nombre de lignes lues à la fois : borne la mémoire quelle que soit la taille de la feuille."""
+    return getattr(settings, "CONVERTER_TABLE_CHUNK_ROWS", 50000)
+
+
+def convert_table(input_path, output_dir, source_format, target_format, options=None):
+    """Convertit un tableau entre les formats csv, tsv, xls et xlsx, ou vers PDF, en flux."""
+    if source_format in TEXT_FORMATS and target_format in TEXT_FORMATS:
+        output_path = build_output_path(input_path, output_dir, target_format)
+        with stage("transcode"):
+            _convert_text_to_text(input_path, output_path, source_format, target_format, text_encoding(input_path, options))
+        return output_path
+
+    if target_format == "xls":
+        # Aucun moteur Python n'écrit de XLS : passage par un XLSX intermédiaire puis LibreOffice
+        from .libreoffice import convert_via_libreoffice
+
+        xlsx_dir = os.path.join(output_dir, "xlsx")
+        os.makedirs(xlsx_dir, exist_ok=True)
+        xlsx_path = convert_table(input_path, xlsx_dir, source_format, "xlsx", options)
+        output_path = build_output_path(input_path, output_dir, "xls")
+        with stage("libreoffice"):
+            convert_via_libreoffice(xlsx_path, output_path, "xls")
+        return output_path
+
+    sheets = iter_sheets(input_path, source_format, options)
+    if target_format == "pdf":
+        from .table_pdf import render_table_pdf
+
+        output_path = build_output_path(input_path, output_dir, "pdf")
+        with stage("render"):
+            render_table_pdf(sheets, output_path, options)
+        return output_path
+
+    with stage("transcode"):
+        if target_format == "xlsx":
+            output_path = build_output_path(input_path, output_dir, "xlsx")
+            _write_xlsx(sheets, output_path)
+        elif target_format in TEXT_FORMATS:
+            sheet_count = count_sheets(input_path, source_format)
+            output_path = _write_text_sheets(sheets, input_path, output_dir, target_format, sheet_count)
+        else:
+            raise ValueError(f"Unsupported table format: {target_format}")
+    return output_path
+
+
+def text_encoding(input_path, options=None):
+    """Encodage d'un CSV/TSV : option "encoding", sinon détecté sur le début du fichier (voir text_pdf.detect_encoding)."""
+    encoding = (options or {}).get("encoding")
+    if encoding:
+        return encoding
+    with open(input_path, "rb") as f:
+        return detect_encoding(f.read(ENCODING_PREFIX_SIZE))
+
+
+def iter_sheets(input_path, source_format, options=None):
+    """
+    Génère les feuilles d'un classeur sous la forme (nom, itérateur de lignes).
+
+    Chaque itérateur produit des listes de lignes par paquets, pour que les
+    écritures se fassent par blocs sans jamais charger la feuille entière.
+    """
+    if source_format in TEXT_FORMATS:
+        sheet_name = os.path.splitext(os.path.basename(input_path))[0]
+        yield sheet_name, _iter_text_chunks(input_path, source_format, text_encoding(input_path, options))
+    elif source_format == "xlsx":
+        yield from _iter_xlsx_sheets(input_path)
+    elif source_format == "xls":
+        yield from _iter_xls_sheets(input_path)
+    else:
+        raise ValueError(f"Unsupported table format: {source_format}")
+
+
+def count_sheets(input_path, source_format):
+    """Nombre de feuilles d'un classeur, lu sans charger les données."""
+    if source_format == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(input_path, read_only=True)
+        try:
+            return len(workbook.sheetnames)
+        finally:
+            workbook.close()
+    if source_format == "xls":
+        xlrd = _import_xlrd()
+        book = xlrd.open_workbook(input_path, on_demand=True)
+        try:
+            return book.nsheets
+        finally:
+            book.release_resources()
+    return 1
+
+
+def _iter_text_chunks(input_path, source_format, encoding):
+    """
+    Lit un CSV/TSV par paquets avec pandas : les types (entiers, décimaux) sont
+    déduits par colonne, de façon vectorisée, paquet par paquet. La première
+    ligne est lue à part pour qu'un en-tête textuel ne force pas toutes les
+    colonnes en texte.
+    """
+    import pandas as pd
+
+    delimiter = DELIMITERS[source_format]
+    with open(input_path, newline="", encoding=encoding, errors="replace") as f:
+        header = next(csv.reader(f, delimiter=delimiter), None)
+    if header is None:
+        return
+    yield [header]
+
+    try:
+        reader = pd.read_csv(
+            input_path,
+            sep=delimiter,
+            header=None,
+            skiprows=1,
+            chunksize=get_chunk_rows(),
+            keep_default_na=False,
+            na_values=[""],
+            encoding=encoding,
+            encoding_errors="replace",
+        )
+        with reader:
+            for chunk in reader:
+                # Valeurs manquantes -> None, en une opération par paquet
+                yield chunk.astype(object).where(chunk.notna(), None).values.tolist()
+    except pd.errors.EmptyDataError:
+        # Fichier réduit à sa ligne d'en-tête
+        return
+
+
+def _iter_xlsx_sheets(input_path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, _chunked(worksheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def _import_xlrd():
+    try:
+        import xlrd
+    except ImportError:
+        raise ValueError("Reading XLS files requires the xlrd package")
+    return xlrd
+
+
+def _iter_xls_sheets(input_path):
+    xlrd = _import_xlrd()
+    book = xlrd.open_workbook(input_path, on_demand=True)
+    try:
+        for index in range(book.nsheets):
+            sheet = book.sheet_by_index(index)
+            yield sheet.name, _chunked(sheet.row_values(row) for row in range(sheet.nrows))
+            book.unload_sheet(index)
+    finally:
+        book.release_resources()
+
+
+def _chunked(rows):
+    chunk_rows = get_chunk_rows()
+    chunk = []
+    for row in rows:
+        chunk.append(list(row))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _convert_text_to_text(input_path, output_path, source_format, target_format, encoding):
+    """CSV <-> TSV : simple changement de séparateur, ligne à ligne, sans interprétation des valeurs (sortie en UTF-8)."""
+    with open(input_path, newline="", encoding=encoding, errors="replace") as src, \
+            open(output_path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as dst:
+        writer = csv.writer(dst, delimiter=DELIMITERS[target_format])
+        writer.writerows(csv.reader(src, delimiter=DELIMITERS[source_format]))
+
+
+def _write_xlsx(sheets, output_path):
+    """Écrit les feuilles dans un classeur en mode write-only (mémoire constante)."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_name, chunks in sheets:
+        worksheet = workbook.create_sheet(title=_safe_sheet_title(sheet_name))
+        for chunk in chunks:
+            for row in chunk:
+                worksheet.append(row)
+    if not workbook.worksheets:
+        workbook.create_sheet()
+    workbook.save(output_path)
+
+
+def _safe_sheet_title(title):
+    for char in '[]:*?/\\':
+        title = title.replace(char, "_")
+    return title[:31] or "Sheet"
+
+
+def _write_rows(text_stream, chunks, target_format):
+    writer = csv.writer(text_stream, delimiter=DELIMITERS[target_format])
+    for chunk in chunks:
+        writer.writerows(["" if value is None else value for value in row] for row in chunk)
+
+
+def _write_text_sheets(sheets, input_path, output_dir, target_format, sheet_count):
+    """
+    Écrit une feuille unique dans un CSV/TSV, ou plusieurs feuilles dans un ZIP
+    contenant un fichier par feuille.
+    """
+    if sheet_count <= 1:
+        output_path = build_output_path(input_path, output_dir, target_format)
+        with open(output_path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+            for _, chunks in sheets:
+                _write_rows(f, chunks, target_format)
+        return output_path
+
+    output_path = build_output_path(input_path, output_dir, "zip")
+    used_names = set()
+    with ZipFile(output_path, "w", compression=ZIP_DEFLATED) as zipf:
+        for sheet_name, chunks in sheets:
+            name = _unique_name(_safe_sheet_title(sheet_name), target_format, used_names)
+            with zipf.open(name, "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                _write_rows(f, chunks, target_format)
+    return output_path
+
+
+def _unique_name(sheet_name, extension, used_names):
+    name = f"{sheet_name}.{extension}"
+    counter = 2
+    while name in used_names:
+        name = f"{sheet_name}_{counter}.{extension}"
+        counter += 1
+    used_names.add(name)
+    return name
@@ -0,0 +1,219 @@
+import re
+
+import pandas as pd
+
+from .pdf_writer import PdfStreamWriter, escape_pdf_text, get_page_size, to_pdf_text
+
+MARGIN = 28
+CELL_PADDING = 3
+# Largeur moyenne d'un caractère Helvetica, en fraction de la taille de police
+AVERAGE_CHAR_WIDTH = 0.55
+# Caractère le plus étroit : borne le nombre de caractères utiles par cellule
+NARROWEST_CHAR_WIDTH = 0.25
+MIN_COLUMN_CHARS = 3
+MAX_COLUMN_CHARS = 40
+SAMPLE_ROWS = 1000
+SPECIAL_CHARS = re.compile(r"[\r\n\t]")
+
+
+def get_table_pdf_options(options):
+    """Extrait les options de mise en page (format, orientation, taille de police)."""
+    options = options or {}
+    return {
+        "page_size": get_page_size(
+            options.get("page_size", "a4"),
+            landscape=options.get("orientation", "landscape") == "landscape",
+        ),
+        "font_size": max(4.0, min(float(options.get("font_size", 8)), 24.0)),
+    }
+
+
+def render_table_pdf(sheets, output_path, options=None):
+    """
+    Rend les feuilles d'un classeur en tableaux PDF paginés.
+
+    Les lignes sont lues par paquets et chaque page est écrite dès qu'elle est
+    complète : la mémoire est bornée par la taille d'un paquet. Les largeurs de
+    colonnes sont calculées une fois, sur un échantillon du début de la feuille,
+    et les valeurs sont mises en forme colonne par colonne avec pandas. La
+    première ligne de chaque feuille sert d'en-tête et est répétée sur chaque
+    page ; les colonnes qui ne tiennent pas dans la largeur de la page sont
+    reportées sur des pages suivantes. Une ligne plus large que l'échantillon
+    ajoute ses colonnes à droite des autres, sans en-tête.
+    """
+    layout = get_table_pdf_options(options)
+    with PdfStreamWriter(output_path, page_size=layout["page_size"]) as pdf:
+        fonts = {"regular": pdf.font("helvetica"), "bold": pdf.font("helveticaB")}
+        for sheet_name, chunks in sheets:
+            _render_sheet(pdf, fonts, escape_pdf_text(to_pdf_text(str(sheet_name))), chunks, layout)
+        return pdf.page_count
+
+
+def _render_sheet(pdf, fonts, title, chunks, layout):
+    width, height = layout["page_size"]
+    font_size = layout["font_size"]
+    row_height = font_size * 1.6
+    title_height = font_size * 2.5
+    rows_per_page = max(1, int((height - 2 * MARGIN - title_height) / row_height) - 1)
+
+    chunks = iter(chunks)
+    first_chunk = next(chunks, None)
+    if not first_chunk:
+        _write_page(pdf, fonts, layout, title, [], [], None, [])
+        return
+
+    header, *first_rows = first_chunk
+    if not first_rows:
+        # L'en-tête peut arriver seul (CSV) : l'échantillon est pris dans le paquet suivant
+        first_rows = next(chunks, None) or []
+    column_count = max([len(header)] + [len(row) for row in first_rows[:SAMPLE_ROWS]])
+    header = _format_columns(pd.DataFrame([header]), column_count, [MAX_COLUMN_CHARS] * column_count)
+    sample = _format_columns(pd.DataFrame(first_rows[:SAMPLE_ROWS]), column_count, [MAX_COLUMN_CHARS] * column_count)
+    widths = _column_widths(header, sample, font_size)
+    bands = _column_bands(widths, width - 2 * MARGIN)
+    max_chars = [int(w / (font_size * NARROWEST_CHAR_WIDTH)) + 1 for w in widths]
+    header = [values[0] for values in header]
+
+    page_number = 0
+
+    def flush(columns):
+        nonlocal page_number
+        for band in bands:
+            page_number += 1
+            _write_page(
+                pdf, fonts, layout, f"{title} - {page_number}",
+                [header[c] for c in band], [widths[c] for c in band], row_height,
+                [columns[c] for c in band],
+            )
+
+    # Lignes mises en forme en attente d'une page complète
+    pending = [[] for _ in range(column_count)]
+    for rows in _iter_row_blocks(first_rows, chunks):
+        row_width = max(len(row) for row in rows)
+        if row_width > column_count:
+            # Colonnes absentes de l'échantillon : largeurs calculées sur ce paquet, bandes recalculées
+            added = _format_columns(pd.DataFrame(rows), row_width, [MAX_COLUMN_CHARS] * row_width)[column_count:]
+            widths += _column_widths([[""] for _ in added], added, font_size)
+            bands = _column_bands(widths, width - 2 * MARGIN)
+            max_chars += [int(w / (font_size * NARROWEST_CHAR_WIDTH)) + 1 for w in widths[column_count:]]
+            header += [""] * len(added)
+            pending += [[""] * len(pending[0]) for _ in added]
+            column_count = row_width
+        columns = _format_columns(pd.DataFrame(rows), column_count, max_chars)
+        pending = [before + after for before, after in zip(pending, columns)]
+        start = 0
+        while len(pending[0]) - start >= rows_per_page:
+            flush([values[start:start + rows_per_page] for values in pending])
+            start += rows_per_page
+        pending = [values[start:] for values in pending]
+
+    if pending[0] or page_number == 0:
+        flush(pending)
+
+
+def _iter_row_blocks(first_rows, chunks):
+    if first_rows:
+        yield first_rows
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+
+def _format_columns(frame, column_count, max_chars):
+    """
+    Met en forme les valeurs colonne par colonne (opérations vectorisées) :
+    texte, jeu de caractères des polices PDF, troncature et échappement.
+    """
+    frame = frame.reindex(columns=range(column_count))
+    columns = []
+    for index in range(column_count):
+        column = frame[index]
+        if pd.api.types.is_numeric_dtype(column.dtype):
+            # Nombres : aucun caractère à convertir ni à échapper
+            values = column.astype(str).where(column.notna(), "").str.slice(0, max_chars[index])
+            columns.append(values.tolist())
+            continue
+
+        values = column.astype(object).where(column.notna(), "").astype(str).str.slice(0, max_chars[index])
+        # Un seul test sur la colonne entière évite les transformations inutiles
+        joined = "".join(values.tolist())
+        if SPECIAL_CHARS.search(joined):
+            values = values.str.replace(SPECIAL_CHARS, " ", regex=True)
+        if not joined.isascii():
+            values = values.str.encode("cp1252", "replace").str.decode("latin-1")
+        if "\\" in joined or "(" in joined or ")" in joined:
+            values = (
+                values.str.replace("\\", "\\\\", regex=False)
+                .str.replace("(", "\\(", regex=False)
+                .str.replace(")", "\\)", regex=False)
+            )
+        columns.append(values.tolist())
+    return columns
+
+
+def _column_widths(header, sample, font_size):
+    """Largeur naturelle de chaque colonne, d'après l'en-tête et l'échantillon."""
+    widths = []
+    for header_values, sample_values in zip(header, sample):
+        lengths = pd.Series(header_values + sample_values, dtype=object).str.len()
+        chars = min(max(int(lengths.max()) if len(lengths) else 0, MIN_COLUMN_CHARS), MAX_COLUMN_CHARS)
+        widths.append(chars * font_size * AVERAGE_CHAR_WIDTH + 2 * CELL_PADDING)
+    return widths
+
+
+def _column_bands(widths, available):
+    """Répartit les colonnes en groupes tenant chacun dans la largeur de la page."""
+    bands, band, used = [], [], 0
+    for index, width in enumerate(widths):
+        width = min(width, available)
+        widths[index] = width
+        if band and used + width > available:
+            bands.append(band)
+            band, used = [], 0
+        band.append(index)
+        used += width
+    if band:
+        bands.append(band)
+    return bands
+
+
+def _write_page(pdf, fonts, layout, title, header, widths, row_height, columns):
+    """Écrit une page : titre, en-tête grisé, grille et une colonne de texte par bloc."""
+    width, height = layout["page_size"]
+    font_size = layout["font_size"]
+    top = height - MARGIN
+    ops = [f"BT /{fonts['bold']} {font_size + 2:.1f} Tf {MARGIN} {top - font_size - 2:.2f} Td ({title}) Tj ET"]
+
+    if widths:
+        row_count = len(columns[0]) + 1
+        table_top = top - font_size * 2.5
+        table_bottom = table_top - row_count * row_height
+        table_width = sum(widths)
+        edges = [MARGIN]
+        for column_width in widths:
+            edges.append(edges[-1] + column_width)
+
+        # En-tête grisé
+        ops.append(f"0.9 g {MARGIN} {table_top - row_height:.2f} {table_width:.2f} {row_height:.2f} re f 0 g")
+
+        # Grille
+        lines = [f"{MARGIN} {table_top - i * row_height:.2f} m {MARGIN + table_width:.2f} {table_top - i * row_height:.2f} l"
+                 for i in range(row_count + 1)]
+        lines += [f"{x:.2f} {table_top:.2f} m {x:.2f} {table_bottom:.2f} l" for x in edges]
+        ops.append("0.5 w 0.6 G " + " ".join(lines) + " S 0 G")
+
+        # Texte : un bloc par colonne, découpé à la largeur de la cellule
+        baseline = table_top - row_height / 2 - font_size * 0.35
+        for x, column_width, title_value, values in zip(edges, widths, header, columns):
+            clip = f"q {x:.2f} {table_bottom:.2f} {column_width:.2f} {table_top - table_bottom:.2f} re W n"
+            header_text = f"BT /{fonts['bold']} {font_size} Tf {x + CELL_PADDING:.2f} {baseline:.2f} Td ({title_value}) Tj ET"
+            body = ""
+            if values:
+                body = (
+                    f"BT /{fonts['regular']} {font_size} Tf {row_height:.2f} TL "
+                    f"{x + CELL_PADDING:.2f} {baseline - row_height:.2f} Td "
+                    "(" + ") Tj T* (".join(values) + ") Tj ET"
+                )
+            ops.append(f"{clip} {header_text} {body} Q")
+
+    pdf.add_page("\n".join(ops).encode("latin-1"), width, height)
@@ -0,0 +1,172 @@
+import codecs
+from bisect import bisect_right
+from itertools import accumulate
+
+from .pdf_writer import PdfStreamWriter, escape_pdf_text, get_char_widths, get_page_size, to_pdf_text
+
+MARGIN = 56
+READ_BUFFER_SIZE = 1024 * 1024
+# Taille du préfixe lu pour détecter l'encodage
+ENCODING_PREFIX_SIZE = 64 * 1024
+# Une ligne plus longue est traitée par morceaux : la mémoire reste bornée même sans saut de ligne
+MAX_LINE_CHARS = 64 * 1024
+TAB_SIZE = 4
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def get_text_pdf_options(options):
+    """Extrait les options de mise en page (police, taille, format de page, encodage)."""
+    options = options or {}
+    return {
+        "font": "courier" if options.get("monospace", False) else "helvetica",
+        "font_size": max(4.0, min(float(options.get("font_size", 10)), 36.0)),
+        "page_size": get_page_size(
+            options.get("page_size", "a4"),
+            landscape=options.get("orientation", "portrait") == "landscape",
+        ),
+        "encoding": options.get("encoding"),
+    }
+
+
+def detect_encoding(prefix):
+    """
+    Détermine l'encodage d'un texte à partir de ses premiers octets : marque
+    d'ordre des octets, puis UTF-8, puis charset_normalizer s'il est installé,
+    et à défaut cp1252 (qui accepte presque tous les octets).
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    try:
+        # final=False : un caractère coupé à la fin du préfixe n'est pas une erreur
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return "cp1252"
+    best = from_bytes(prefix).best()
+    return best.encoding if best else "cp1252"
+
+
+def render_text_pdf(input_path, output_path, options=None):
+    """
+    Rend un fichier texte en PDF, en flux.
+
+    Le fichier est lu par blocs, les lignes trop longues sont coupées à la
+    largeur de la page (de préférence sur un espace) et chaque page est écrite
+    dès qu'elle est pleine : la mémoire utilisée ne dépend pas de la taille du
+    fichier. Un saut de page (\\f) dans le texte commence une nouvelle page.
+
+    Returns:
+        int: nombre de pages écrites.
+    """
+    layout = get_text_pdf_options(options)
+    width, height = layout["page_size"]
+    font_size = layout["font_size"]
+    leading = font_size * 1.25
+    lines_per_page = max(1, int((height - 2 * MARGIN) / leading))
+    max_width = width - 2 * MARGIN
+    wrap = _line_wrapper(layout["font"], font_size, max_width)
+
+    encoding = layout["encoding"]
+    if not encoding:
+        with open(input_path, "rb") as f:
+            encoding = detect_encoding(f.read(ENCODING_PREFIX_SIZE))
+
+    with PdfStreamWriter(output_path, page_size=layout["page_size"]) as pdf:
+        font = pdf.font(layout["font"])
+        header = f"BT /{font} {font_size} Tf {leading:.2f} TL {MARGIN} {height - MARGIN - font_size:.2f} Td ("
+        page = []
+
+        def flush():
+            # Échappement en une fois pour toute la page : les lignes ne contiennent pas de \n
+            text = escape_pdf_text("\n".join(page)).replace("\n", ") Tj T* (")
+            pdf.add_page((header + text + ") Tj ET").encode("latin-1"))
+            page.clear()
+
+        with open(input_path, encoding=encoding, errors="replace", newline=None, buffering=READ_BUFFER_SIZE) as f:
+            for block in _iter_line_blocks(f):
+                # Conversion WinAnsi par bloc de lignes plutôt que ligne par ligne
+                for line in to_pdf_text(block.expandtabs(TAB_SIZE)).split("\n"):
+                    for part_index, part in enumerate(line.split("\f")):
+                        if part_index:
+                            if page:
+                                flush()
+                            if not part:
+                                continue
+                        for row in wrap(part):
+                            page.append(row)
+                            if len(page) >= lines_per_page:
+                                flush()
+        if page or not pdf.page_count:
+            flush()
+        return pdf.page_count
+
+
+def _iter_line_blocks(f):
+    """
+    Regroupe les lignes en blocs d'environ READ_BUFFER_SIZE caractères. Une
+    ligne plus longue que MAX_LINE_CHARS est lue (et rendue) en plusieurs
+    morceaux, pour que la mémoire reste bornée.
+    """
+    lines, size = [], 0
+    for line in iter(lambda: f.readline(MAX_LINE_CHARS), ""):
+        lines.append(line if line.endswith("\n") else line + "\n")
+        size += len(line)
+        if size >= READ_BUFFER_SIZE:
+            yield "".join(lines)[:-1]
+            lines, size = [], 0
+    if lines:
+        yield "".join(lines)[:-1]
+
+
+def _line_wrapper(font, font_size, max_width):
+    """
+    Retourne une fonction qui coupe une ligne (déjà convertie en WinAnsi) à la
+    largeur disponible. En police à chasse fixe, la coupure se fait au nombre
+    de caractères ; sinon la plupart des lignes tiennent d'emblée et la mesure
+    caractère par caractère n'est faite que pour les lignes longues.
+    """
+    char_widths = get_char_widths(font)
+    # Table indexée par octet : le texte WinAnsi tient sur un octet par caractère
+    widths = [char_widths.get(chr(code), 600) * font_size / 1000 for code in range(256)]
+    fast_limit = max(1, int(max_width / max(widths)))
+
+    if min(widths) == max(widths):
+        def wrap_fixed(line):
+            if len(line) <= fast_limit:
+                return [line]
+            return [line[start:start + fast_limit] for start in range(0, len(line), fast_limit)]
+        return wrap_fixed
+
+    def wrap(line):
+        if len(line) <= fast_limit:
+            return [line]
+        # Largeurs cumulées : la coupure est trouvée par recherche dichotomique
+        offsets = list(accumulate(map(widths.__getitem__, line.encode("latin-1"))))
+        rows, start, consumed = [], 0, 0.0
+        while start < len(line):
+            end = bisect_right(offsets, consumed + max_width, lo=start)
+            if end >= len(line):
+                rows.append(line[start:])
+                break
+            end = max(end, start + 1)
+            space = line.rfind(" ", start + 1, end)
+            if space > start:
+                end = space + 1
+            rows.append(line[start:end].rstrip(" "))
+            consumed = offsets[end - 1]
+            start = end
+        return rows
+
+    return wrap
@@ -0,0 +1,164 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.views.static import was_modified_since
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+def get_download_mode():
+    """Mode de service des téléchargements : "python", "x-accel-redirect" ou "x-sendfile"."""
+    return getattr(settings, "CONVERTER_DOWNLOAD_MODE", "python")
+
+
+def file_etag(stat):
+    """
+    ETag dérivé de la taille et de la date de modification du fichier. Les
+    sorties sont publiées par renommage et jamais modifiées sur place, ce qui
+    permet de le considérer comme fort.
+    """
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparaison faible : on ignore le préfixe W/
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def is_not_modified(request, stat, etag):
+    """Applique If-None-Match puis If-Modified-Since (RFC 9110)."""
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("If-Modified-Since")
+    return bool(if_modified_since) and not was_modified_since(if_modified_since, int(stat.st_mtime))
+
+
+def parse_range(header, size):
+    """
+    Analyse un en-tête Range à plage unique.
+
+    Returns:
+        tuple | None: (début, fin incluse), None si l'en-tête est absent ou non
+        pris en charge (la réponse complète est alors envoyée).
+
+    Raises:
+        ValueError: si la plage ne peut pas être satisfaite.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        # Plages multiples ou unité inconnue : on renvoie le fichier complet
+        return None
+
+    start, end = match.groups()
+    if start == "" and end == "":
+        return None
+    if start == "":
+        # Suffixe : les N derniers octets
+        length = int(end)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def _range_allowed(request, stat, etag):
+    """If-Range : la plage n'est servie que si la ressource n'a pas changé."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Seule une comparaison forte garantit l'identité des octets
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and date == int(stat.st_mtime)
+
+
+def _iter_file_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def _set_common_headers(response, stat, etag, content_type, download_name):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Accept-Ranges"] = "bytes"
+    response["Content-Disposition"] = content_disposition_header(as_attachment=True, filename=download_name)
+    if content_type:
+        response["Content-Type"] = content_type
+    return response
+
+
+def serve_file(request, path, download_name):
+    """
+    Sert un fichier en téléchargement.
+
+    En mode "x-accel-redirect" (nginx) ou "x-sendfile" (Apache, lighttpd), le
+    transfert est délégué au serveur web frontal et le worker Django est libéré
+    immédiatement. En mode "python", les requêtes conditionnelles (304) et les
+    plages d'octets (206) sont gérées ici.
+    """
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    content_type = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    if is_not_modified(request, stat, etag):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        return response
+
+    mode = get_download_mode()
+    if mode == "x-accel-redirect":
+        prefix = getattr(settings, "CONVERTER_DOWNLOAD_ACCEL_PREFIX", "/protected-media/")
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(relative_path)
+        return _set_common_headers(response, stat, etag, content_type, download_name)
+    if mode == "x-sendfile":
+        response = HttpResponse()
+        response["X-Sendfile"] = os.path.abspath(path)
+        return _set_common_headers(response, stat, etag, content_type, download_name)
+
+    try:
+        byte_range = parse_range(request.headers.get("Range"), stat.st_size) if _range_allowed(request, stat, etag) else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{stat.st_size}"
+        return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"))
+        return _set_common_headers(response, stat, etag, content_type, download_name)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_iter_file_range(path, start, length), status=206)
+    response["Content-Length"] = str(length)
+    response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    return _set_common_headers(response, stat, etag, content_type, download_name)
@@ -0,0 +1,133 @@
+import csv
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from PIL import Image
+
+from converter.formats import image_formats, writer_formats, table_formats, slide_formats, pdf_format
+
+# Paramètres des fichiers générés selon la taille demandée
+FIXTURE_SIZES = {
+    "small": {"pixels": 100, "paragraphs": 1, "rows": 1, "slides": 1, "pages": 1, "text_lines": 1},
+    "medium": {"pixels": 1000, "paragraphs": 200, "rows": 1000, "slides": 10, "pages": 10, "text_lines": 20000},
+    "large": {"pixels": 4000, "paragraphs": 2000, "rows": 20000, "slides": 50, "pages": 50, "text_lines": 500000},
+}
+
+TEST_SENTENCE = "This is a test file."
+
+ODF_MANIFEST = """<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:media-type="application/vnd.oasis.opendocument.presentation"/>
+ <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>
+"""
+ODP_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" office:version="1.2">
+ <office:body><office:presentation>{pages}</office:presentation></office:body>
+</office:document-content>
+"""
+ODP_PAGE = (
+    '<draw:page draw:name="page{number}"><draw:frame svg:x="2cm" svg:y="2cm" svg:width="20cm" svg:height="3cm">'
+    '<draw:text-box><text:p>{title}</text:p><text:p>{text}</text:p></draw:text-box></draw:frame></draw:page>'
+)
+
+
+def write_odp(file_path, slides):
+    """Écrit une présentation ODP minimale (une zone de texte par diapositive), sans bibliothèque ODF."""
+    pages = "".join(
+        ODP_PAGE.format(number=i + 1, title=escape(f"Test Presentation {i + 1}"), text=escape(TEST_SENTENCE))
+        for i in range(slides)
+    )
+    with ZipFile(file_path, "w", ZIP_DEFLATED) as package:
+        # Le type MIME doit être le premier membre, non compressé
+        package.writestr("mimetype", "application/vnd.oasis.opendocument.presentation", compress_type=ZIP_STORED)
+        package.writestr("META-INF/manifest.xml", ODF_MANIFEST)
+        package.writestr("content.xml", ODP_CONTENT.format(pages=pages))
+
+
+def create_fake_file(file_path, file_type, size="small"):
+    """
+    Crée un fichier factice pour un format donné.
+
+    Args:
+        file_path (str): Chemin du fichier à créer.
+        file_type (str): Format du fichier.
+        size (str): Taille du contenu ("small", "medium" ou "large").
+
+    Returns:
+        bool: True si un générateur existe pour ce format.
+    """
+    params = FIXTURE_SIZES[size]
+
+    if file_type in image_formats:
+        pixels = params["pixels"]
+        if file_type == "ico":
+            pixels = min(pixels, 256)
+        image = Image.new('RGB', (pixels, pixels), color=(255, 0, 0))
+        image.save(file_path)
+
+    elif file_type in writer_formats:
+        if file_type == "docx":
+            from docx import Document
+            doc = Document()
+            for _ in range(params["paragraphs"]):
+                doc.add_paragraph(TEST_SENTENCE)
+            doc.save(file_path)
+        elif file_type == "txt":
+            # Lignes de longueur variable (type journal), dont certaines à couper
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(TEST_SENTENCE)
+                for i in range(1, params["text_lines"]):
+                    f.write(f"\n{i:>7} {TEST_SENTENCE} " + "lorem ipsum " * (i % 16))
+        else:
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(TEST_SENTENCE)
+
+    elif file_type in table_formats:
+        if file_type == "xlsx":
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
+            ws.append([TEST_SENTENCE, "Value", "Ratio"])
+            for i in range(1, params["rows"]):
+                ws.append([f"Row {i}", i, i / 7])
+            wb.save(file_path)
+        elif file_type in ["csv", "tsv"]:
+            delimiter = "\t" if file_type == "tsv" else ","
+            with open(file_path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f, delimiter=delimiter)
+                writer.writerow([TEST_SENTENCE, "Value", "Ratio"])
+                for i in range(1, params["rows"]):
+                    writer.writerow([f"Row {i}", i, i / 7])
+        else:
+            # xls : aucune bibliothèque d'écriture du format binaire n'est installée
+            return False
+
+    elif file_type in slide_formats:
+        if file_type == "pptx":
+            from pptx import Presentation
+            presentation = Presentation()
+            for i in range(params["slides"]):
+                slide = presentation.slides.add_slide(presentation.slide_layouts[0])
+                slide.shapes.title.text = f"Test Presentation {i + 1}"
+                slide.placeholders[1].text = TEST_SENTENCE
+            presentation.save(file_path)
+        else:
+            write_odp(file_path, params["slides"])
+
+    elif file_type in pdf_format:
+        from fpdf import FPDF
+        pdf = FPDF()
+        pdf.set_font("helvetica", size=12)
+        for _ in range(params["pages"]):
+            pdf.add_page()
+            pdf.cell(200, 10, text=TEST_SENTENCE, new_x="LMARGIN", new_y="NEXT")
+        pdf.output(file_path)
+
+    else:
+        return False
+
+    return True
@@ -2,4 +2,7 @@ image_formats = ["png", "jpeg", "jpg", "bmp", "gif", "tiff", "webp", "ico"]
 writer_formats = ["docx", "odt", "txt"]
 table_formats = ["csv", "tsv", "xls", "xlsx"]
 slide_formats = ["pptx", "odp"]
-pdf_format = ["pdf"]
\ No newline at end of file
+pdf_format = ["pdf"]
+
+# Formats pouvant contenir plusieurs images (animation, pages)
+multi_frame_formats = ["gif", "tiff", "webp"]
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss_kb():
+    """Mémoire résidente actuelle du processus, en kilo-octets."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        # Hors Linux : pic de mémoire, suffisant puisque les imports ne libèrent rien
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _measure(callback):
+    modules = len(sys.modules)
+    rss_start = current_rss_kb()
+    started = time.perf_counter()
+    callback()
+    return {
+        "import_time": time.perf_counter() - started,
+        "rss_kb": current_rss_kb() - rss_start,
+        "modules": len(sys.modules) - modules,
+    }
+
+
+def _setup_web():
+    import django
+
+    django.setup()
+    import converter.urls  # noqa: F401  (vues et modèles : ce que charge un worker web)
+
+
+def _measure_in_child(connection, engine):
+    """Dans un processus neuf : démarre Django comme un worker web, puis charge un moteur."""
+    try:
+        result = {"engine": "web", **_measure(_setup_web)}
+        if engine != "web":
+            from converter.converters.registry import load_engine
+
+            result = {"engine": engine, **_measure(lambda: load_engine(engine))}
+        connection.send(result)
+    except Exception as e:
+        connection.send({"engine": engine, "error": str(e)[:200]})
+    finally:
+        connection.close()
+
+
+def measure_engine_imports(engines):
+    """
+    Mesure le temps d'import et la mémoire résidente ajoutée par chaque moteur,
+    chacun dans un processus neuf (spawn) pour ne pas profiter des modules déjà
+    chargés. La ligne "web" correspond au démarrage de Django et des vues.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in ["web"] + list(engines):
+        parent_connection, child_connection = context.Pipe(duplex=False)
+        process = context.Process(target=_measure_in_child, args=(child_connection, engine))
+        process.start()
+        child_connection.close()
+        try:
+            results.append(parent_connection.recv())
+        except EOFError:
+            results.append({"engine": engine, "error": f"Process died (exit code {process.exitcode})"})
+        process.join()
+    return results
@@ -0,0 +1,69 @@
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+_current_stages = contextvars.ContextVar("conversion_stages", default=None)
+
+
+@contextmanager
+def record_stages():
+    """
+    Collecte les étapes mesurées pendant une conversion.
+
+    Les convertisseurs appellent `stage()` sans connaître la conversion en cours :
+    les mesures sont rattachées à l'enregistreur actif du contexte.
+    """
+    stages = []
+    token = _current_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _current_stages.reset(token)
+
+
+def add_stage(name, duration, bytes_in=None, bytes_out=None):
+    """Ajoute une mesure à l'enregistreur actif (sans effet s'il n'y en a pas)."""
+    stages = _current_stages.get()
+    if stages is not None:
+        stages.append({"name": name, "duration": duration, "bytes_in": bytes_in, "bytes_out": bytes_out})
+
+
+@contextmanager
+def stage(name, bytes_in=None):
+    """
+    Mesure la durée d'une étape. Le dictionnaire fourni permet de renseigner
+    les octets produits : `with stage("encode") as info: info["bytes_out"] = ...`.
+    """
+    info = {"bytes_in": bytes_in, "bytes_out": None}
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        add_stage(name, time.perf_counter() - started, info["bytes_in"], info["bytes_out"])
+
+
+def file_size(path):
+    """Taille d'un fichier, ou None s'il n'existe pas."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def save_stages(instance, stages):
+    """Enregistre les étapes mesurées d'une conversion en une seule requête."""
+    from converter.models import ConversionStage
+
+    if instance.pk is None or not stages:
+        return
+    ConversionStage.objects.bulk_create([
+        ConversionStage(
+            conversion=instance,
+            name=item["name"],
+            duration=item["duration"],
+            bytes_in=item["bytes_in"],
+            bytes_out=item["bytes_out"],
+        )
+        for item in stages
+    ])
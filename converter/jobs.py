@@ -0,0 +1,209 @@
+import logging
+import os
+import time
+import multiprocessing
+
+from django import db
+from django.conf import settings
+from django.db.models import Count, Min, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from converter.converters.registry import prewarm_engines
+from converter.retention import Sweeper
+from converter.scheduler import available_lanes, get_lanes, refine_schedule, schedule
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_count():
+    """Retourne le nombre de processus de conversion à lancer."""
+    return getattr(settings, "CONVERTER_WORKERS", None) or os.cpu_count() or 1
+
+
+def get_poll_interval():
+    """Retourne l'intervalle (en secondes) entre deux lectures de la file."""
+    return getattr(settings, "CONVERTER_POLL_INTERVAL", 1.0)
+
+
+def enqueue(conversion):
+    """
+    Place une conversion dans la file d'attente de sa voie.
+
+    Si CONVERTER_QUEUE_EAGER est actif (développement, tests), la conversion est
+    exécutée immédiatement dans le processus courant.
+    """
+    from converter.models import Conversion
+
+    schedule(conversion)
+    conversion.status = Conversion.Status.QUEUED
+    conversion.save(update_fields=["status", "lane", "estimated_cost"])
+
+    if getattr(settings, "CONVERTER_QUEUE_EAGER", False):
+        run_job(conversion)
+
+
+def claim_next_job(workers=None):
+    """
+    Réserve la prochaine conversion en attente et la passe à l'état "running".
+
+    Seules les voies qui n'ont pas atteint leur limite de concurrence, ni
+    entamé les workers réservés aux autres voies, sont servies (voir
+    scheduler.available_lanes) : une file de documents lents n'occupe jamais
+    tous les workers. Chaque voie est servie dans l'ordre d'arrivée ; entre les
+    voies, la conversion la moins coûteuse passe en premier.
+
+    La réservation se fait par un UPDATE conditionnel qui revérifie le statut
+    et la limite de la voie : si un autre worker a pris la conversion ou la
+    dernière place de la voie entre-temps, aucune ligne n'est modifiée.
+    """
+    from converter.models import Conversion
+
+    lanes = get_lanes()
+    workers = workers or get_worker_count()
+    while True:
+        running = dict(
+            Conversion.objects.filter(status=Conversion.Status.RUNNING)
+            .order_by()
+            .values_list("lane")
+            .annotate(count=Count("id"))
+        )
+        queued = Conversion.objects.filter(status=Conversion.Status.QUEUED, lane__in=available_lanes(running, workers))
+        # Première conversion en attente de chaque voie
+        heads = queued.order_by().values("lane").annotate(first=Min("id")).values("first")
+        job = (
+            Conversion.objects.filter(id__in=Subquery(heads))
+            .order_by("estimated_cost", "id")
+            .values_list("id", "lane")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job_id, lane = job
+        running_in_lane = (
+            Conversion.objects.filter(status=Conversion.Status.RUNNING, lane=lane)
+            .order_by()
+            .values("lane")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        claimed = (
+            Conversion.objects.filter(id=job_id, status=Conversion.Status.QUEUED)
+            .alias(running_in_lane=Coalesce(Subquery(running_in_lane), 0))
+            .filter(running_in_lane__lt=lanes[lane]["concurrency"])
+            .update(status=Conversion.Status.RUNNING, started_at=timezone.now())
+        )
+        if claimed:
+            return Conversion.objects.get(id=job_id)
+
+
+def run_job(conversion):
+    """
+    Exécute une conversion et enregistre son état final (une seule écriture,
+    voir utils.save_final_state). Une conversion exécutée sans avoir été
+    réservée (mode immédiat) est d'abord passée à l'état "running".
+
+    La voie et le coût sont d'abord affinés par les sondes (voir
+    scheduler.refine_schedule) : une conversion réservée qui change de voie y
+    retourne en file au lieu d'être exécutée.
+    """
+    from converter.models import Conversion
+
+    lane, conversion.estimated_cost = refine_schedule(conversion)
+    if lane != conversion.lane and conversion.status == Conversion.Status.RUNNING:
+        Conversion.objects.filter(pk=conversion.pk, status=Conversion.Status.RUNNING).update(
+            status=Conversion.Status.QUEUED, lane=lane, estimated_cost=conversion.estimated_cost, started_at=None,
+        )
+        return
+    conversion.lane = lane
+
+    if conversion.status != Conversion.Status.RUNNING:
+        conversion.status = Conversion.Status.RUNNING
+        conversion.started_at = timezone.now()
+        conversion.save(update_fields=["status", "started_at"])
+    conversion.convert_file()
+
+
+def requeue_stale_jobs():
+    """Remet en file les conversions restées "running" après l'arrêt brutal d'un worker."""
+    from converter.models import Conversion
+
+    return Conversion.objects.filter(status=Conversion.Status.RUNNING).update(
+        status=Conversion.Status.QUEUED, started_at=None
+    )
+
+
+def worker_loop(stop_event=None, max_jobs=None, workers=None):
+    """Boucle principale d'un worker : réserve et exécute les conversions en attente."""
+    poll_interval = get_poll_interval()
+    processed = 0
+
+    while stop_event is None or not stop_event.is_set():
+        conversion = claim_next_job(workers)
+        if conversion is None:
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            run_job(conversion)
+        except Exception:
+            # Un job défaillant ne doit jamais arrêter le worker
+            logger.exception("Job %s failed", conversion.token)
+
+        processed += 1
+        if max_jobs and processed >= max_jobs:
+            break
+
+
+def _worker_main(stop_event, max_jobs, workers):
+    """Point d'entrée d'un processus worker."""
+    # Chaque processus ouvre sa propre connexion à la base
+    db.connections.close_all()
+    prewarm_engines()
+    try:
+        worker_loop(stop_event, max_jobs, workers)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.connections.close_all()
+
+
+def run_worker_pool(workers=None, max_jobs=None):
+    """
+    Lance un pool de processus workers et les supervise.
+
+    Un worker qui s'arrête (plantage ou max_jobs atteint) est remplacé, ce qui
+    permet aussi de recycler régulièrement les processus. Le superviseur
+    applique aussi la rétention des fichiers (CONVERTER_STORAGE_SWEEP_INTERVAL).
+    """
+    workers = workers or get_worker_count()
+    stop_event = multiprocessing.Event()
+
+    # Les connexions ne doivent pas être partagées entre processus forkés
+    db.connections.close_all()
+    # Moteurs chargés avant le fork : leurs pages mémoire sont partagées par les workers
+    prewarm_engines()
+
+    def spawn():
+        # Non daemon : un worker doit pouvoir lancer ses propres processus (rendu PDF parallèle)
+        process = multiprocessing.Process(target=_worker_main, args=(stop_event, max_jobs, workers))
+        process.start()
+        return process
+
+    processes = [spawn() for _ in range(workers)]
+    sweeper = Sweeper()
+    try:
+        while True:
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    process.join()
+                    processes[i] = spawn()
+            sweeper.maybe_run()
+            time.sleep(get_poll_interval())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=30)
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from converter.benchmark import compare_results, load_results, run_benchmarks, save_results
+from converter.fixtures import FIXTURE_SIZES
+
+
+def _split(value):
+    return [item.strip().lower() for item in value.split(",") if item.strip()] if value else None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure chaque chemin de conversion (temps réel, temps CPU, pic RSS, taille de sortie) "
+        "sur des fichiers générés de plusieurs tailles, et compare à une référence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sources", help="Formats source à mesurer, séparés par des virgules (défaut : tous).")
+        parser.add_argument("--targets", help="Formats cible à mesurer, séparés par des virgules (défaut : tous).")
+        parser.add_argument("--sizes", default=",".join(FIXTURE_SIZES), help="Tailles des fichiers générés (small,medium,large).")
+        parser.add_argument("--repeat", type=int, default=1, help="Nombre de mesures par cas (la médiane est conservée).")
+        parser.add_argument("--output", default="benchmark.json", help="Fichier de résultats (.json ou .csv).")
+        parser.add_argument("--baseline", help="Résultats de référence à comparer (.json ou .csv).")
+        parser.add_argument("--threshold", type=float, default=0.25, help="Hausse tolérée avant de signaler une régression (0.25 = +25 %%).")
+
+    def handle(self, *args, **options):
+        sizes = _split(options["sizes"])
+        unknown_sizes = set(sizes) - set(FIXTURE_SIZES)
+        if unknown_sizes:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown_sizes))}")
+
+        def progress(result):
+            line = (
+                f"{result['size']:<6} {result['source_format']:>5} -> {result['target_format']:<5} "
+                f"{result['status']:<11} wall={result['wall_time']:.3f}s cpu={result['cpu_time']:.3f}s "
+                f"rss={result['peak_rss_kb']}KB out={result['output_bytes']}B"
+            )
+            if result["throughput_mb_s"] != "":
+                line += f" {result['throughput_mb_s']}MB/s"
+            self.stdout.write(line)
+
+        results = run_benchmarks(
+            sources=_split(options["sources"]),
+            targets=_split(options["targets"]),
+            sizes=sizes,
+            repeat=max(1, options["repeat"]),
+            progress=progress,
+        )
+        save_results(results, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"{len(results)} résultat(s) enregistré(s) dans {options['output']}"))
+
+        if options["baseline"]:
+            regressions = compare_results(results, load_results(options["baseline"]), options["threshold"])
+            for regression in regressions:
+                change = f" ({regression['change']:+.0%})" if "change" in regression else ""
+                self.stdout.write(self.style.ERROR(
+                    f"Régression {regression['size']} {regression['source_format']} -> {regression['target_format']} : "
+                    f"{regression['metric']} {regression['baseline']} -> {regression['current']}{change}"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} régression(s) par rapport à {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS("Aucune régression par rapport à la référence."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from converter import cache as result_cache
+
+
+class Command(BaseCommand):
+    help = "Affiche les statistiques du cache des conversions, le purge ou applique la limite de taille."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Supprime toutes les entrées du cache.")
+        parser.add_argument("--evict", action="store_true", help="Applique la limite de taille (éviction LRU).")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            removed = result_cache.clear()
+            self.stdout.write(f"{removed} entrée(s) supprimée(s).")
+        elif options["evict"]:
+            removed = result_cache.evict()
+            self.stdout.write(f"{removed} entrée(s) évincée(s).")
+
+        stats = result_cache.stats()
+        self.stdout.write(f"Entrées : {stats['entries']}")
+        self.stdout.write(f"Taille : {stats['size_bytes']} / {stats['max_bytes']} octets")
+        self.stdout.write(f"Conversions servies depuis le cache : {stats['hits']}")
+        self.stdout.write(f"Conversions calculées : {stats['misses']}")
@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from converter.bulk import find_inputs, run_bulk
+from converter.jobs import get_worker_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Convertit des répertoires entiers (ou des motifs glob) hors ligne, dans un pool de processus, "
+        "vers une arborescence de sortie identique. Reprend là où un traitement précédent s'est arrêté."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("inputs", nargs="+", help="Répertoires (parcourus récursivement) ou motifs glob (ex. 'archive/**/*.png').")
+        parser.add_argument("--to", required=True, dest="target_format", help="Format cible (pdf, png, xlsx...).")
+        parser.add_argument("--output", required=True, help="Répertoire de sortie (l'arborescence des entrées y est reproduite).")
+        parser.add_argument("--options", default="{}", help="Options de conversion, en JSON (ex. '{\"dpi\": 150}').")
+        parser.add_argument("--workers", type=int, default=None, help="Nombre de processus (défaut : CONVERTER_WORKERS ou nombre de coeurs).")
+        parser.add_argument("--max-tasks-per-child", type=int, default=None, help="Recycle chaque processus après ce nombre de fichiers.")
+        parser.add_argument("--manifest", default=None, help="Manifeste de reprise (défaut : <sortie>/.convert_bulk.jsonl).")
+        parser.add_argument("--skip-existing", action="store_true", help="Ignore aussi les fichiers dont la sortie existe déjà, même absents du manifeste.")
+        parser.add_argument("--record", action="store_true", help="Enregistre chaque conversion dans la base (table Conversion).")
+        parser.add_argument("--progress-interval", type=float, default=10, help="Secondes entre deux lignes de progression.")
+
+    def handle(self, *args, **options):
+        try:
+            conversion_options = json.loads(options["options"])
+        except ValueError as e:
+            raise CommandError(f"Invalid --options: {e}")
+        if not isinstance(conversion_options, dict):
+            raise CommandError("--options must be a JSON object")
+
+        items = list(find_inputs(options["inputs"], options["target_format"]))
+        if not items:
+            raise CommandError(f"No convertible file found for target format '{options['target_format']}'")
+        workers = options["workers"] or get_worker_count()
+        self.stdout.write(f"{len(items)} fichier(s) à traiter avec {workers} processus...")
+
+        def progress(summary):
+            eta = f", reste ~{summary['eta']}s" if summary["eta"] is not None else ""
+            self.stdout.write(
+                f"{summary['succeeded'] + summary['failed'] + summary['skipped']}/{summary['total']} "
+                f"({summary['failed']} échec(s)) {summary['files_per_second']} fichiers/s "
+                f"{summary['mb_per_second']} Mo/s{eta}"
+            )
+
+        summary = run_bulk(
+            items, options["target_format"], options["output"],
+            options=conversion_options,
+            workers=workers,
+            manifest_path=options["manifest"],
+            skip_existing=options["skip_existing"],
+            record=options["record"],
+            max_tasks_per_child=options["max_tasks_per_child"],
+            progress=progress,
+            progress_interval=options["progress_interval"],
+        )
+
+        for engine, count in sorted(summary["engines"].items()):
+            self.stdout.write(f"  {engine}: {count}")
+        message = (
+            f"{summary['succeeded']} converti(s), {summary['skipped']} ignoré(s), {summary['failed']} échec(s) "
+            f"en {summary['elapsed']}s : {summary['files_per_second']} fichiers/s, {summary['mb_per_second']} Mo/s "
+            f"({summary['input_mb']} Mo lus, {summary['output_mb']} Mo écrits)"
+        )
+        if summary["failed"]:
+            self.stdout.write(self.style.WARNING(message + " — détail des échecs dans le manifeste"))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from converter.import_profile import measure_engine_imports
+from converter.converters.registry import ENGINES
+
+
+class Command(BaseCommand):
+    help = "Mesure le temps d'import et la mémoire de chaque moteur de conversion (chargés à la demande)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--engines", default="", help="Moteurs à mesurer, séparés par des virgules (défaut : tous).")
+
+    def handle(self, *args, **options):
+        engines = [engine.strip() for engine in options["engines"].split(",") if engine.strip()]
+        unknown = set(engines) - set(ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown engines: {', '.join(sorted(unknown))}")
+
+        for result in measure_engine_imports(engines or list(ENGINES)):
+            if "error" in result:
+                self.stdout.write(self.style.ERROR(f"{result['engine']:<14} erreur : {result['error']}"))
+                continue
+            self.stdout.write(
+                f"{result['engine']:<14} import={result['import_time'] * 1000:8.1f}ms "
+                f"rss=+{result['rss_kb'] / 1024:6.1f}MB modules=+{result['modules']}"
+            )
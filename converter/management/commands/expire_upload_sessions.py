@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from converter.chunked_upload import expire_sessions
+
+
+class Command(BaseCommand):
+    help = "Supprime les sessions d'upload par morceaux inactives et leurs fichiers partiels."
+
+    def handle(self, *args, **options):
+        expired = expire_sessions()
+        self.stdout.write(f"{expired} session(s) expirée(s) supprimée(s).")
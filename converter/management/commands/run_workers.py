@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from converter.jobs import get_worker_count, requeue_stale_jobs, run_worker_pool
+
+
+class Command(BaseCommand):
+    help = "Lance le pool de workers qui traite la file des conversions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Nombre de processus workers (défaut : CONVERTER_WORKERS ou nombre de coeurs).")
+        parser.add_argument("--max-jobs", type=int, default=None, help="Recycle chaque worker après ce nombre de conversions.")
+        parser.add_argument("--no-requeue", action="store_true", help="Ne remet pas en file les conversions restées en cours.")
+
+    def handle(self, *args, **options):
+        if not options["no_requeue"]:
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"{requeued} conversion(s) remise(s) en file.")
+
+        workers = options["workers"] or get_worker_count()
+        self.stdout.write(f"Démarrage de {workers} worker(s)...")
+        run_worker_pool(workers=workers, max_jobs=options["max_jobs"])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from converter.retention import get_storage_quota, storage_usage, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime les fichiers des conversions terminées selon la rétention (CONVERTER_INPUT_TTL, "
+        "CONVERTER_OUTPUT_TTL) et le quota de stockage (CONVERTER_STORAGE_QUOTA), et marque ces conversions expirées."
+    )
+
+    def handle(self, *args, **options):
+        result = sweep()
+        self.stdout.write(f"{result['inputs']} fichier(s) envoyé(s) supprimé(s).")
+        self.stdout.write(f"{result['expired']} conversion(s) expirée(s), {result['evicted']} évincée(s) pour le quota.")
+        self.stdout.write(f"{result['scratch']} espace(s) de travail abandonné(s) supprimé(s).")
+        self.stdout.write(f"{result['sessions']} session(s) d'upload inactive(s) supprimée(s).")
+        self.stdout.write(f"{result['cache']} entrée(s) du cache évincée(s).")
+        quota = get_storage_quota()
+        self.stdout.write(f"Occupation : {storage_usage()} / {quota if quota is not None else '-'} octets")
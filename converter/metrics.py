@@ -0,0 +1,190 @@
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from converter import cache as result_cache
+
+# Bornes (en secondes) des histogrammes de latence
+DURATION_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsWriter:
+    """Construit une réponse au format texte de Prometheus."""
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, metric_type, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f"{name}{_labels(**labels)} {_format_value(value)}")
+
+    def series(self, name, labels, value):
+        """Échantillon dont les étiquettes sont déjà mises en forme (voir MetricCounter)."""
+        labels = f"{{{labels}}}" if labels else ""
+        self.lines.append(f"{name}{labels} {_format_value(int(value) if value.is_integer() else value)}")
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
+
+
+# Compteurs maintenus à la fin de chaque conversion : (type, description, séries)
+COUNTERS = {
+    "converter_conversions_total": ("counter", "Conversions terminées par statut.", [""]),
+    "converter_conversion_errors_total": (
+        "counter", "Conversions en échec par format source, format cible et moteur.", [""],
+    ),
+    "converter_cache_hits_total": ("counter", "Conversions servies par le cache des résultats.", [""]),
+    "converter_conversion_duration_seconds": (
+        "histogram", "Durée des conversions par format source, format cible et moteur.", ["_bucket", "_sum", "_count"],
+    ),
+    "converter_stage_duration_seconds_sum": ("counter", "Temps total passé dans chaque étape de conversion.", [""]),
+    "converter_stage_duration_seconds_count": ("counter", "Nombre d'exécutions de chaque étape.", [""]),
+    "converter_stage_bytes_total": ("counter", "Octets lus et produits par chaque étape.", [""]),
+}
+
+
+def _series(**labels):
+    return _labels(**labels)[1:-1]
+
+
+def conversion_samples(instance, stages):
+    """Incréments des compteurs pour une conversion terminée : {(nom, étiquettes): valeur}."""
+    samples = {}
+
+    def add(name, value, **labels):
+        key = (name, _series(**labels))
+        samples[key] = samples.get(key, 0) + value
+
+    add("converter_conversions_total", 1, status=instance.status)
+    engine = instance.engine or "none"
+    formats = {"source": instance.source_format, "target": instance.target_format, "engine": engine}
+    if instance.status == instance.Status.FAILED:
+        add("converter_conversion_errors_total", 1, **formats)
+    if instance.from_cache:
+        add("converter_cache_hits_total", 1)
+
+    if instance.duration is not None:
+        name = "converter_conversion_duration_seconds"
+        # Buckets cumulatifs : la conversion compte dans chaque borne supérieure à sa durée
+        for bound in DURATION_BUCKETS:
+            add(f"{name}_bucket", int(instance.duration <= bound), **formats, le=bound)
+        add(f"{name}_bucket", 1, **formats, le="+Inf")
+        add(f"{name}_sum", instance.duration, **formats)
+        add(f"{name}_count", 1, **formats)
+
+    for item in stages:
+        labels = {"stage": item["name"], "engine": engine}
+        add("converter_stage_duration_seconds_sum", item["duration"], **labels)
+        add("converter_stage_duration_seconds_count", 1, **labels)
+        add("converter_stage_bytes_total", item["bytes_in"] or 0, direction="in", **labels)
+        add("converter_stage_bytes_total", item["bytes_out"] or 0, direction="out", **labels)
+    return samples
+
+
+def record_conversion(instance, stages):
+    """
+    Ajoute une conversion terminée aux compteurs, en une transaction : les
+    séries manquantes sont créées (dans l'ordre, pour les buckets), puis les
+    séries de même incrément sont mises à jour par une seule requête.
+    """
+    from converter.models import MetricCounter
+
+    samples = conversion_samples(instance, stages)
+    by_value = {}
+    for key, value in samples.items():
+        if value:
+            by_value.setdefault(value, []).append(key)
+    with transaction.atomic():
+        MetricCounter.objects.bulk_create(
+            [MetricCounter(name=name, labels=labels) for name, labels in samples], ignore_conflicts=True,
+        )
+        for value, keys in by_value.items():
+            series = Q()
+            for name, labels in keys:
+                series |= Q(name=name, labels=labels)
+            MetricCounter.objects.filter(series).update(value=F("value") + value)
+
+
+def _write_counters(writer):
+    from converter.models import MetricCounter
+
+    rows = {}
+    for name, labels, value in MetricCounter.objects.order_by("id").values_list("name", "labels", "value"):
+        rows.setdefault(name, []).append((labels, value))
+    for family, (metric_type, help_text, suffixes) in COUNTERS.items():
+        writer.metric(family, metric_type, help_text)
+        for suffix in suffixes:
+            for labels, value in rows.get(family + suffix, []):
+                writer.series(family + suffix, labels, value)
+
+
+def _write_queue(writer):
+    from converter.models import Conversion
+
+    counts = (
+        Conversion.objects.filter(status__in=[Conversion.Status.QUEUED, Conversion.Status.RUNNING])
+        .order_by()
+        .values("lane", "status")
+        .annotate(total=Count("id"))
+    )
+    depth = {(row["lane"], row["status"]): row["total"] for row in counts}
+    lanes = sorted({lane for lane, _ in depth})
+
+    writer.metric("converter_queue_depth", "gauge", "Conversions en attente par voie.")
+    for lane in lanes:
+        writer.sample("converter_queue_depth", depth.get((lane, Conversion.Status.QUEUED), 0), lane=lane)
+    writer.metric("converter_jobs_running", "gauge", "Conversions en cours par voie.")
+    for lane in lanes:
+        writer.sample("converter_jobs_running", depth.get((lane, Conversion.Status.RUNNING), 0), lane=lane)
+
+    oldest = (
+        Conversion.objects.filter(status=Conversion.Status.QUEUED)
+        .order_by()
+        .values("lane")
+        .annotate(created_at=Min("created_at"))
+    )
+    now = timezone.now()
+    writer.metric("converter_queue_oldest_age_seconds", "gauge", "Ancienneté de la plus vieille conversion en attente par voie.")
+    for row in oldest:
+        writer.sample("converter_queue_oldest_age_seconds", round((now - row["created_at"]).total_seconds(), 3), lane=row["lane"])
+
+
+def _write_cache(writer):
+    usage = result_cache.usage()
+    writer.metric("converter_cache_size_bytes", "gauge", "Taille du cache des résultats sur disque (à la dernière éviction).")
+    writer.sample("converter_cache_size_bytes", usage["size_bytes"])
+    writer.metric("converter_cache_entries", "gauge", "Nombre d'entrées du cache des résultats (à la dernière éviction).")
+    writer.sample("converter_cache_entries", usage["entries"])
+
+
+def render_metrics():
+    """
+    Retourne toutes les métriques de conversion au format texte de Prometheus.
+
+    Aucune requête ne parcourt l'historique des conversions : les compteurs et
+    histogrammes sont tenus à jour à la fin de chaque conversion, les jauges de
+    file ne lisent que les conversions en attente ou en cours, et l'occupation
+    du cache est celle relevée à la dernière éviction.
+    """
+    writer = MetricsWriter()
+    _write_counters(writer)
+    _write_queue(writer)
+    _write_cache(writer)
+    return writer.render()
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+def set_existing_status(apps, schema_editor):
+    Conversion = apps.get_model('converter', 'Conversion')
+    # Les conversions existantes ont déjà été traitées de manière synchrone
+    Conversion.objects.filter(converted=True).update(status='succeeded')
+    Conversion.objects.filter(converted=False).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0003_conversion_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10),
+        ),
+        migrations.RunPython(set_existing_status, migrations.RunPython.noop),
+    ]
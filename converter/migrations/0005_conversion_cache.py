@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0004_conversion_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='from_cache',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='input_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
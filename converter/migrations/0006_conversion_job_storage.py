@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+import converter.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0005_conversion_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversion',
+            name='input_file',
+            field=models.FileField(storage=converter.storage.JobStorage(), upload_to=converter.storage.input_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='conversion',
+            name='output_file',
+            field=models.FileField(blank=True, null=True, storage=converter.storage.JobStorage(), upload_to=converter.storage.output_upload_to),
+        ),
+    ]
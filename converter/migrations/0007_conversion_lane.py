@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0006_conversion_job_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='estimated_cost',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='lane',
+            field=models.CharField(default='default', max_length=20),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0007_conversion_lane'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='engine',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ConversionStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('duration', models.FloatField()),
+                ('bytes_in', models.BigIntegerField(blank=True, null=True)),
+                ('bytes_out', models.BigIntegerField(blank=True, null=True)),
+                ('conversion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='converter.conversion')),
+            ],
+        ),
+    ]
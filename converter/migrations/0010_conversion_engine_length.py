@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0009_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversion',
+            name='engine',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def set_cached_status(apps, schema_editor):
+    Conversion = apps.get_model('converter', 'Conversion')
+    # Le booléen "converted" est remplacé par le statut, qui distingue les résultats repris du cache
+    Conversion.objects.filter(status='succeeded', from_cache=True).update(status='cached')
+    Conversion.objects.filter(converted=True).exclude(status='cached').update(status='succeeded')
+
+
+def restore_converted(apps, schema_editor):
+    Conversion = apps.get_model('converter', 'Conversion')
+    Conversion.objects.filter(status__in=['succeeded', 'cached']).update(converted=True, status='succeeded')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0011_conversion_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='conversion',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('cached', 'Cached'), ('failed', 'Failed')], default='queued', max_length=10),
+        ),
+        migrations.RunPython(set_cached_status, restore_converted),
+        migrations.RemoveField(
+            model_name='conversion',
+            name='converted',
+        ),
+        migrations.AddIndex(
+            model_name='conversion',
+            index=models.Index(fields=['status', 'lane'], name='conversion_status_lane'),
+        ),
+        migrations.AddIndex(
+            model_name='conversion',
+            index=models.Index(fields=['status', 'finished_at'], name='conversion_status_finished'),
+        ),
+    ]
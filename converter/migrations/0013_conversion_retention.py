@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_retention_fields(apps, schema_editor):
+    Conversion = apps.get_model('converter', 'Conversion')
+    # Ordre d'éviction des conversions existantes : leur date de fin
+    Conversion.objects.filter(finished_at__isnull=False).update(last_accessed_at=F('finished_at'))
+    # Tailles des fichiers encore présents, pour le calcul du quota
+    rows = Conversion.objects.filter(input_file__startswith='uploads/').only('input_file', 'output_file')
+    for conversion in list(rows):
+        sizes = {}
+        for field, name in (('input_size', conversion.input_file.name), ('output_size', conversion.output_file.name)):
+            path = os.path.join(settings.MEDIA_ROOT, name or '')
+            sizes[field] = os.path.getsize(path) if name and os.path.isfile(path) else None
+        Conversion.objects.filter(pk=conversion.pk).update(**sizes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0012_conversion_status_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversion',
+            name='input_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='last_accessed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversion',
+            name='output_size',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='conversion',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('cached', 'Cached'), ('failed', 'Failed'), ('expired', 'Expired')], default='queued', max_length=10),
+        ),
+        migrations.RunPython(fill_retention_fields, migrations.RunPython.noop),
+    ]
@@ -1,19 +1,61 @@
 import uuid
 from django.db import models
-from django.conf import settings
+from django.utils import timezone
 
-from converter.utils import handle_conversion_error
-from .storage import OverwriteStorage
+from converter.utils import handle_conversion_error, save_final_state
+from .storage import JobStorage, input_upload_to, output_upload_to
+# Conservé pour les migrations existantes (converter.models.OverwriteStorage)
+from .storage import OverwriteStorage  # noqa: F401
 from .converters import convert_file
 
 class Conversion(models.Model):
-    input_file = models.FileField(upload_to='uploads/', storage=OverwriteStorage())
-    output_file = models.FileField(upload_to='converted/', blank=True, null=True, storage=OverwriteStorage())
+    """
+    Conversion d'un fichier, suivie par son statut :
+    queued -> running -> succeeded | cached | failed -> expired.
+
+    Une conversion terminée passe à "expired" quand ses fichiers sont supprimés
+    par la rétention (voir retention.sweep). Chaque transition n'écrit que les champs qu'elle modifie (voir
+    jobs.claim_next_job, jobs.run_job et utils.save_final_state).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        CACHED = "cached", "Cached"
+        FAILED = "failed", "Failed"
+        EXPIRED = "expired", "Expired"
+
+    input_file = models.FileField(upload_to=input_upload_to, storage=JobStorage())
+    output_file = models.FileField(upload_to=output_upload_to, blank=True, null=True, storage=JobStorage())
     source_format = models.CharField(max_length=10)
     target_format = models.CharField(max_length=10)
-    converted = models.BooleanField(default=False)
     error_message = models.CharField(max_length=255, blank=True, null=True)
     token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    options = models.JSONField(default=dict, blank=True)
+    input_sha256 = models.CharField(max_length=64, blank=True, default="")
+    from_cache = models.BooleanField(default=False)
+    lane = models.CharField(max_length=20, default="default")
+    estimated_cost = models.FloatField(default=0)
+    engine = models.CharField(max_length=64, blank=True, default="")
+    duration = models.FloatField(blank=True, null=True)
+    batch = models.ForeignKey("ConversionBatch", on_delete=models.CASCADE, blank=True, null=True, related_name="conversions")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Fin de la conversion, puis dernier téléchargement : ordre d'éviction quand le quota est atteint
+    last_accessed_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    input_size = models.BigIntegerField(blank=True, null=True)
+    output_size = models.BigIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Réservation des jobs (statut, voie) et comptage des files par voie
+            models.Index(fields=["status", "lane"], name="conversion_status_lane"),
+            # Recherche des conversions terminées par ancienneté
+            models.Index(fields=["status", "finished_at"], name="conversion_status_finished"),
+        ]
 
     def __str__(self):
         return f"{self.source_format} to {self.target_format}"
@@ -24,3 +66,86 @@ class Conversion(models.Model):
             convert_file(self)
         except Exception as e:
             handle_conversion_error(self, e)
+            save_final_state(self)
+
+    @property
+    def is_pending(self):
+        """Indique si la conversion est encore en attente ou en cours."""
+        return self.status in (self.Status.QUEUED, self.Status.RUNNING)
+
+    @property
+    def converted(self):
+        """Indique si la conversion a produit un résultat (calculé ou repris du cache)."""
+        return self.status in (self.Status.SUCCEEDED, self.Status.CACHED)
+
+
+class ConversionBatch(models.Model):
+    """Lot de fichiers envoyés en une requête : une conversion par fichier, une seule archive à télécharger."""
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    target_format = models.CharField(max_length=10)
+    options = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"batch {self.token} to {self.target_format}"
+
+
+class ConversionStage(models.Model):
+    """Durée et volume d'une étape d'une conversion (écriture, décodage, encodage...)."""
+    conversion = models.ForeignKey(Conversion, on_delete=models.CASCADE, related_name="stages")
+    name = models.CharField(max_length=30)
+    duration = models.FloatField()
+    bytes_in = models.BigIntegerField(blank=True, null=True)
+    bytes_out = models.BigIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.conversion_id} {self.name}: {self.duration:.3f}s"
+
+
+class MetricCounter(models.Model):
+    """
+    Série d'un compteur Prometheus (nom et étiquettes), incrémentée à la fin de
+    chaque conversion : elle ne diminue jamais, même quand la rétention fait
+    expirer les conversions (voir metrics.record_conversion).
+    """
+    name = models.CharField(max_length=64)
+    labels = models.CharField(max_length=255, blank=True, default="")
+    value = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["name", "labels"], name="unique_metric_series"),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{{{self.labels}}} {self.value}"
+
+
+class UploadSession(models.Model):
+    """Upload découpé en morceaux, repris morceau par morceau avant de créer la conversion."""
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    total_chunks = models.IntegerField()
+    target_format = models.CharField(max_length=10)
+    options = models.JSONField(default=dict, blank=True)
+    finalized = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.total_chunks} chunks)"
+
+
+class UploadChunk(models.Model):
+    """Morceau reçu d'une session d'upload."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    index = models.IntegerField()
+    size = models.IntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "index"], name="unique_upload_chunk"),
+        ]
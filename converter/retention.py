@@ -0,0 +1,227 @@
+import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from django import db
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from converter import cache as result_cache
+from converter.chunked_upload import expire_sessions
+from converter.storage import get_scratch_root
+
+logger = logging.getLogger(__name__)
+
+# Conversions par requête de mise à jour
+SWEEP_BATCH_SIZE = 500
+# Un téléchargement ne réécrit la date d'accès que si elle a plus d'une minute
+ACCESS_RESOLUTION = timedelta(minutes=1)
+
+
+def get_input_ttl():
+    """Durée de conservation des fichiers envoyés, après la fin de la conversion."""
+    return timedelta(seconds=getattr(settings, "CONVERTER_INPUT_TTL", 24 * 3600))
+
+
+def get_output_ttl():
+    """Durée de conservation des résultats, après la fin de la conversion."""
+    return timedelta(seconds=getattr(settings, "CONVERTER_OUTPUT_TTL", 7 * 24 * 3600))
+
+
+def get_storage_quota():
+    """Place maximale occupée par les fichiers des conversions terminées (None = pas de limite)."""
+    return getattr(settings, "CONVERTER_STORAGE_QUOTA", None)
+
+
+def get_sweep_interval():
+    """Intervalle (en secondes) entre deux balayages lancés par le superviseur des workers (0 = jamais)."""
+    return getattr(settings, "CONVERTER_STORAGE_SWEEP_INTERVAL", 600)
+
+
+def mark_downloaded(conversions):
+    """
+    Enregistre le téléchargement de conversions (queryset), ce qui repousse leur
+    éviction quand le quota est atteint. Au plus une écriture par minute et par
+    conversion, quel que soit le nombre de téléchargements.
+    """
+    now = timezone.now()
+    conversions.filter(Q(last_accessed_at__isnull=True) | Q(last_accessed_at__lt=now - ACCESS_RESOLUTION)).update(
+        last_accessed_at=now
+    )
+
+
+def _finished():
+    """Conversions terminées dont les fichiers sont dans MEDIA_ROOT (pas celles de convert_bulk)."""
+    from converter.models import Conversion
+
+    return Conversion.objects.filter(
+        status__in=[Conversion.Status.SUCCEEDED, Conversion.Status.CACHED, Conversion.Status.FAILED],
+    ).filter(Q(input_file__startswith="uploads/") | Q(input_file=""))
+
+
+def _remove(name, job_dir):
+    """
+    Supprime un fichier stocké sous MEDIA_ROOT. Le répertoire du job
+    (uploads/<token>/ ou converted/<token>/) est supprimé en entier ; un fichier
+    rangé ailleurs (lot, anciens noms) est supprimé seul, avec ses répertoires
+    devenus vides.
+    """
+    if not name:
+        return
+    media_root = os.path.abspath(settings.MEDIA_ROOT)
+    path = os.path.abspath(os.path.join(media_root, name))
+    if os.path.commonpath([media_root, path]) != media_root:
+        return
+    if os.path.dirname(name) == job_dir:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    # Répertoires vides jusqu'à uploads/ ou converted/, qui sont conservés
+    directory = os.path.dirname(path)
+    while os.path.dirname(os.path.relpath(directory, media_root)):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def _in_batches(queryset):
+    """
+    Conversions (pk, token, input_file, output_file, input_size, output_size)
+    par paquets. Chaque paquet doit sortir du queryset une fois traité : le
+    paquet suivant est relu depuis le début, sans garder de curseur ouvert
+    pendant les mises à jour.
+    """
+    while True:
+        rows = list(queryset.values_list("pk", "token", "input_file", "output_file", "input_size", "output_size")[:SWEEP_BATCH_SIZE])
+        if not rows:
+            return
+        yield rows
+
+
+def _expire(rows):
+    """Supprime tous les fichiers des conversions et les marque expirées, en une requête."""
+    from converter.models import Conversion
+
+    for pk, token, input_name, output_name, *_ in rows:
+        _remove(input_name, f"uploads/{token}")
+        _remove(output_name, f"converted/{token}")
+    return Conversion.objects.filter(pk__in=[row[0] for row in rows]).update(
+        status=Conversion.Status.EXPIRED, input_file="", output_file=None, input_size=0, output_size=0,
+    )
+
+
+def storage_usage():
+    """Place occupée par les fichiers des conversions terminées et non expirées (en octets)."""
+    totals = _finished().aggregate(inputs=Sum("input_size"), outputs=Sum("output_size"))
+    return (totals["inputs"] or 0) + (totals["outputs"] or 0)
+
+
+def sweep(now=None):
+    """
+    Applique la politique de rétention aux fichiers des conversions terminées :
+
+    1. les fichiers envoyés plus vieux que CONVERTER_INPUT_TTL sont supprimés
+       (le résultat reste téléchargeable) ;
+    2. les conversions plus vieilles que CONVERTER_OUTPUT_TTL perdent leurs
+       fichiers et passent à l'état "expired" ;
+    3. tant que CONVERTER_STORAGE_QUOTA est dépassé, les conversions les moins
+       récemment téléchargées (ou terminées, si jamais téléchargées) expirent ;
+    4. les espaces de travail abandonnés (worker arrêté brutalement) et les
+       sessions d'upload inactives sont supprimés ;
+    5. le cache des résultats est ramené sous sa taille maximale.
+
+    Les conversions en attente ou en cours ne sont jamais touchées. Les lignes
+    sont mises à jour par paquets, sans passer par save().
+
+    Returns:
+        dict: nombre de fichiers d'entrée supprimés, de conversions expirées
+        (par TTL et par quota), d'espaces de travail, de sessions d'upload non
+        finalisées et d'entrées du cache supprimés.
+    """
+    from converter.models import Conversion
+
+    now = now or timezone.now()
+    result = {"inputs": 0, "expired": 0, "evicted": 0, "scratch": 0, "sessions": 0, "cache": 0}
+
+    stale_inputs = _finished().filter(finished_at__lt=now - get_input_ttl()).exclude(input_file="")
+    for rows in _in_batches(stale_inputs):
+        for pk, token, input_name, *_ in rows:
+            _remove(input_name, f"uploads/{token}")
+        result["inputs"] += Conversion.objects.filter(pk__in=[row[0] for row in rows]).update(input_file="", input_size=0)
+
+    for rows in _in_batches(_finished().filter(finished_at__lt=now - get_output_ttl())):
+        result["expired"] += _expire(rows)
+
+    quota = get_storage_quota()
+    if quota is not None:
+        excess = storage_usage() - quota
+        if excess > 0:
+            candidates = _finished().order_by("last_accessed_at", "pk")
+            for rows in _in_batches(candidates):
+                selected = []
+                for row in rows:
+                    selected.append(row)
+                    excess -= (row[4] or 0) + (row[5] or 0)
+                    if excess <= 0:
+                        break
+                result["evicted"] += _expire(selected)
+                if excess <= 0:
+                    break
+
+    result["scratch"] = remove_stale_scratch(now)
+    result["sessions"] = expire_sessions()
+    if result_cache.is_enabled():
+        result["cache"] = result_cache.evict()
+    return result
+
+
+def remove_stale_scratch(now=None):
+    """Supprime les espaces de travail plus vieux que CONVERTER_INPUT_TTL (aucune conversion ne dure autant)."""
+    limit = (now or timezone.now()).timestamp() - get_input_ttl().total_seconds()
+    scratch_root = get_scratch_root()
+    removed = 0
+    for entry in os.scandir(scratch_root):
+        try:
+            stale = entry.stat().st_mtime < limit
+        except FileNotFoundError:
+            continue
+        if stale:
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+class Sweeper:
+    """
+    Balayage périodique de la rétention, appelé depuis une boucle de supervision.
+    La connexion à la base est refermée après chaque balayage : le superviseur
+    des workers ne doit pas en transmettre une ouverte aux processus qu'il crée.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = get_sweep_interval() if interval is None else interval
+        self.last_run = None
+
+    def maybe_run(self):
+        if not self.interval or (self.last_run is not None and time.monotonic() - self.last_run < self.interval):
+            return None
+        self.last_run = time.monotonic()
+        try:
+            return sweep()
+        except Exception:
+            # Le balayage ne doit jamais arrêter la supervision des workers
+            logger.exception("Storage sweep failed")
+            return None
+        finally:
+            db.connections.close_all()
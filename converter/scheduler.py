@@ -0,0 +1,217 @@
+import math
+import os
+import re
+
+from django.conf import settings
+
+from converter.utils import normalize_format
+
+# Configuration par défaut des voies : concurrence maximale, profondeur de file et
+# workers réservés (que les autres voies ne peuvent pas occuper)
+DEFAULT_LANES = {
+    "image": {"concurrency": 4, "max_queue": 500, "reserved": 1},
+    "pdf-raster": {"concurrency": 2, "max_queue": 50, "reserved": 0},
+    "libreoffice": {"concurrency": 2, "max_queue": 50, "reserved": 0},
+    "table": {"concurrency": 2, "max_queue": 100, "reserved": 0},
+    "document": {"concurrency": 2, "max_queue": 100, "reserved": 0},
+    "default": {"concurrency": 1, "max_queue": 100, "reserved": 0},
+}
+
+LIBREOFFICE_SOURCES = ["odt"]
+SLIDE_SOURCES = ["pptx", "odp"]
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?!s)")
+# Longueur maximale d'une correspondance, conservée d'un bloc au suivant
+PDF_PAGE_OVERLAP = 64
+READ_BLOCK_SIZE = 1024 * 1024
+MEGABYTE = 1024 * 1024
+
+
+class LaneFull(Exception):
+    """La voie ne peut plus accepter de conversion pour le moment."""
+
+    def __init__(self, lane, retry_after):
+        super().__init__(f"Lane '{lane}' is full, retry in {retry_after} seconds")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+def get_lanes():
+    """Retourne la configuration des voies (paramètre CONVERTER_LANES)."""
+    lanes = {name: dict(config) for name, config in DEFAULT_LANES.items()}
+    for name, config in getattr(settings, "CONVERTER_LANES", {}).items():
+        lanes.setdefault(name, {"reserved": 0}).update(config)
+    return lanes
+
+
+def available_lanes(running, workers):
+    """
+    Voies dont une conversion peut être réservée, selon le nombre de conversions
+    en cours par voie (`running`) et le nombre de workers.
+
+    Une voie doit rester sous sa limite de concurrence et laisser libres les
+    workers réservés aux autres voies qui ne les occupent pas : sur un petit
+    nœud, les conversions d'images ne restent pas bloquées derrière des
+    documents LibreOffice ou des rendus de PDF. Les réservations laissent
+    toujours au moins un worker aux autres voies.
+    """
+    lanes = get_lanes()
+    free = workers - sum(running.values())
+    available = []
+    for lane, config in lanes.items():
+        if running.get(lane, 0) >= config["concurrency"]:
+            continue
+        held = min(workers - 1, sum(
+            max(0, other["reserved"] - running.get(name, 0))
+            for name, other in lanes.items()
+            if name != lane
+        ))
+        if free > held:
+            available.append(lane)
+    return available
+
+
+def lane_for(source_format, target_format):
+    """
+    Retourne la voie (moteur) qui traitera une conversion. Pour une conversion
+    en plusieurs étapes, c'est la voie de l'étape la plus coûteuse.
+    """
+    from converter.converters.registry import plan_conversion
+
+    source_format = normalize_format(source_format)
+    target_format = normalize_format(target_format or "")
+    plan = plan_conversion(source_format, target_format)
+    if not plan:
+        return "default"
+    step = max(plan, key=lambda edge: edge.cost)
+    return _engine_lane(step.engine, step.source_format)
+
+
+def _engine_lane(engine, source_format):
+    if engine in ("image", "frames"):
+        return "image"
+    if engine == "pdf_images":
+        return "pdf-raster"
+    if engine in ("writer_writer", "slides") or (engine == "writer_pdf" and source_format in LIBREOFFICE_SOURCES):
+        return "libreoffice"
+    if engine == "table":
+        return "table"
+    if engine == "writer_pdf":
+        return "document"
+    return "default"
+
+
+def count_pdf_pages(input_path):
+    """Estime rapidement le nombre de pages d'un PDF sans le rendre."""
+    try:
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(input_path)["Pages"])
+    except Exception:
+        # Poppler indisponible : comptage des objets /Page dans le fichier, bloc par bloc
+        count = 0
+        tail = b""
+        with open(input_path, "rb") as f:
+            while block := f.read(READ_BLOCK_SIZE):
+                data = tail + block
+                # Une correspondance commençant dans les derniers octets est comptée avec le bloc suivant
+                limit = max(0, len(data) - PDF_PAGE_OVERLAP)
+                count += sum(1 for match in PDF_PAGE_PATTERN.finditer(data) if match.start() < limit)
+                tail = data[limit:]
+        count += len(PDF_PAGE_PATTERN.findall(tail))
+        return max(1, count)
+
+
+def image_megapixels(input_path):
+    """Lit les dimensions (et le nombre de frames) d'une image depuis ses en-têtes, sans la décoder."""
+    from PIL import Image
+    with Image.open(input_path) as img:
+        width, height = img.size
+        frames = getattr(img, "n_frames", 1)
+    return width * height * frames / 1_000_000
+
+
+def estimate_cost(input_path, lane, options=None, probe=True):
+    """
+    Estime le coût d'une conversion (en secondes approximatives) à partir de
+    sondes peu coûteuses : taille du fichier, nombre de pages ou de diapositives,
+    dimensions.
+
+    Sans `probe`, seuls la taille et les en-têtes d'une image sont lus : c'est
+    l'estimation faite pendant l'upload, que le worker affine ensuite.
+    """
+    options = options or {}
+    size_mb = os.path.getsize(input_path) / MEGABYTE
+
+    try:
+        if lane == "image":
+            return 0.01 + 0.02 * image_megapixels(input_path)
+        if probe and lane == "pdf-raster":
+            dpi = int(options.get("dpi", getattr(settings, "CONVERTER_PDF_DPI", 200)))
+            return 0.3 * count_pdf_pages(input_path) * (dpi / 200) ** 2
+        extension = os.path.splitext(input_path)[1].lstrip(".").lower()
+        if probe and lane == "libreoffice" and extension in SLIDE_SOURCES:
+            from converter.converters.slide_converter import count_slides
+            return 2.0 + 0.3 * count_slides(input_path, extension)
+    except Exception:
+        pass
+
+    if lane == "libreoffice":
+        return 2.0 + 0.5 * size_mb
+    return 0.1 + 0.5 * size_mb
+
+
+def check_admission(source_format, target_format, count=1):
+    """
+    Vérifie que `count` nouvelles conversions peuvent entrer dans leur voie.
+
+    Lève LaneFull, avec un délai de nouvel essai estimé à partir du coût des
+    conversions déjà en attente, si la file de la voie est pleine.
+    """
+    from django.db.models import Sum
+    from converter.models import Conversion
+
+    lane = lane_for(source_format, target_format)
+    config = get_lanes()[lane]
+    pending = Conversion.objects.filter(lane=lane, status__in=[Conversion.Status.QUEUED, Conversion.Status.RUNNING])
+
+    if pending.count() + count > config["max_queue"]:
+        queued_cost = pending.aggregate(total=Sum("estimated_cost"))["total"] or 0
+        retry_after = min(300, max(1, math.ceil(queued_cost / config["concurrency"])))
+        raise LaneFull(lane, retry_after)
+    return lane
+
+
+def schedule(conversion):
+    """
+    Affecte la voie et un premier coût estimé d'une conversion, pendant l'upload :
+    d'après les formats et la taille du fichier seulement (voir refine_schedule).
+    """
+    conversion.lane = lane_for(conversion.source_format, conversion.target_format)
+    try:
+        conversion.estimated_cost = estimate_cost(conversion.input_file.path, conversion.lane, conversion.options, probe=False)
+    except OSError:
+        conversion.estimated_cost = 0
+
+
+def refine_schedule(conversion):
+    """
+    Affine la voie et le coût d'une conversion à l'aide des sondes (nombre de
+    pages ou de diapositives, rendu d'un DOCX), dans le worker qui l'a réservée.
+
+    Returns:
+        tuple: (voie, coût estimé). Un DOCX que le rendu natif ne sait pas
+        reproduire passe de la voie "document" à la voie "libreoffice".
+    """
+    lane = conversion.lane
+    if lane == "document" and normalize_format(conversion.source_format) == "docx":
+        lane = _docx_lane(conversion.input_file.path, conversion.options)
+    try:
+        return lane, estimate_cost(conversion.input_file.path, lane, conversion.options)
+    except OSError:
+        return lane, conversion.estimated_cost
+
+
+def _docx_lane(input_path, options):
+    """Un DOCX que le rendu natif ne sait pas reproduire (voir docx_pdf.probe_docx) passe par LibreOffice."""
+    from converter.converters.docx_pdf import choose_docx_renderer
+
+    return "libreoffice" if choose_docx_renderer(input_path, options) == "libreoffice" else "document"
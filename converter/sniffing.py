@@ -0,0 +1,131 @@
+import codecs
+from zipfile import ZipFile, BadZipFile
+
+from converter.formats import image_formats, writer_formats, table_formats, slide_formats, pdf_format
+from converter.utils import normalize_format
+
+# Octets lus en tête de fichier pour reconnaître son format
+HEADER_SIZE = 8 * 1024
+
+# Signatures en tête de fichier : (décalage, octets, format)
+MAGIC_NUMBERS = [
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"\xff\xd8\xff", "jpeg"),
+    (0, b"GIF87a", "gif"),
+    (0, b"GIF89a", "gif"),
+    (0, b"II*\x00", "tiff"),
+    (0, b"MM\x00*", "tiff"),
+    (0, b"\x00\x00\x01\x00", "ico"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "xls"),
+    (0, b"PK\x03\x04", "zip"),
+]
+WEBP_SIGNATURE = (b"RIFF", b"WEBP")
+# "BM" seul est trop court : un fichier texte peut commencer ainsi. Les octets
+# réservés de l'en-tête BMP (6 à 9) sont nuls.
+BMP_SIGNATURE = (b"BM", b"\x00\x00\x00\x00")
+# La norme tolère des octets avant l'en-tête d'un PDF
+PDF_SIGNATURE = b"%PDF-"
+PDF_SIGNATURE_WINDOW = 1024
+
+# Paquets ZIP : membre caractéristique de chaque format OOXML
+OOXML_MEMBERS = {
+    "word/document.xml": "docx",
+    "xl/workbook.xml": "xlsx",
+    "ppt/presentation.xml": "pptx",
+}
+ODF_MIMETYPES = {
+    "application/vnd.oasis.opendocument.text": "odt",
+    "application/vnd.oasis.opendocument.presentation": "odp",
+    "application/vnd.oasis.opendocument.spreadsheet": "ods",
+}
+
+SOURCE_FORMATS = image_formats + writer_formats + table_formats + slide_formats + pdf_format
+
+# Formats sans signature : reconnus seulement comme du texte
+TEXT_FORMATS = ["txt", "csv", "tsv"]
+TEXT_BOMS = [codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE]
+# Formats contenus dans un paquet ZIP
+PACKAGE_FORMATS = list(OOXML_MEMBERS.values()) + list(ODF_MIMETYPES.values())
+
+
+class FormatMismatch(Exception):
+    """Le contenu du fichier ne correspond pas au format annoncé par son nom."""
+
+
+def sniff_header(header):
+    """
+    Reconnaît le format d'un fichier d'après ses premiers octets.
+
+    Retourne le format ("png", "pdf"...), "zip" pour un paquet dont le format
+    se lit dans le répertoire central (voir `sniff_package`), "text" pour un
+    fichier texte, ou None s'il n'est pas reconnu.
+    """
+    for offset, signature, fmt in MAGIC_NUMBERS:
+        if header[offset:offset + len(signature)] == signature:
+            return fmt
+    if header[:4] == WEBP_SIGNATURE[0] and header[8:12] == WEBP_SIGNATURE[1]:
+        return "webp"
+    if header[:2] == BMP_SIGNATURE[0] and header[6:10] == BMP_SIGNATURE[1]:
+        return "bmp"
+    if PDF_SIGNATURE in header[:PDF_SIGNATURE_WINDOW]:
+        return "pdf"
+    if any(header.startswith(bom) for bom in TEXT_BOMS) or b"\x00" not in header:
+        return "text"
+    return None
+
+
+def sniff_package(path):
+    """Format d'un paquet ZIP (docx, xlsx, pptx, odt, odp...), lu dans son seul répertoire central."""
+    try:
+        with ZipFile(path) as package:
+            names = set(package.namelist())
+            if "mimetype" in names:
+                mimetype = package.read("mimetype").decode("ascii", "replace").strip()
+                return ODF_MIMETYPES.get(mimetype, "zip")
+    except (BadZipFile, OSError):
+        return None
+    for member, fmt in OOXML_MEMBERS.items():
+        if member in names:
+            return fmt
+    return "zip"
+
+
+def is_compatible(declared, detected):
+    """
+    Indique si le format détecté est celui annoncé (jpg/jpeg, fichiers texte).
+    Un paquet ZIP dont le format n'est pas encore lu est compatible avec tout
+    format de paquet.
+    """
+    if detected == "text":
+        return declared in TEXT_FORMATS
+    if detected == "zip":
+        return declared in PACKAGE_FORMATS
+    return normalize_format(declared) == normalize_format(detected)
+
+
+def resolve_source_format(file_name, detected):
+    """
+    Détermine le format source d'un fichier à partir de son nom et du format détecté.
+
+    Un nom sans extension connue prend le format détecté ; une extension connue
+    qui contredit le contenu lève FormatMismatch.
+    """
+    declared = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
+    if declared in SOURCE_FORMATS:
+        if detected is None or not is_compatible(declared, detected):
+            raise FormatMismatch(
+                f"File content does not match its extension: .{declared} file detected as {detected or 'unknown'}"
+            )
+        return declared
+    if detected == "text":
+        return "txt"
+    if detected in SOURCE_FORMATS:
+        return detected
+    raise FormatMismatch(f"Unrecognized file format: {file_name}")
+
+
+def sniff_file(path):
+    """Reconnaît le format d'un fichier déjà écrit (en-tête, puis répertoire central des paquets)."""
+    with open(path, "rb") as f:
+        detected = sniff_header(f.read(HEADER_SIZE))
+    return sniff_package(path) if detected == "zip" else detected
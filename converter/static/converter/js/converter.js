@@ -31,9 +31,16 @@ form.addEventListener("submit", async (event) => {
             },
         });
 
-        const data = await response.json();
+        let data = await response.json();
 
-        if (data.status === "success") {
+        // La conversion est traitée en arrière-plan : on interroge son statut
+        while (data.status === "queued" || data.status === "running") {
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            const statusResponse = await fetch(data.status_url);
+            data = await statusResponse.json();
+        }
+
+        if (data.status === "succeeded") {
             convertButton.classList.add("shrink");
             setTimeout(() => {
                 downloadButton.dataset.downloadUrl = data.download_url; // Associe l'URL
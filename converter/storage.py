@@ -1,8 +1,15 @@
 import os
+import shutil
+import tempfile
 import time
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.core.files.storage import FileSystemStorage
 
 class OverwriteStorage(FileSystemStorage):
+    """Ancien stockage à noms fixes, conservé pour les migrations existantes."""
+
     def get_available_name(self, name, max_length=None):
         file_path = os.path.join(self.location, name)
 
@@ -17,3 +24,85 @@ class OverwriteStorage(FileSystemStorage):
             else:
                 raise PermissionError(f"Cannot remove locked file: {file_path}")
         return name
+
+
+class JobStorage(FileSystemStorage):
+    """
+    Stockage des fichiers de conversion, répartis dans un répertoire par token.
+
+    Deux conversions ne partagent jamais de répertoire : un nom déjà pris ne peut
+    venir que du même job, et le comportement par défaut de Django (suffixe
+    aléatoire) suffit, sans suppression ni attente.
+    """
+
+
+def input_upload_to(instance, filename):
+    """Chemin de stockage d'un fichier envoyé : uploads/<token>/<nom>."""
+    return f"uploads/{instance.token}/{filename}"
+
+
+def input_file_name(instance, filename, max_length):
+    """
+    Chemin de stockage d'un fichier écrit directement dans le répertoire du job
+    (sans passer par le stockage), raccourci pour tenir dans le champ du modèle.
+    """
+    filename = JobStorage().get_valid_name(os.path.basename(filename))
+    name = input_upload_to(instance, filename)
+    if len(name) > max_length:
+        root, ext = os.path.splitext(filename)
+        name = input_upload_to(instance, root[:max(1, len(root) - (len(name) - max_length))] + ext)
+    return name
+
+
+def free_input_file_name(instance, filename, max_length):
+    """
+    Comme input_file_name, pour un fichier qui ne doit pas en remplacer un
+    autre du job : un nom déjà pris reçoit un suffixe numéroté (a-2.png, a-3.png…).
+    """
+    name = input_file_name(instance, filename, max_length)
+    root, ext = os.path.splitext(os.path.basename(filename))
+    index = 2
+    while os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+        name = input_file_name(instance, f"{root}-{index}{ext}", max_length)
+        index += 1
+    return name
+
+
+def output_upload_to(instance, filename):
+    """Chemin de stockage d'un résultat : converted/<token>/<nom>."""
+    return f"converted/{instance.token}/{filename}"
+
+
+def get_scratch_root():
+    """Répertoire racine des espaces de travail (sur le même disque que MEDIA_ROOT)."""
+    scratch_root = os.path.join(settings.MEDIA_ROOT, "scratch")
+    os.makedirs(scratch_root, exist_ok=True)
+    return scratch_root
+
+
+@contextmanager
+def job_scratch_dir(instance):
+    """
+    Fournit un répertoire de travail propre à une conversion, supprimé à la fin.
+
+    Il est placé sous MEDIA_ROOT pour que la publication du résultat soit un
+    simple renommage atomique.
+    """
+    scratch_dir = tempfile.mkdtemp(prefix=f"{instance.token}_", dir=get_scratch_root())
+    try:
+        yield scratch_dir
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def publish_output(instance, temp_path):
+    """
+    Déplace un fichier produit dans l'espace de travail vers le répertoire de
+    sortie du job, par renommage atomique, et l'associe à la conversion.
+    """
+    name = output_upload_to(instance, os.path.basename(temp_path))
+    final_path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(temp_path, final_path)
+    instance.output_file.name = name
+    return final_path
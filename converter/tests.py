@@ -1,18 +1,34 @@
+import io
 import os
 import re
 import uuid
 import csv
+import shutil
+import tempfile
 from PIL import Image
 from django.conf import settings
-from django.test import TestCase
-from docx import Document
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Border, Side
+from converter.fixtures import create_fake_file
 from converter.formats import image_formats, writer_formats, table_formats, slide_formats, pdf_format
 
 from converter.models import Conversion
 
+TEST_CACHE_DIR = os.path.join(tempfile.gettempdir(), "file_converter_test_cache")
 
+
+def remove_generated_file(file_path):
+    """Supprime un fichier généré et son répertoire de job s'il est vide."""
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+        parent_dir = os.path.dirname(file_path)
+        if os.path.basename(os.path.dirname(parent_dir)) == "converted" and not os.listdir(parent_dir):
+            os.rmdir(parent_dir)
+
+
+@override_settings(CONVERTER_CACHE_DIR=TEST_CACHE_DIR)
 class ConversionTestCase(TestCase):
     def setUp(self):
         """Initialise les variables de test et crée les dossiers nécessaires."""
@@ -79,49 +95,7 @@ class ConversionTestCase(TestCase):
     def create_fake_file(self, file_name, file_type):
         """Crée un fichier factice pour un format donné."""
         file_path = os.path.join(self.uploads_dir, file_name)
-
-        if file_type in image_formats:
-            image = Image.new('RGB', (100, 100), color=(255, 0, 0))
-            image.save(file_path)
-            
-        elif file_type in writer_formats:
-            if file_type == "docx":
-                doc = Document()
-                doc.add_paragraph("This is a test file.")
-                doc.save(file_path)
-            else:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write("This is a test file.")
-        
-        elif file_type in table_formats:
-            if file_type == "xlsx":
-                from openpyxl import Workbook
-                wb = Workbook()
-                ws = wb.active
-                ws["A1"] = "This is a test file."
-                wb.save(file_path)
-            else:
-                pass # TODO: Add support for other table formats
-           
-        elif file_type in slide_formats:
-            if file_type == "pptx":
-                from pptx import Presentation
-                presentation = Presentation()
-                slide = presentation.slides.add_slide(presentation.slide_layouts[0])
-                slide.shapes.title.text = "Test Presentation"
-                slide.placeholders[1].text = "This is a test file."
-                presentation.save(file_path)  
-            else:
-                pass # TODO: Add support for other slide formats
-            
-        elif file_type == pdf_format:
-            from fpdf import FPDF
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            pdf.cell(200, 10, txt="This is a test file.", ln=True)
-            pdf.output(file_path)
-        
+        create_fake_file(file_path, file_type)
         self.generated_files.append(file_path)
         return file_path
 
@@ -172,5 +146,1244 @@ class ConversionTestCase(TestCase):
     def tearDown(self):
         """Nettoie les fichiers générés après les tests."""
         for file_path in self.generated_files:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            remove_generated_file(file_path)
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+
+
+@override_settings(CONVERTER_CACHE_ENABLED=False)
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        """Crée une conversion d'image en attente dans la file."""
+        self.uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.file_path = os.path.join(self.uploads_dir, f"test_queue_{uuid.uuid4().hex}.png")
+        Image.new('RGB', (10, 10), color=(0, 255, 0)).save(self.file_path)
+        self.conversion = Conversion.objects.create(input_file=self.file_path, source_format="png", target_format="jpeg")
+
+    def test_claim_and_run_job(self):
+        """Un worker réserve la conversion, l'exécute et enregistre son état final."""
+        from converter.jobs import claim_next_job, run_job
+
+        job = claim_next_job()
+        self.assertEqual(job.pk, self.conversion.pk)
+        self.assertEqual(job.status, Conversion.Status.RUNNING)
+        self.assertIsNone(claim_next_job())
+
+        self.assertIsNotNone(job.started_at)
+
+        # Une seule écriture pour l'état final (statut, sortie, durée...)
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            run_job(job)
+        updates = [query["sql"] for query in queries if query["sql"].startswith('UPDATE "converter_conversion"')]
+        self.assertEqual(len(updates), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Conversion.Status.SUCCEEDED, job.error_message)
+        self.assertTrue(job.created_at <= job.started_at <= job.finished_at)
+        self.output_path = job.output_file.path
+
+    def test_final_state_keeps_normalized_formats(self):
+        """Les formats normalisés par la conversion (jpg -> jpeg) sont enregistrés avec l'état final."""
+        from converter.jobs import claim_next_job, run_job
+
+        Conversion.objects.filter(pk=self.conversion.pk).update(source_format="PNG", target_format="jpg")
+        job = claim_next_job()
+        run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Conversion.Status.SUCCEEDED, job.error_message)
+        self.assertEqual((job.source_format, job.target_format), ("png", "jpeg"))
+        self.output_path = job.output_file.path
+
+    @override_settings(CONVERTER_LANES={"image": {"concurrency": 1}})
+    def test_lane_concurrency_limit(self):
+        """Une voie pleine n'est plus servie tant que ses conversions tournent."""
+        from converter.jobs import claim_next_job, enqueue
+
+        other = Conversion.objects.create(input_file=self.file_path, source_format="png", target_format="gif")
+        enqueue(self.conversion)
+        enqueue(other)
+        self.assertEqual(self.conversion.lane, "image")
+
+        self.assertEqual(claim_next_job().pk, self.conversion.pk)
+        self.assertIsNone(claim_next_job())
+
+    def create_job(self, lane, estimated_cost=1.0, status=Conversion.Status.QUEUED):
+        return Conversion.objects.create(input_file=self.file_path, source_format="png", target_format="jpeg",
+                                         lane=lane, estimated_cost=estimated_cost, status=status)
+
+    def test_reserved_workers_and_cost_priority(self):
+        """Les workers réservés aux images restent libres ; entre les voies, la conversion la moins coûteuse passe d'abord."""
+        from converter.jobs import claim_next_job
+
+        Conversion.objects.filter(pk=self.conversion.pk).delete()
+        self.create_job("pdf-raster", status=Conversion.Status.RUNNING)
+        document = self.create_job("libreoffice", estimated_cost=0.5)
+        image = self.create_job("image", estimated_cost=2.0)
+        later_image = self.create_job("image", estimated_cost=0.01)
+
+        # Sur 2 workers, le dernier libre est réservé aux images ; dans une voie, l'ordre d'arrivée prime
+        self.assertEqual(claim_next_job(workers=2).pk, image.pk)
+        self.assertIsNone(claim_next_job(workers=2))
+        # Avec de la place, le document (moins coûteux que la tête de la voie image) passe avant
+        Conversion.objects.filter(pk=image.pk).update(status=Conversion.Status.QUEUED)
+        self.assertEqual(claim_next_job(workers=4).pk, document.pk)
+        self.assertEqual(claim_next_job(workers=4).pk, image.pk)
+        self.assertEqual(claim_next_job(workers=4).pk, later_image.pk)
+
+    def test_probes_run_in_worker(self):
+        """L'upload n'exécute pas les sondes ; le worker les exécute et change la voie si besoin."""
+        from unittest import mock
+        from converter.jobs import claim_next_job, enqueue, run_job
+
+        pdf = Conversion.objects.create(input_file=self.file_path, source_format="pdf", target_format="png")
+        with mock.patch("converter.scheduler.count_pdf_pages", return_value=10) as count_pages:
+            enqueue(pdf)
+            count_pages.assert_not_called()
+            self.assertEqual(pdf.lane, "pdf-raster")
+
+        Conversion.objects.filter(pk=self.conversion.pk).update(lane="document")
+        job = claim_next_job()
+        self.assertEqual(job.pk, self.conversion.pk)
+        with mock.patch("converter.jobs.refine_schedule", return_value=("libreoffice", 4.0)), \
+                mock.patch.object(Conversion, "convert_file") as convert_file:
+            run_job(job)
+        convert_file.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.lane, job.estimated_cost), (Conversion.Status.QUEUED, "libreoffice", 4.0))
+
+    def test_pdf_pages_counted_by_blocks(self):
+        """Sans Poppler, les pages d'un PDF sont comptées bloc par bloc, y compris à cheval sur deux blocs."""
+        from unittest import mock
+        from converter import scheduler
+
+        pdf_path = os.path.join(self.uploads_dir, f"test_pages_{uuid.uuid4().hex}.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF-1.4\n<< /Type /Pages /Count 50 >>\n")
+            for i in range(50):
+                f.write(b"x" * (i * 7 % 40) + b"<< /Type /Page >>\n")
+        try:
+            with mock.patch("pdf2image.pdfinfo_from_path", side_effect=Exception("no poppler")):
+                for block_size in [100, 1024 * 1024]:
+                    with mock.patch.object(scheduler, "READ_BLOCK_SIZE", block_size):
+                        self.assertEqual(scheduler.count_pdf_pages(pdf_path), 50)
+        finally:
+            os.remove(pdf_path)
+
+    @override_settings(CONVERTER_LANES={"image": {"max_queue": 1}})
+    def test_full_lane_returns_429(self):
+        """Un upload vers une voie pleine est refusé avec Retry-After."""
+        from converter.jobs import enqueue
+
+        enqueue(self.conversion)
+        with open(self.file_path, "rb") as f:
+            response = self.client.post(
+                "/converter/upload/",
+                {"input_file": f, "target_format": "gif"},
+                headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    def test_status_endpoint(self):
+        """L'endpoint de statut renvoie l'état de la conversion en JSON."""
+        response = self.client.get(f"/converter/status/{self.conversion.token}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "queued")
+
+    def tearDown(self):
+        """Nettoie les fichiers générés après les tests."""
+        for file_path in [self.file_path, getattr(self, "output_path", None)]:
+            remove_generated_file(file_path)
+
+
+class FakeLibreOfficeInstance:
+    """Instance LibreOffice simulée : compte les démarrages et conversions, peut échouer ou se bloquer."""
+
+    def __init__(self, binary):
+        self.starts = 0
+        self.jobs = 0
+        self.healthy = False
+        self.fail_next = False
+
+    def start(self):
+        self.starts += 1
+        self.jobs = 0
+        self.healthy = True
+
+    def stop(self):
+        self.healthy = False
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_healthy(self):
+        return self.healthy
+
+    def convert(self, input_path, output_path, target_format):
+        if self.fail_next:
+            self.fail_next = False
+            raise ValueError("document could not be loaded")
+        self.jobs += 1
+
+
+class LibreOfficePoolTestCase(TestCase):
+    def setUp(self):
+        from converter.converters.libreoffice import LibreOfficePool
+
+        self.pool = LibreOfficePool(size=1, max_jobs=2, instance_class=FakeLibreOfficeInstance)
+
+    def convert(self):
+        self.pool.convert("in.docx", "out.pdf", "pdf")
+        return self.pool._all[0]
+
+    def test_health_check_failure_and_recycling_restart_the_instance(self):
+        """Instance démarrée au premier usage, redémarrée si elle ne répond plus, après un échec et après max_jobs."""
+        instance = self.convert()
+        self.assertEqual((instance.starts, instance.jobs), (1, 1))
+
+        instance.healthy = False
+        self.convert()
+        self.assertEqual((instance.starts, instance.jobs), (2, 1))
+
+        # Deuxième conversion depuis le redémarrage : recyclage
+        self.convert()
+        self.assertEqual((instance.starts, instance.jobs), (3, 0))
+
+        instance.fail_next = True
+        with self.assertRaises(ValueError):
+            self.convert()
+        self.assertEqual(instance.starts, 4)
+        self.assertEqual(len(self.pool._all), 1)
+        self.assertIs(self.convert(), instance)
+
+    def test_unavailable_pool_falls_back_to_soffice(self):
+        """Sans instance disponible, la conversion passe par un soffice ponctuel."""
+        from unittest import mock
+        from converter.converters import libreoffice
+
+        pool = mock.Mock()
+        pool.convert.side_effect = libreoffice.LibreOfficeUnavailable("soffice exited during startup")
+        with mock.patch.object(libreoffice, "get_pool", return_value=pool), \
+                mock.patch.object(libreoffice, "convert_with_soffice") as soffice:
+            libreoffice.convert_via_libreoffice("in.docx", "out.pdf", "pdf")
+        soffice.assert_called_once_with("in.docx", "out.pdf", "pdf")
+
+    def test_watchdog_kills_a_hung_instance(self):
+        """Un appel UNO bloqué au-delà du délai tue le processus et lève LibreOfficeTimeout."""
+        import subprocess
+        import sys
+        from converter.converters.libreoffice import LibreOfficeInstance, LibreOfficeTimeout
+
+        instance = LibreOfficeInstance("soffice")
+        instance.process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+
+        def hung_call():
+            # Un appel UNO échoue quand le processus distant disparaît
+            instance.process.wait()
+            raise RuntimeError("Binary URP bridge disposed")
+
+        try:
+            with self.assertRaises(LibreOfficeTimeout):
+                instance.run_with_watchdog(hung_call, timeout=0.2)
+            self.assertIsNotNone(instance.process.poll())
+            # Un appel rapide n'est pas interrompu
+            self.assertEqual(instance.run_with_watchdog(lambda: "ok", timeout=5), "ok")
+        finally:
+            if instance.process.poll() is None:
+                instance.process.kill()
+            instance.process.wait()
+
+
+@override_settings(CONVERTER_CACHE_DIR=TEST_CACHE_DIR)
+class ResultCacheTestCase(TestCase):
+    def setUp(self):
+        """Crée une image source et vide le cache de test."""
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+        self.uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.file_path = os.path.join(self.uploads_dir, f"test_cache_{uuid.uuid4().hex}.png")
+        Image.new('RGB', (10, 10), color=(0, 0, 255)).save(self.file_path)
+        self.generated_files = [self.file_path]
+
+    def convert(self, options=None):
+        conversion = Conversion(input_file=self.file_path, source_format="png", target_format="webp", options=options or {})
+        conversion.convert_file()
+        self.assertTrue(conversion.converted, conversion.error_message)
+        self.generated_files.append(conversion.output_file.path)
+        return conversion
+
+    def test_second_conversion_is_served_from_cache(self):
+        """Une entrée identique avec les mêmes options est servie par le cache."""
+        self.assertFalse(self.convert().from_cache)
+        self.assertEqual(self.convert().status, Conversion.Status.CACHED)
+        self.assertFalse(self.convert({"quality": 50}).from_cache)
+        # Compteurs déduits des conversions : visibles depuis n'importe quel processus
+        from converter import cache as result_cache
+
+        stats = result_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_eviction_respects_size_limit(self):
+        """L'éviction LRU ramène le cache sous la taille maximale."""
+        from converter import cache as result_cache
+
+        self.convert()
+        self.assertEqual(result_cache.stats()["entries"], 1)
+        result_cache.evict(max_bytes=0)
+        self.assertEqual(result_cache.stats()["entries"], 0)
+
+    def test_cache_hit_keeps_served_outputs_unchanged(self):
+        """Un accès au cache ne modifie pas la date (donc l'ETag) des résultats déjà servis."""
+        first = self.convert()
+        second = self.convert()
+        self.assertTrue(second.from_cache)
+        mtime = os.stat(second.output_file.path).st_mtime_ns
+        os.utime(second.output_file.path, ns=(mtime - 10**9, mtime - 10**9))
+        mtime = os.stat(second.output_file.path).st_mtime_ns
+        self.assertTrue(self.convert().from_cache)
+        self.assertEqual(os.stat(second.output_file.path).st_mtime_ns, mtime)
+        self.assertNotEqual(first.output_file.path, second.output_file.path)
+
+    def tearDown(self):
+        """Nettoie les fichiers générés et le cache de test."""
+        for file_path in self.generated_files:
+            remove_generated_file(file_path)
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+
+
+@override_settings(CONVERTER_CACHE_DIR=TEST_CACHE_DIR)
+class RouterTestCase(TestCase):
+    def setUp(self):
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+        self.uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        self.file_path = os.path.join(self.uploads_dir, f"test_router_{uuid.uuid4().hex}.txt")
+        create_fake_file(self.file_path, "txt")
+        self.generated_files = [self.file_path]
+
+    def test_multi_hop_plan(self):
+        """Une conversion sans moteur direct passe par le chemin le moins coûteux."""
+        from converter.converters.registry import plan_conversion, plan_engine
+        from converter.scheduler import lane_for
+
+        plan = plan_conversion("docx", "png")
+        self.assertEqual([edge.target_format for edge in plan], ["pdf", "png"])
+        self.assertEqual(plan_engine(plan), "writer_pdf+pdf_images")
+        self.assertEqual(lane_for("docx", "png"), "pdf-raster")
+        # Un ZIP de pages ne peut pas être reconverti
+        self.assertEqual(plan_conversion("pdf", "docx"), ())
+
+    def test_intermediate_pdf_is_reused(self):
+        """Le PDF intermédiaire de txt -> pdf -> png est réutilisé pour txt -> pdf -> jpeg."""
+        from unittest import mock
+        from converter.converters import writer_converter
+
+        def fake_rasterize(input_path, output_dir, source_format, target_format, options=None):
+            self.assertTrue(input_path.endswith(".pdf"))
+            output_path = os.path.join(output_dir, f"pages_{target_format}.zip")
+            with open(output_path, "wb") as f:
+                f.write(b"zip")
+            return output_path
+
+        render = mock.Mock(wraps=writer_converter.convert_writer_to_pdf)
+        with mock.patch("converter.converters.writer_converter.convert_writer_to_pdf", render), \
+                mock.patch("converter.converters.pdf_converter.convert_pdf_to_images", fake_rasterize):
+            for target_format in ["png", "jpeg"]:
+                conversion = Conversion(input_file=self.file_path, source_format="txt", target_format=target_format)
+                conversion.convert_file()
+                self.assertTrue(conversion.converted, conversion.error_message)
+                self.generated_files.append(conversion.output_file.path)
+        self.assertEqual(render.call_count, 1)
+
+    def test_engines_are_loaded_lazily(self):
+        """Les vues ne chargent aucune bibliothèque de conversion ; le préchauffage les charge."""
+        import subprocess
+        import sys
+
+        script = (
+            "import sys, django; django.setup(); import converter.urls; "
+            "heavy = ['pandas', 'PIL', 'docx', 'fpdf', 'pdf2image']; "
+            "print(sorted(m for m in heavy if m in sys.modules)); "
+            "from converter.converters.registry import prewarm_engines; prewarm_engines(['table']); "
+            "print('pandas' in sys.modules)"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "file_converter.settings"}
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout.split("\n")
+        self.assertEqual(output[:2], ["[]", "True"])
+
+    def tearDown(self):
+        for file_path in self.generated_files:
+            remove_generated_file(file_path)
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+
+
+class BenchmarkTestCase(TestCase):
+    def test_compare_flags_regressions(self):
+        """La comparaison signale les métriques qui dépassent la référence au-delà du seuil."""
+        from converter.benchmark import compare_results
+
+        baseline = [{"source_format": "png", "target_format": "jpeg", "size": "large", "status": "ok",
+                     "wall_time": 1.0, "cpu_time": 1.0, "peak_rss_kb": 1000, "output_bytes": 500}]
+        current = [{**baseline[0], "wall_time": 1.5, "peak_rss_kb": 1100}]
+
+        regressions = compare_results(current, baseline, threshold=0.25)
+        self.assertEqual([regression["metric"] for regression in regressions], ["wall_time"])
+
+
+@override_settings(CONVERTER_CACHE_ENABLED=False)
+@override_settings(CONVERTER_METRICS_TOKEN="secret", CONVERTER_CACHE_DIR=TEST_CACHE_DIR)
+class MetricsTestCase(TestCase):
+    def test_stages_and_metrics_endpoint(self):
+        """Les étapes d'une conversion sont enregistrées et exposées au format Prometheus."""
+        uploads_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        os.makedirs(uploads_dir, exist_ok=True)
+        file_path = os.path.join(uploads_dir, f"test_metrics_{uuid.uuid4().hex}.png")
+        Image.new('RGB', (10, 10)).save(file_path)
+
+        conversion = Conversion.objects.create(input_file=file_path, source_format="png", target_format="bmp")
+        conversion.convert_file()
+        try:
+            stage_names = set(conversion.stages.values_list("name", flat=True))
+            self.assertTrue({"convert", "decode", "encode", "publish"} <= stage_names)
+
+            response = self.client.get("/converter/metrics/", headers={"Authorization": "Bearer secret"})
+            self.assertEqual(response.status_code, 200)
+            body = response.content.decode()
+            self.assertIn('converter_conversion_duration_seconds_count{source="png",target="bmp",engine="image"} 1', body)
+            self.assertIn('converter_conversion_duration_seconds_bucket{source="png",target="bmp",engine="image",le="+Inf"} 1', body)
+            self.assertIn('converter_stage_duration_seconds_count{stage="decode",engine="image"} 1', body)
+            self.assertIn('converter_conversions_total{status="succeeded"} 1', body)
+        finally:
+            remove_generated_file(file_path)
+            remove_generated_file(conversion.output_file.path)
+
+    def test_counters_survive_expiry(self):
+        """Les compteurs ne diminuent pas quand la rétention fait expirer les conversions."""
+        from converter.metrics import render_metrics
+
+        conversion = Conversion.objects.create(source_format="png", target_format="bmp")
+        conversion.convert_file()
+        self.assertEqual(conversion.status, Conversion.Status.FAILED)
+        Conversion.objects.update(status=Conversion.Status.EXPIRED)
+        body = render_metrics()
+        self.assertIn('converter_conversions_total{status="failed"} 1', body)
+        self.assertIn('converter_conversion_errors_total{source="png",target="bmp",engine="image"} 1', body)
+
+    def test_metrics_access_is_restricted(self):
+        """Sans jeton valide ni compte administrateur, l'endpoint est refusé."""
+        from django.contrib.auth.models import User
+
+        self.assertEqual(self.client.get("/converter/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/converter/metrics/", headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        with override_settings(CONVERTER_METRICS_TOKEN=None):
+            self.assertEqual(self.client.get("/converter/metrics/", headers={"Authorization": "Bearer None"}).status_code, 403)
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        self.assertEqual(self.client.get("/converter/metrics/").status_code, 200)
+
+    def tearDown(self):
+        shutil.rmtree(TEST_CACHE_DIR, ignore_errors=True)
+
+
+@override_settings(CONVERTER_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTestCase(TestCase):
+    def test_resumable_upload(self):
+        """Les morceaux sont reçus dans le désordre, vérifiés, puis assemblés en conversion."""
+        import hashlib
+        import json
+
+        content = b"0123456789"
+        response = self.client.post(
+            "/converter/uploads/",
+            json.dumps({"file_name": "notes.txt", "total_size": len(content), "target_format": "pdf"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        session = response.json()
+        self.assertEqual(session["total_chunks"], 3)
+        chunk_url = session["chunk_url"]
+
+        def put_chunk(index, checksum=None):
+            data = content[index * 4:(index + 1) * 4]
+            return self.client.put(
+                chunk_url.format(index=index), data, content_type="application/octet-stream",
+                headers={"X-Chunk-SHA256": checksum or hashlib.sha256(data).hexdigest()},
+            )
+
+        self.assertEqual(put_chunk(2).status_code, 200)
+        self.assertEqual(put_chunk(0, checksum="0" * 64).status_code, 400)
+        self.assertEqual(put_chunk(0).status_code, 200)
+
+        status = self.client.get(f"/converter/uploads/{session['token']}/").json()
+        self.assertEqual(status["missing_chunks"], [1])
+        self.assertEqual(self.client.post(session["finalize_url"]).status_code, 409)
+
+        self.assertEqual(put_chunk(1).status_code, 200)
+        response = self.client.post(session["finalize_url"])
+        self.assertEqual(response.status_code, 202)
+
+        conversion = Conversion.objects.get(token=session["token"])
+        try:
+            with open(conversion.input_file.path, "rb") as f:
+                self.assertEqual(f.read(), content)
+            self.assertEqual(conversion.status, Conversion.Status.QUEUED)
+        finally:
+            shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+
+    def test_concurrent_finalize_and_expiry(self):
+        """Une seule de deux finalisations simultanées crée la conversion ; le balayage supprime les sessions inactives."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from converter import chunked_upload
+        from converter.models import UploadSession
+        from converter.retention import sweep
+
+        session = chunked_upload.create_session("notes.txt", 4, "pdf")
+        chunked_upload.write_chunk(session, 0, io.BytesIO(b"abcd"))
+        # Les deux requêtes ont lu la session avant toute finalisation
+        first, second = UploadSession.objects.get(pk=session.pk), UploadSession.objects.get(pk=session.pk)
+        conversion = chunked_upload.finalize_session(first, "txt")
+        try:
+            with self.assertRaises(chunked_upload.SessionFinalized):
+                chunked_upload.finalize_session(second, "txt")
+            self.assertEqual(Conversion.objects.filter(token=session.token).count(), 1)
+
+            abandoned = chunked_upload.create_session("draft.txt", 4, "pdf")
+            UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+            with override_settings(CONVERTER_STORAGE_QUOTA=None, CONVERTER_CACHE_ENABLED=False):
+                self.assertEqual(sweep()["sessions"], 1)
+            self.assertFalse(UploadSession.objects.exists())
+            self.assertFalse(os.path.exists(chunked_upload.session_path(abandoned)))
+            self.assertTrue(os.path.exists(conversion.input_file.path))
+        finally:
+            shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+
+
+class StreamingUploadTestCase(TestCase):
+    def post_file(self, name, content):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        return self.client.post(
+            "/converter/upload/",
+            {"input_file": SimpleUploadedFile(name, content), "target_format": "pdf"},
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+
+    def test_upload_is_hashed_and_sniffed(self):
+        """Le fichier est écrit dans le répertoire du job, haché et identifié pendant l'upload."""
+        import hashlib
+        import io
+
+        buffer = io.BytesIO()
+        Image.new("RGB", (200, 200), color=(0, 0, 255)).save(buffer, "PNG")
+        content = buffer.getvalue()
+        # Sans extension : le format est celui du contenu
+        response = self.post_file("scan", content)
+        self.assertEqual(response.status_code, 202)
+
+        conversion = Conversion.objects.get(token=response.json()["token"])
+        try:
+            self.assertEqual(conversion.source_format, "png")
+            self.assertEqual(conversion.input_sha256, hashlib.sha256(content).hexdigest())
+            self.assertEqual(conversion.input_file.name, f"uploads/{conversion.token}/scan")
+            with open(conversion.input_file.path, "rb") as f:
+                self.assertEqual(f.read(), content)
+        finally:
+            shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+
+    def test_mislabeled_and_oversized_files_are_rejected(self):
+        """Un contenu qui contredit l'extension (415) ou trop gros (413) est refusé sans conversion."""
+        uploads_dir = os.path.join(settings.MEDIA_ROOT, "uploads")
+        os.makedirs(uploads_dir, exist_ok=True)
+        existing = set(os.listdir(uploads_dir))
+        response = self.post_file("report.docx", b"%PDF-1.4\n" + b"x" * 100)
+        self.assertEqual(response.status_code, 415)
+        with override_settings(CONVERTER_UPLOAD_MAX_SIZE=64):
+            self.assertEqual(self.post_file("notes.txt", b"x" * 100).status_code, 413)
+
+        self.assertFalse(Conversion.objects.exists())
+        # Les fichiers partiels ont été supprimés
+        self.assertEqual(set(os.listdir(uploads_dir)), existing)
+
+    @override_settings(CONVERTER_QUEUE_EAGER=True, CONVERTER_CACHE_ENABLED=False)
+    def test_same_file_name_is_isolated_per_job(self):
+        """Deux jobs envoyant le même nom de fichier ont chacun leurs fichiers et leur espace de travail."""
+        from unittest import mock
+        from converter.converters import image_converter
+
+        scratch_dirs = []
+        convert_image = image_converter.convert_image
+
+        def record_scratch(input_path, output_dir, *args, **kwargs):
+            scratch_dirs.append(output_dir)
+            self.assertEqual(os.listdir(output_dir), [])
+            return convert_image(input_path, output_dir, *args, **kwargs)
+
+        conversions = []
+        try:
+            with mock.patch.object(image_converter, "convert_image", side_effect=record_scratch):
+                for color in [(255, 0, 0), (0, 0, 255)]:
+                    buffer = io.BytesIO()
+                    Image.new("RGB", (20, 20), color=color).save(buffer, "PNG")
+                    response = self.client.post(
+                        "/converter/upload/",
+                        {"input_file": SimpleUploadedFile("photo.png", buffer.getvalue()), "target_format": "jpeg"},
+                        headers={"X-Requested-With": "XMLHttpRequest"},
+                    )
+                    self.assertEqual(response.status_code, 202)
+                    conversions.append(Conversion.objects.get(token=response.json()["token"]))
+
+            first, second = conversions
+            for conversion in conversions:
+                self.assertEqual(conversion.status, Conversion.Status.SUCCEEDED, conversion.error_message)
+            self.assertNotEqual(first.input_file.path, second.input_file.path)
+            self.assertNotEqual(first.output_file.path, second.output_file.path)
+            self.assertEqual(os.path.basename(first.output_file.path), os.path.basename(second.output_file.path))
+            with Image.open(first.output_file.path) as red, Image.open(second.output_file.path) as blue:
+                self.assertGreater(red.getpixel((10, 10))[0], 200)
+                self.assertGreater(blue.getpixel((10, 10))[2], 200)
+
+            # Un espace de travail par job, nommé d'après son token et supprimé à la fin
+            self.assertEqual(len(set(scratch_dirs)), 2)
+            for conversion, scratch_dir in zip(conversions, scratch_dirs):
+                self.assertTrue(os.path.basename(scratch_dir).startswith(f"{conversion.token}_"))
+                self.assertFalse(os.path.exists(scratch_dir))
+        finally:
+            for conversion in conversions:
+                shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+                shutil.rmtree(os.path.dirname(conversion.output_file.path), ignore_errors=True)
+
+
+class ImageOptionsTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def test_downscale_and_alpha(self):
+        """L'image est réduite à la lecture ; la transparence est gardée si le format cible la supporte."""
+        from converter.converters.image_converter import convert_image
+
+        photo_path = os.path.join(self.work_dir, "photo.jpeg")
+        Image.new("RGB", (1600, 1200), color=(0, 128, 255)).save(photo_path)
+        output_path = convert_image(photo_path, self.work_dir, "jpeg", "webp", {"max_width": 400, "preset": "fast"})
+        with Image.open(output_path) as image:
+            self.assertEqual(image.size, (400, 300))
+
+        logo_path = os.path.join(self.work_dir, "logo.png")
+        Image.new("RGBA", (40, 40), color=(255, 0, 0, 0)).save(logo_path)
+        with Image.open(convert_image(logo_path, self.work_dir, "png", "webp", {"quality": 90})) as image:
+            self.assertEqual(image.mode, "RGBA")
+        # Sans transparence possible : aplatie sur fond blanc
+        with Image.open(convert_image(logo_path, self.work_dir, "png", "jpeg", {"preset": "small"})) as image:
+            self.assertEqual(image.mode, "RGB")
+            self.assertGreater(min(image.getpixel((20, 20))), 250)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class FrameConverterTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.work_dir, "anim.gif")
+        frames = [Image.new("RGB", (60, 40), color=(i * 50, 0, 0)) for i in range(5)]
+        frames[0].save(self.input_path, save_all=True, append_images=frames[1:], duration=80, loop=0)
+
+    def test_every_frame_is_converted(self):
+        """Une animation garde toutes ses frames : animation, pages PDF ou ZIP d'images."""
+        import zipfile
+        from converter.converters.frame_converter import convert_frames
+        from converter.converters.registry import plan_engine, plan_conversion
+
+        self.assertEqual(plan_engine(plan_conversion("gif", "png")), "frames")
+        # Le ZIP d'images ne peut être que la dernière étape ; une animation peut être reconvertie
+        self.assertTrue(plan_conversion("gif", "png")[-1].final)
+        self.assertFalse(plan_conversion("gif", "webp")[-1].final)
+        with Image.open(convert_frames(self.input_path, self.work_dir, "gif", "webp", {"max_width": 30})) as image:
+            self.assertEqual((image.n_frames, image.size), (5, (30, 20)))
+        with zipfile.ZipFile(convert_frames(self.input_path, self.work_dir, "gif", "png")) as archive:
+            self.assertEqual(sorted(archive.namelist()), [f"frame_{i}.png" for i in range(1, 6)])
+        with open(convert_frames(self.input_path, self.work_dir, "gif", "pdf"), "rb") as f:
+            self.assertEqual(f.read().count(b"/Type /Page "), 5)
+        with Image.open(convert_frames(self.input_path, self.work_dir, "gif", "png", {"first_frame": True})) as image:
+            self.assertEqual(image.format, "PNG")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class PdfRenderTestCase(TestCase):
+    """Rendu des pages d'un PDF par lots, avec pdf2image simulé (Poppler n'est pas nécessaire)."""
+
+    def render(self, page_count=20, **kwargs):
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        from converter.converters import pdf_converter
+
+        def fake_convert_from_path(input_path, dpi, first_page, last_page, grayscale, poppler_path):
+            return [Image.new("L" if grayscale else "RGB", (4, 4)) for _ in range(first_page, last_page + 1)]
+
+        with mock.patch.object(pdf_converter, "pdfinfo_from_path", return_value={"Pages": page_count}), \
+                mock.patch.object(pdf_converter, "convert_from_path", side_effect=fake_convert_from_path) as convert, \
+                mock.patch.object(pdf_converter, "ProcessPoolExecutor", ThreadPoolExecutor):
+            pages = list(pdf_converter.iter_rendered_pages("document.pdf", "png", **kwargs))
+        batches = [(call.kwargs["first_page"], call.kwargs["last_page"]) for call in convert.call_args_list]
+        return [number for number, _ in pages], sorted(batches)
+
+    def test_pages_are_rendered_in_batches_and_in_order(self):
+        """Les pages sont rendues par lots de batch_size et générées dans l'ordre, en parallèle ou non."""
+        for workers in [1, 3]:
+            numbers, batches = self.render(page_count=20, batch_size=8, workers=workers)
+            self.assertEqual(numbers, list(range(1, 21)))
+            self.assertEqual(batches, [(1, 8), (9, 16), (17, 20)])
+
+    def test_page_range_is_validated(self):
+        """La plage de pages est ramenée au document ; une plage vide est refusée."""
+        numbers, batches = self.render(page_count=10, first_page=4, last_page=50, batch_size=4, workers=1)
+        self.assertEqual(numbers, list(range(4, 11)))
+        self.assertEqual(batches, [(4, 7), (8, 10)])
+        with self.assertRaises(ValueError):
+            self.render(page_count=10, first_page=12, workers=1)
+        with self.assertRaises(ValueError):
+            self.render(page_count=10, first_page=6, last_page=5, workers=1)
+
+    def test_render_options_are_parsed(self):
+        """Les options de rendu envoyées sous forme de texte sont converties ; une valeur invalide est refusée."""
+        from converter.converters.pdf_converter import get_render_options
+
+        self.assertEqual(
+            get_render_options({"dpi": "150", "first_page": "2", "last_page": "5", "grayscale": True}),
+            {"dpi": 150, "first_page": 2, "last_page": 5, "grayscale": True},
+        )
+        with self.settings(CONVERTER_PDF_DPI=96):
+            self.assertEqual(get_render_options(None), {"dpi": 96, "first_page": None, "last_page": None, "grayscale": False})
+        with self.assertRaises(ValueError):
+            get_render_options({"dpi": "high"})
+
+    @override_settings(CONVERTER_PDF_RENDER_WORKERS=None, CONVERTER_LANES={"pdf-raster": {"concurrency": 4}})
+    def test_render_workers_share_cores_across_lane(self):
+        """Par défaut, les coeurs sont partagés entre les conversions simultanées de la voie pdf-raster."""
+        from unittest import mock
+        from converter.converters.pdf_converter import get_render_workers
+
+        with mock.patch("os.cpu_count", return_value=16):
+            self.assertEqual(get_render_workers(), 4)
+        with mock.patch("os.cpu_count", return_value=2):
+            self.assertEqual(get_render_workers(), 1)
+        with self.settings(CONVERTER_PDF_RENDER_WORKERS=3):
+            self.assertEqual(get_render_workers(), 3)
+
+
+@override_settings(CONVERTER_QUEUE_EAGER=True, CONVERTER_CACHE_ENABLED=False)
+class ImagePdfTestCase(TestCase):
+    def test_images_are_merged_without_recompression(self):
+        """Plusieurs images envoyées ensemble donnent un PDF d'une page par image ; JPEG et PNG sont copiés tels quels."""
+        import io
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        def encode(mode, fmt, **params):
+            buffer = io.BytesIO()
+            Image.new(mode, (120, 80), color="red").save(buffer, fmt, **params)
+            return buffer.getvalue()
+
+        jpeg = encode("RGB", "JPEG", dpi=(300, 300))
+        png = encode("RGB", "PNG")
+        response = self.client.post(
+            "/converter/upload/",
+            {
+                "input_file": [
+                    SimpleUploadedFile("scan.jpg", jpeg),
+                    SimpleUploadedFile("scan.png", png),
+                    SimpleUploadedFile("logo.png", encode("RGBA", "PNG")),
+                ],
+                "target_format": "pdf",
+            },
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+        self.assertEqual(response.status_code, 202)
+        conversion = Conversion.objects.get(token=response.json()["token"])
+        try:
+            self.assertEqual(conversion.status, Conversion.Status.SUCCEEDED, conversion.error_message)
+            self.assertEqual(len(conversion.options["merge"]), 2)
+            with open(conversion.output_file.path, "rb") as f:
+                pdf = f.read()
+            self.assertEqual(pdf.count(b"/Type /Page "), 3)
+            # JPEG embarqué à l'octet près, page à la taille du scan (120 px à 300 dpi)
+            self.assertIn(b"/Filter /DCTDecode /Length %d >>\nstream\n" % len(jpeg) + jpeg, pdf)
+            self.assertIn(b"/MediaBox [0 0 28.80 19.20]", pdf)
+            self.assertIn(b"/Predictor 15 /Colors 3", pdf)
+        finally:
+            shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+            shutil.rmtree(os.path.dirname(conversion.output_file.path), ignore_errors=True)
+
+    def test_merge_keeps_every_frame(self):
+        """Un TIFF multipage fusionné donne une page par frame, qu'il soit envoyé en premier ou après une autre image."""
+        import io
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        pages = [Image.new("RGB", (60, 40), color=(i * 80, 0, 0)) for i in range(3)]
+        pages[0].save(buffer, "TIFF", save_all=True, append_images=pages[1:])
+        tiff = buffer.getvalue()
+        buffer = io.BytesIO()
+        Image.new("RGB", (60, 40), color="blue").save(buffer, "PNG")
+        png = buffer.getvalue()
+
+        for files in ([("scans.tiff", tiff), ("cover.png", png)], [("cover.png", png), ("scans.tiff", tiff)]):
+            response = self.client.post(
+                "/converter/upload/",
+                {
+                    "input_file": [SimpleUploadedFile(name, data) for name, data in files],
+                    "target_format": "pdf",
+                },
+                headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+            self.assertEqual(response.status_code, 202)
+            conversion = Conversion.objects.get(token=response.json()["token"])
+            try:
+                self.assertEqual(conversion.status, Conversion.Status.SUCCEEDED, conversion.error_message)
+                with open(conversion.output_file.path, "rb") as f:
+                    self.assertEqual(f.read().count(b"/Type /Page "), 4)
+            finally:
+                shutil.rmtree(os.path.dirname(conversion.input_file.path), ignore_errors=True)
+                if conversion.output_file:
+                    shutil.rmtree(os.path.dirname(conversion.output_file.path), ignore_errors=True)
+
+
+class DownloadTestCase(TestCase):
+    def setUp(self):
+        """Crée une conversion terminée avec un fichier de sortie connu."""
+        self.conversion = Conversion.objects.create(source_format="png", target_format="zip", status=Conversion.Status.SUCCEEDED)
+        self.output_name = f"converted/{self.conversion.token}/result.zip"
+        self.output_path = os.path.join(settings.MEDIA_ROOT, self.output_name)
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        with open(self.output_path, "wb") as f:
+            f.write(b"0123456789")
+        self.conversion.output_file.name = self.output_name
+        self.conversion.save()
+        self.url = f"/converter/download/{self.conversion.token}/"
+
+    def test_range_request(self):
+        """Une requête Range renvoie la plage demandée en 206."""
+        response = self.client.get(self.url, headers={"Range": "bytes=2-5"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(self.client.get(self.url, headers={"Range": "bytes=20-"}).status_code, 416)
+
+    def test_conditional_get(self):
+        """Un ETag connu du client donne une réponse 304."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, headers={"If-None-Match": response["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CONVERTER_DOWNLOAD_MODE="x-accel-redirect")
+    def test_accel_redirect(self):
+        """En mode X-Accel-Redirect, le transfert est délégué au serveur frontal."""
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.output_name}")
+        self.assertEqual(response.content, b"")
+
+    def tearDown(self):
+        """Nettoie le fichier de sortie."""
+        remove_generated_file(self.output_path)
+
+
+class TableConverterTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def test_csv_to_xlsx_infers_types(self):
+        """Les colonnes numériques d'un CSV deviennent des nombres dans le XLSX."""
+        from openpyxl import load_workbook
+        from converter.converters.table_converter import convert_table
+
+        input_path = os.path.join(self.work_dir, "data.csv")
+        create_fake_file(input_path, "csv", "medium")
+        with self.settings(CONVERTER_TABLE_CHUNK_ROWS=100):
+            output_path = convert_table(input_path, self.work_dir, "csv", "xlsx")
+
+        rows = list(load_workbook(output_path, read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(rows[0][1], "Value")
+        self.assertEqual(rows[5][1], 5)
+        self.assertIsInstance(rows[5][2], float)
+
+    def test_csv_encoding_is_detected(self):
+        """Un CSV Windows-1252 ou UTF-8 avec BOM est décodé sans caractère de remplacement."""
+        from openpyxl import load_workbook
+        from converter.converters.table_converter import convert_table
+
+        text = "Libellé,Montant\nCafé,2\n"
+        for name, content in [("latin.csv", text.encode("cp1252")), ("bom.csv", text.encode("utf-8-sig"))]:
+            input_path = os.path.join(self.work_dir, name)
+            with open(input_path, "wb") as f:
+                f.write(content)
+            rows = list(load_workbook(convert_table(input_path, self.work_dir, "csv", "xlsx"), read_only=True)
+                        .active.iter_rows(values_only=True))
+            self.assertEqual(rows, [("Libellé", "Montant"), ("Café", 2)])
+            with open(convert_table(input_path, self.work_dir, "csv", "tsv"), encoding="utf-8") as f:
+                self.assertEqual(f.read().splitlines(), ["Libellé\tMontant", "Café\t2"])
+
+    def test_multi_sheet_xlsx_to_csv_zip(self):
+        """Un classeur à plusieurs feuilles donne un ZIP avec un CSV par feuille."""
+        from zipfile import ZipFile
+        from converter.converters.table_converter import convert_table
+
+        input_path = os.path.join(self.work_dir, "book.xlsx")
+        wb = Workbook()
+        wb.active.title = "First"
+        wb.active.append(["a", 1])
+        wb.create_sheet("Second").append(["b", 2])
+        wb.save(input_path)
+
+        output_path = convert_table(input_path, self.work_dir, "xlsx", "tsv")
+        with ZipFile(output_path) as zipf:
+            self.assertEqual(zipf.namelist(), ["First.tsv", "Second.tsv"])
+            self.assertEqual(zipf.read("Second.tsv").decode(), "b\t2\r\n")
+
+    def test_csv_to_pdf_repeats_header_on_each_page(self):
+        """Le rendu PDF d'un tableau est paginé et répète l'en-tête sur chaque page."""
+        import zlib
+        from converter.converters.table_converter import convert_table
+
+        input_path = os.path.join(self.work_dir, "data.csv")
+        create_fake_file(input_path, "csv", "medium")
+        with self.settings(CONVERTER_TABLE_CHUNK_ROWS=100):
+            output_path = convert_table(input_path, self.work_dir, "csv", "pdf", {"font_size": 10})
+
+        with open(output_path, "rb") as f:
+            data = f.read()
+        pages = [
+            zlib.decompress(stream)
+            for stream in re.findall(rb"/FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", data, re.S)
+        ]
+        self.assertGreater(len(pages), 1)
+        self.assertEqual(data.count(b"/Type /Page "), len(pages))
+        self.assertTrue(all(b"(Value) Tj" in page for page in pages))
+        self.assertIn(b"(999) Tj", pages[-1])
+
+    def test_pdf_keeps_columns_wider_than_sample(self):
+        """Une ligne plus large que l'échantillon, arrivée dans un paquet suivant, garde toutes ses cellules."""
+        import zlib
+        from converter.converters.table_pdf import render_table_pdf
+
+        output_path = os.path.join(self.work_dir, "wide.pdf")
+        chunks = [[["Name", "Value"]] + [[f"Row {i}", i] for i in range(10)],
+                  [["Late", 1] + [f"extra-{column}" for column in range(2, 30)]]]
+        render_table_pdf([("Sheet", iter(chunks))], output_path)
+
+        with open(output_path, "rb") as f:
+            data = f.read()
+        text = b"".join(
+            zlib.decompress(stream)
+            for stream in re.findall(rb"/FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", data, re.S)
+        )
+        self.assertIn(b"(Row 9) Tj", text)
+        for column in range(2, 30):
+            self.assertIn(f"(extra-{column}) Tj".encode(), text)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class TextPdfTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def test_latin1_text_is_detected_and_wrapped(self):
+        """Un texte non UTF-8 est décodé correctement et les lignes longues sont coupées."""
+        import zlib
+        from converter.converters.text_pdf import render_text_pdf
+
+        input_path = os.path.join(self.work_dir, "notes.txt")
+        with open(input_path, "w", encoding="cp1252") as f:
+            f.write("Élément (1)\n" + "mot " * 200 + "\n\ffin")
+        output_path = os.path.join(self.work_dir, "notes.pdf")
+        pages = render_text_pdf(input_path, output_path, {"monospace": True, "font_size": 12})
+
+        with open(output_path, "rb") as f:
+            streams = re.findall(rb"/FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", f.read(), re.S)
+        first_page = zlib.decompress(streams[0]).decode("latin-1")
+        self.assertEqual(pages, 2)
+        self.assertIn("(Élément \\(1\\)) Tj", first_page)
+        # 800 caractères à 12 pt en Courier : au moins 10 lignes de 68 caractères
+        self.assertGreaterEqual(first_page.count(" Tj T* ("), 10)
+        self.assertIn("(fin) Tj", zlib.decompress(streams[1]).decode("latin-1"))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class DocxPdfTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def create_document(self, tracked_change=False):
+        from docx import Document
+        from docx.oxml import OxmlElement
+
+        document = Document()
+        document.add_heading("Rapport", 1)
+        paragraph = document.add_paragraph("Bonjour ")
+        paragraph.add_run("en gras").bold = True
+        document.add_paragraph("premier point", style="List Bullet")
+        table = document.add_table(rows=50, cols=2)
+        for index, row in enumerate(table.rows):
+            row.cells[0].text, row.cells[1].text = f"ligne {index}", "valeur"
+        header_row = table.rows[0]._tr.get_or_add_trPr()
+        header_row.append(OxmlElement("w:tblHeader"))
+        if tracked_change:
+            insertion = OxmlElement("w:ins")
+            insertion.append(paragraph.runs[0]._r)
+            paragraph._p.append(insertion)
+        input_path = os.path.join(self.work_dir, "rapport.docx")
+        document.save(input_path)
+        return input_path
+
+    def test_simple_document_is_rendered_natively(self):
+        """Un document simple est rendu sans LibreOffice : texte, listes et en-têtes de tableau répétés."""
+        import zlib
+        from unittest import mock
+        from converter.converters.docx_pdf import probe_docx
+        from converter.converters.writer_converter import convert_writer_to_pdf
+
+        input_path = self.create_document()
+        self.assertIsNone(probe_docx(input_path))
+        with mock.patch("converter.converters.writer_converter.convert_via_libreoffice") as libreoffice:
+            output_path = convert_writer_to_pdf(input_path, self.work_dir, "docx", "pdf", {"renderer": "auto"})
+        libreoffice.assert_not_called()
+
+        with open(output_path, "rb") as f:
+            streams = re.findall(rb"/FlateDecode /Length \d+ >>\nstream\n(.*?)\nendstream", f.read(), re.S)
+        pages = [zlib.decompress(stream).decode("latin-1") for stream in streams]
+        self.assertGreater(len(pages), 1)
+        self.assertIn("(Rapport) Tj", pages[0])
+        self.assertIn("(en gras) Tj", pages[0])
+        self.assertIn("(\x95) Tj", pages[0])
+        self.assertTrue(all("(ligne 0) Tj" in page for page in pages))
+        self.assertIn("(ligne 49) Tj", pages[-1])
+
+    def test_complex_document_goes_to_libreoffice(self):
+        """Un document avec suivi des modifications est confié à LibreOffice, avant sa conversion."""
+        from unittest import mock
+        from converter.converters.docx_pdf import probe_docx
+        from converter.converters.writer_converter import convert_writer_to_pdf
+        from converter.scheduler import _docx_lane
+
+        input_path = self.create_document(tracked_change=True)
+        self.assertEqual(probe_docx(input_path), "tracked changes")
+        self.assertEqual(_docx_lane(input_path, {}), "libreoffice")
+        self.assertEqual(_docx_lane(input_path, {"renderer": "native"}), "document")
+
+        def fake_libreoffice(source, output_path, target_format):
+            with open(output_path, "wb") as f:
+                f.write(b"%PDF-1.4\n")
+
+        with mock.patch("converter.converters.writer_converter.convert_via_libreoffice",
+                        side_effect=fake_libreoffice) as libreoffice:
+            convert_writer_to_pdf(input_path, self.work_dir, "docx", "pdf")
+        libreoffice.assert_called_once()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class BulkConversionTestCase(TestCase):
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.input_dir, "2024", "mars"))
+        for name in ["a.png", os.path.join("2024", "b.png"), os.path.join("2024", "mars", "c.bmp")]:
+            Image.new("RGB", (20, 10), color=(255, 0, 0)).save(os.path.join(self.input_dir, name))
+        with open(os.path.join(self.input_dir, "broken.png"), "wb") as f:
+            f.write(b"not an image")
+
+    def test_tree_is_mirrored_and_resumable(self):
+        """Les sorties reproduisent l'arborescence ; un second passage ignore ce qui est déjà converti."""
+        from converter.bulk import find_inputs, run_bulk
+
+        summary = run_bulk(find_inputs([self.input_dir], "jpg"), "jpg", self.output_dir, record=True)
+        self.assertEqual((summary["succeeded"], summary["failed"], summary["skipped"]), (3, 1, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "2024", "mars", "c.jpeg")))
+        self.assertEqual(Conversion.objects.filter(status=Conversion.Status.SUCCEEDED, engine="image").count(), 3)
+
+        # Seul le fichier en échec est retenté
+        summary = run_bulk(find_inputs([self.input_dir], "jpeg"), "jpeg", self.output_dir)
+        self.assertEqual((summary["succeeded"], summary["failed"], summary["skipped"]), (0, 1, 3))
+        summary = run_bulk(find_inputs([os.path.join(self.input_dir, "**", "*.png")], "pdf"), "pdf", self.output_dir)
+        self.assertEqual(summary["succeeded"], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "2024", "b.pdf")))
+
+    def test_pool_renders_pdf_pages_in_process(self):
+        """Les processus du pool (daemon) rendent les pages d'un PDF eux-mêmes, sans pool de rendu."""
+        import zipfile
+        from unittest import mock
+        from converter.bulk import find_inputs, run_bulk
+        from converter.converters import pdf_converter
+
+        def fake_convert_from_path(input_path, dpi, first_page, last_page, grayscale, poppler_path):
+            return [Image.new("RGB", (4, 4)) for _ in range(first_page, last_page + 1)]
+
+        with open(os.path.join(self.input_dir, "report.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n")
+        # Processus créés par fork : ils héritent des simulations
+        with mock.patch.object(pdf_converter, "get_render_workers", return_value=2), \
+                mock.patch.object(pdf_converter, "pdfinfo_from_path", return_value={"Pages": 20}), \
+                mock.patch.object(pdf_converter, "convert_from_path", side_effect=fake_convert_from_path):
+            summary = run_bulk(find_inputs([os.path.join(self.input_dir, "*.pdf")], "png"), "png",
+                               self.output_dir, workers=2)
+        self.assertEqual((summary["succeeded"], summary["failed"]), (1, 0))
+        with zipfile.ZipFile(os.path.join(self.output_dir, "report.zip")) as archive:
+            self.assertEqual(len(archive.namelist()), 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+
+@override_settings(CONVERTER_QUEUE_EAGER=True, CONVERTER_CACHE_ENABLED=False)
+class BatchConversionTestCase(TestCase):
+    def setUp(self):
+        self.batch_token = None
+
+    def test_files_and_archive_are_returned_as_one_zip(self):
+        """Fichiers et contenu d'une archive donnent une conversion chacun, et une seule archive de résultats."""
+        import io
+        import json
+        import zipfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        def png():
+            buffer = io.BytesIO()
+            Image.new("RGB", (20, 10), color="red").save(buffer, "PNG")
+            return buffer.getvalue()
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as f:
+            f.writestr("scans/b.png", png())
+            f.writestr("../a.png", png())
+            f.writestr("notes.bin", b"\x00\x01binary")
+            f.writestr("__MACOSX/scans/._b.png", b"\x00")
+
+        response = self.client.post("/converter/batch/", {
+            "input_file": [SimpleUploadedFile("a.png", png()), SimpleUploadedFile("photos.zip", archive.getvalue())],
+            "target_format": "pdf",
+        })
+        self.assertEqual(response.status_code, 202)
+        payload = response.json()
+        self.batch_token = payload["token"]
+        self.assertEqual((payload["total"], payload["succeeded"], payload["failed"]), (4, 3, 1))
+        self.assertEqual(payload["status"], "partial")
+        # "../a.png" est ramené dans le lot, sous un autre nom que le a.png envoyé directement
+        names = sorted(item["name"] for item in payload["items"])
+        self.assertEqual(names, ["a-2.png", "a.png", "notes.bin", "scans/b.png"])
+
+        response = self.client.get(payload["download_url"])
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as result:
+            names = result.namelist()
+            self.assertIn("scans/b.pdf", names)
+            self.assertEqual(len([name for name in names if name.endswith(".pdf")]), 3)
+            self.assertTrue(result.read("scans/b.pdf").startswith(b"%PDF"))
+            status = json.loads(result.read("batch_status.json"))
+        self.assertEqual(status["failed"], 1)
+
+    def tearDown(self):
+        if self.batch_token:
+            for conversion in Conversion.objects.filter(batch__token=self.batch_token):
+                if conversion.output_file:
+                    shutil.rmtree(os.path.dirname(conversion.output_file.path), ignore_errors=True)
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, "uploads", self.batch_token), ignore_errors=True)
+
+
+@override_settings(CONVERTER_QUEUE_EAGER=True, CONVERTER_CACHE_ENABLED=False, CONVERTER_STORAGE_QUOTA=None)
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        """Deux conversions terminées, envoyées par l'API."""
+        self.conversions = []
+        for color in ["red", "blue"]:
+            buffer = io.BytesIO()
+            Image.new("RGB", (20, 10), color=color).save(buffer, "PNG")
+            response = self.client.post(
+                "/converter/upload/",
+                {"input_file": SimpleUploadedFile(f"{color}.png", buffer.getvalue()), "target_format": "bmp"},
+                headers={"X-Requested-With": "XMLHttpRequest"},
+            )
+            self.conversions.append(Conversion.objects.get(token=response.json()["token"]))
+
+    def test_ttl_and_quota_expire_conversions(self):
+        """Entrées puis résultats supprimés selon leur TTL ; le quota évince le moins récemment téléchargé ; 410 ensuite."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from converter.retention import sweep
+
+        red, blue = self.conversions
+        input_dir = os.path.dirname(red.input_file.path)
+        with override_settings(CONVERTER_INPUT_TTL=0):
+            self.assertEqual(sweep()["inputs"], 2)
+        self.assertFalse(os.path.exists(input_dir))
+        self.assertEqual(self.client.get(f"/converter/download/{red.token}/").status_code, 200)
+
+        # Le rouge a été téléchargé il y a une heure, le bleu à l'instant
+        Conversion.objects.filter(pk=red.pk).update(last_accessed_at=timezone.now() - timedelta(hours=1))
+        Conversion.objects.filter(pk=blue.pk).update(last_accessed_at=timezone.now())
+        with override_settings(CONVERTER_STORAGE_QUOTA=blue.output_size):
+            self.assertEqual(sweep()["evicted"], 1)
+        red.refresh_from_db()
+        self.assertEqual(red.status, Conversion.Status.EXPIRED)
+        self.assertEqual(self.client.get(f"/converter/download/{red.token}/").status_code, 410)
+        self.assertEqual(self.client.get(f"/converter/status/{red.token}/").json()["status"], "expired")
+
+        with override_settings(CONVERTER_OUTPUT_TTL=0):
+            self.assertEqual(sweep()["expired"], 1)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, "converted", str(blue.token))))
+        self.assertEqual(self.client.get(f"/converter/download/{blue.token}/").status_code, 410)
+
+    def tearDown(self):
+        for conversion in self.conversions:
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, "uploads", str(conversion.token)), ignore_errors=True)
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, "converted", str(conversion.token)), ignore_errors=True)
+
+
+class SlideConverterTestCase(TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.work_dir, "deck.pptx")
+        create_fake_file(self.input_path, "pptx", "medium")
+
+    def test_preview_uses_embedded_thumbnail(self):
+        """L'aperçu d'une présentation est extrait du fichier, sans rendu LibreOffice."""
+        from unittest import mock
+        from converter.converters.slide_converter import convert_slides
+
+        with mock.patch("converter.converters.slide_converter.convert_via_libreoffice") as libreoffice:
+            output_path = convert_slides(self.input_path, self.work_dir, "pptx", "png", {"preview": True})
+        libreoffice.assert_not_called()
+        with Image.open(output_path) as image:
+            self.assertEqual(image.format, "PNG")
+
+    def test_slide_count_for_scheduling(self):
+        """Le coût estimé d'une présentation dépend de son nombre de diapositives."""
+        from converter.converters.slide_converter import count_slides
+        from converter.scheduler import estimate_cost, lane_for
+
+        self.assertEqual(count_slides(self.input_path, "pptx"), 10)
+        self.assertEqual(lane_for("pptx", "png"), "libreoffice")
+        self.assertAlmostEqual(estimate_cost(self.input_path, "libreoffice"), 5.0)
+
+    def test_odp_fixture(self):
+        """Le générateur ODP produit une présentation reconnue, dont les diapositives sont comptées."""
+        from converter.converters.slide_converter import count_slides
+        from converter.sniffing import sniff_file
+
+        odp_path = os.path.join(self.work_dir, "deck.odp")
+        self.assertTrue(create_fake_file(odp_path, "odp", size="medium"))
+        self.assertEqual(sniff_file(odp_path), "odp")
+        self.assertEqual(count_slides(odp_path, "odp"), 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
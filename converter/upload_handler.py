@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+from converter.sniffing import HEADER_SIZE, FormatMismatch, resolve_source_format, sniff_header, sniff_package
+from converter.storage import free_input_file_name
+
+
+class UploadRejected(Exception):
+    """Fichier refusé pendant l'upload (format ou taille), avec le code HTTP à renvoyer."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StreamedUploadedFile(UploadedFile):
+    """
+    Fichier déjà écrit à son emplacement final dans le répertoire du job.
+
+    `storage_name` est le nom à donner au champ `input_file` ; le contenu n'est
+    plus en mémoire ni dans un fichier temporaire.
+    """
+
+    def __init__(self, storage_name, size, sha256, source_format, write_time):
+        super().__init__(None, name=storage_name, size=size)
+        self.storage_name = storage_name
+        self.sha256 = sha256
+        self.source_format = source_format
+        self.write_time = write_time
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Écrit les fichiers du champ "input_file" d'un formulaire directement dans le
+    répertoire du job (uploads/<token>/), morceau par morceau, sans copie
+    intermédiaire. Plusieurs fichiers peuvent être envoyés (fusion d'images).
+
+    Dans la même passe, le SHA-256 du fichier est calculé (clé du cache) et son
+    format est reconnu d'après ses premiers octets : un envoi trop gros ou un
+    fichier dont le contenu contredit l'extension est refusé avant la fin de
+    l'upload, et les fichiers déjà écrits supprimés. La raison du refus est dans
+    `rejection`.
+
+    Avec `accept_archives`, une archive ZIP (.zip) est acceptée telle quelle,
+    avec le format "zip" : c'est à l'appelant d'en extraire les fichiers.
+
+    Doit remplacer les gestionnaires de la requête avant tout accès à
+    `request.POST` ou `request.FILES`.
+    """
+
+    field_name = "input_file"
+
+    def __init__(self, request=None, token=None, accept_archives=False):
+        super().__init__(request)
+        self.token = token or uuid.uuid4()
+        self.accept_archives = accept_archives
+        self.max_size = getattr(settings, "CONVERTER_UPLOAD_MAX_SIZE", None)
+        self.rejection = None
+        self.job_dir = None
+        self.destination = None
+        self.received = 0
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.destination = None
+        if field_name != self.field_name:
+            return
+        if self.max_size and content_length and self.received + content_length > self.max_size:
+            self.reject(f"Upload too large (maximum {self.max_size} bytes)", 413)
+
+        from converter.models import Conversion
+
+        max_length = Conversion._meta.get_field("input_file").max_length
+        # Deux fichiers du même nom dans un envoi : le second est renommé
+        self.storage_name = free_input_file_name(self, file_name, max_length)
+        self.path = os.path.join(settings.MEDIA_ROOT, self.storage_name)
+        self.job_dir = os.path.dirname(self.path)
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.destination = open(self.path, "wb")
+        self.upload_name = file_name
+        self.digest = hashlib.sha256()
+        self.header = b""
+        self.source_format = None
+        self.write_time = 0.0
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.destination is None:
+            return None
+        self.received += len(raw_data)
+        if self.max_size and self.received > self.max_size:
+            self.reject(f"Upload too large (maximum {self.max_size} bytes)", 413)
+
+        if len(self.header) < HEADER_SIZE:
+            self.header += raw_data[:HEADER_SIZE - len(self.header)]
+            # Un paquet ZIP n'est identifié qu'une fois son répertoire central reçu
+            if len(self.header) == HEADER_SIZE:
+                detected = sniff_header(self.header)
+                if detected != "zip":
+                    self.check_format(detected)
+
+        started = time.perf_counter()
+        self.destination.write(raw_data)
+        self.digest.update(raw_data)
+        self.write_time += time.perf_counter() - started
+        return None
+
+    def file_complete(self, file_size):
+        if self.destination is None or self.destination.closed:
+            return None
+        self.destination.close()
+        if self.source_format is None:
+            detected = sniff_header(self.header)
+            self.check_format(sniff_package(self.path) if detected == "zip" else detected)
+        return StreamedUploadedFile(
+            self.storage_name, file_size, self.digest.hexdigest(), self.source_format, self.write_time
+        )
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def check_format(self, detected):
+        if self.accept_archives and detected == "zip" and self.upload_name.lower().endswith(".zip"):
+            self.source_format = "zip"
+            return
+        try:
+            self.source_format = resolve_source_format(self.upload_name, detected)
+        except FormatMismatch as e:
+            self.reject(str(e), 415)
+
+    def reject(self, message, status_code):
+        """Abandonne l'upload : le reste de la requête est lu sans être écrit."""
+        self.rejection = UploadRejected(message, status_code)
+        self.discard()
+        raise StopUpload(connection_reset=False)
+
+    def discard(self):
+        """Supprime les fichiers reçus (partiels ou complets) et le répertoire du job."""
+        if self.destination is not None:
+            self.destination.close()
+        if self.job_dir is not None:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
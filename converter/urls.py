@@ -3,6 +3,15 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.upload_file_view, name='upload_file'),
+    path('status/<uuid:conversion_token>/', views.conversion_status_view, name='conversion_status'),
     path('convert/<uuid:conversion_token>/', views.convert_file_view, name='convert_file'),  # Utilise un token UUID
     path('download/<uuid:conversion_token>/', views.download_file_view, name='download_file'),  # Utilise un token UUID
+    path('uploads/', views.upload_session_create_view, name='upload_session_create'),
+    path('uploads/<uuid:session_token>/', views.upload_session_view, name='upload_session'),
+    path('uploads/<uuid:session_token>/chunks/<int:index>/', views.upload_chunk_view, name='upload_chunk'),
+    path('uploads/<uuid:session_token>/finalize/', views.upload_session_finalize_view, name='upload_session_finalize'),
+    path('batch/', views.batch_upload_view, name='batch_upload'),
+    path('batch/<uuid:batch_token>/', views.batch_status_view, name='batch_status'),
+    path('batch/<uuid:batch_token>/download/', views.batch_download_view, name='batch_download'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
@@ -1,15 +1,22 @@
 import os
 
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils import timezone
+
+# Champs écrits à la fin d'une conversion, en une seule requête
+FINAL_FIELDS = [
+    "source_format", "target_format", "status", "error_message", "output_file", "engine", "duration", "from_cache", "input_sha256",
+    "finished_at", "last_accessed_at", "input_size", "output_size", "lane", "estimated_cost",
+]
+
 def is_file_created(file_path):
     """Vérifie si un fichier a été créé."""
     return os.path.isfile(file_path)
 
-def delete_temporary_files(directory):
-    """Supprime tous les fichiers temporaires d'un répertoire."""
-    for file in os.listdir(directory):
-        file_path = os.path.join(directory, file)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+def build_output_path(input_path, output_dir, extension):
+    """Construit le chemin de sortie d'une conversion : <output_dir>/<nom d'entrée>.<extension>."""
+    file_root, _ = os.path.splitext(os.path.basename(input_path))
+    return os.path.join(output_dir, f"{file_root}.{extension}")
 
 def normalize_format(format_name):
     """Normalise les formats de fichier pour cohérence."""
@@ -25,8 +32,31 @@ def conversion_default_exception(instance, e):
     """Gère les exceptions de conversion par défaut."""
     handle_conversion_error(instance, f"Error during conversion: {e}")
     
+def stored_size(field_file):
+    """Taille d'un fichier de la conversion, ou None s'il est absent."""
+    if not field_file:
+        return None
+    try:
+        return os.path.getsize(field_file.path)
+    except (OSError, SuspiciousFileOperation):
+        return None
+
 def handle_conversion_error(instance, error_message):
-    """Met à jour l'instance avec une erreur de conversion."""
-    instance.converted = False
+    """Marque la conversion en échec (enregistré à la fin du job, voir save_final_state)."""
+    instance.status = instance.Status.FAILED
     instance.error_message = error_message
-    instance.save()
+
+def save_final_state(instance):
+    """
+    Enregistre l'état final d'une conversion en une seule écriture, limitée aux
+    champs qu'une conversion modifie. Une conversion pas encore enregistrée
+    (tests, appels directs) est créée.
+    """
+    instance.finished_at = instance.last_accessed_at = timezone.now()
+    # Tailles utilisées pour le quota de stockage (voir retention.sweep)
+    instance.input_size = stored_size(instance.input_file)
+    instance.output_size = stored_size(instance.output_file)
+    if instance.pk is None:
+        instance.save()
+    else:
+        instance.save(update_fields=FINAL_FIELDS)
@@ -1,45 +1,146 @@
+import hashlib
+import json
+import os
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import content_disposition_header
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+
+from converter import batch as conversion_batch
+from converter import chunked_upload
+from converter import retention
 
-from converter.models import Conversion
+from converter.downloads import serve_file
+from converter.formats import image_formats
+from converter.jobs import enqueue
+from converter.metrics import render_metrics
+from converter.models import Conversion, ConversionBatch, ConversionStage, UploadSession
+from converter.scheduler import LaneFull, check_admission
+from converter.sniffing import FormatMismatch
+from converter.upload_handler import StreamingUploadHandler
 
 @csrf_exempt  # Nécessaire pour les requêtes AJAX si CSRF est activé
 def upload_file_view(request):
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        input_file = request.FILES['input_file']
-        source_format = input_file.name.split('.')[-1].lower()
+        # Les fichiers sont écrits directement dans le répertoire du job, hachés et
+        # identifiés pendant la réception (avant tout accès à request.POST)
+        handler = StreamingUploadHandler(request)
+        request.upload_handlers = [handler]
+        input_files = request.FILES.getlist('input_file')
+        if handler.rejection is not None:
+            return JsonResponse({"status": "error", "message": str(handler.rejection)},
+                                status=handler.rejection.status_code)
+        if not input_files:
+            return JsonResponse({"status": "error", "message": "Missing input file"}, status=400)
+        input_file = input_files[0]
+        source_format = input_file.source_format
         target_format = request.POST.get('target_format')
 
-        conversion = Conversion.objects.create(
-            input_file=input_file,
+        options = parse_options(request.POST.get('options'))
+        if options is None:
+            handler.discard()
+            return JsonResponse({"status": "error", "message": "Invalid conversion options"}, status=400)
+        # Réservée aux fichiers envoyés avec la requête
+        options.pop("merge", None)
+        input_sha256 = input_file.sha256
+        if len(input_files) > 1:
+            # Plusieurs images : fusionnées dans un même PDF, une page par image
+            if target_format != "pdf" or any(f.source_format not in image_formats for f in input_files):
+                handler.discard()
+                return JsonResponse({"status": "error", "message": "Only images can be merged, into a PDF"},
+                                    status=400)
+            options["merge"] = [os.path.basename(f.storage_name) for f in input_files[1:]]
+            input_sha256 = hashlib.sha256("".join(f.sha256 for f in input_files).encode("ascii")).hexdigest()
+
+        try:
+            check_admission(source_format, target_format)
+        except LaneFull as e:
+            handler.discard()
+            return lane_full_response(e)
+
+        conversion = Conversion(
+            token=handler.token,
             source_format=source_format,
-            target_format=target_format
+            target_format=target_format,
+            options=options,
+            input_sha256=input_sha256,
+        )
+        conversion.input_file.name = input_file.storage_name
+        conversion.save()
+        ConversionStage.objects.create(
+            conversion=conversion,
+            name="upload_write",
+            duration=sum(f.write_time for f in input_files),
+            bytes_in=sum(f.size for f in input_files),
+            bytes_out=sum(f.size for f in input_files),
         )
-            
+
         try:
-            conversion.convert_file()
-            if conversion.converted:
-                return JsonResponse({
-                    "status": "success",
-                    "download_url": f"/converter/download/{conversion.token}/",
-                })
-            else:
-                return JsonResponse({
-                    "status": "error",
-                    "message": conversion.error_message or "Conversion failed",
-                })
+            enqueue(conversion)
         except Exception as e:
             return JsonResponse({
                 "status": "error",
                 "message": f"Error during conversion: {e}",
             })
 
+        # La conversion est traitée par les workers : on rend la main immédiatement
+        return JsonResponse(conversion_status_payload(conversion), status=202)
+
     return render(request, 'converter/converter.html')
 
+def parse_options(raw_options):
+    """Décode les options de conversion (objet JSON), ou retourne None si elles sont invalides."""
+    if isinstance(raw_options, dict):
+        return raw_options
+    try:
+        options = json.loads(raw_options or '{}')
+    except ValueError:
+        return None
+    return options if isinstance(options, dict) else None
+
+def lane_full_response(error):
+    """Réponse HTTP 429 quand la voie de la conversion est pleine."""
+    response = JsonResponse({"status": "error", "message": str(error)}, status=429)
+    response["Retry-After"] = str(error.retry_after)
+    return response
+
+def conversion_status_payload(conversion):
+    """Construit la réponse JSON décrivant l'état d'une conversion."""
+    payload = {
+        "status": conversion.status,
+        "token": str(conversion.token),
+        "status_url": f"/converter/status/{conversion.token}/",
+    }
+    if conversion.converted:
+        payload["download_url"] = f"/converter/download/{conversion.token}/"
+    elif conversion.status == Conversion.Status.FAILED:
+        payload["message"] = conversion.error_message or "Conversion failed"
+    elif conversion.status == Conversion.Status.EXPIRED:
+        payload["message"] = "Conversion result expired"
+    return payload
+
+def conversion_status_view(request, conversion_token):
+    conversion = get_object_or_404(Conversion, token=conversion_token)
+    return JsonResponse(conversion_status_payload(conversion))
+
 def convert_file_view(request, conversion_token):
     conversion = get_object_or_404(Conversion, token=conversion_token)
-        
+
+    if conversion.is_pending:
+        return render(request, 'converter/pending.html', {
+            'status': conversion.status,
+            'status_url': f"/converter/status/{conversion.token}/",
+        })
+
+    if conversion.status == Conversion.Status.EXPIRED:
+        return render(request, 'converter/error.html', {
+            'error_message': "Conversion result expired"
+        }, status=410)
+
     if not conversion.converted:
         print(conversion.error_message)
         return render(request, 'converter/error.html', {
@@ -51,12 +152,184 @@ def convert_file_view(request, conversion_token):
     })
 
 def download_file_view(request, conversion_token):
+    conversion = get_object_or_404(Conversion, token=conversion_token)
+    if conversion.status == Conversion.Status.EXPIRED:
+        return JsonResponse({"status": "error", "message": "Conversion result expired"}, status=410)
+    if not conversion.output_file:
+        raise Http404("File not found")
     try:
-        conversion = get_object_or_404(Conversion, token=conversion_token)
-        if not conversion.output_file:
-            raise Http404("File not found")
-        file_path = conversion.output_file.path
-        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=conversion.output_file.name)
-    except Exception as e:
+        response = serve_file(request, conversion.output_file.path, os.path.basename(conversion.output_file.name))
+    except OSError as e:
         raise Http404(f"Error downloading file: {str(e)}")
+    retention.mark_downloaded(Conversion.objects.filter(pk=conversion.pk))
+    return response
+
+@csrf_exempt
+@require_POST
+def batch_upload_view(request):
+    """
+    Reçoit plusieurs fichiers (ou des archives ZIP) et un format cible : une
+    conversion par fichier, traitées en parallèle par les workers, et un seul
+    token pour suivre le lot et télécharger l'archive des résultats.
+    """
+    handler = StreamingUploadHandler(request, accept_archives=True)
+    request.upload_handlers = [handler]
+    input_files = request.FILES.getlist('input_file')
+    if handler.rejection is not None:
+        return JsonResponse({"status": "error", "message": str(handler.rejection)},
+                            status=handler.rejection.status_code)
+    if not input_files:
+        return JsonResponse({"status": "error", "message": "Missing input file"}, status=400)
+    target_format = request.POST.get('target_format')
+    if not target_format:
+        handler.discard()
+        return JsonResponse({"status": "error", "message": "Missing target format"}, status=400)
+
+    options = parse_options(request.POST.get('options'))
+    if options is None:
+        handler.discard()
+        return JsonResponse({"status": "error", "message": "Invalid conversion options"}, status=400)
+    options.pop("merge", None)
+
+    try:
+        items = conversion_batch.expand_uploads(handler, input_files)
+        if not items:
+            raise conversion_batch.BatchError("No file to convert")
+        conversion_batch.check_batch_admission(items, target_format)
+    except conversion_batch.BatchError as e:
+        handler.discard()
+        return JsonResponse({"status": "error", "message": str(e)}, status=e.status_code)
+    except LaneFull as e:
+        handler.discard()
+        return lane_full_response(e)
+
+    batch, conversions = conversion_batch.create_batch(handler.token, items, target_format, options)
+    for conversion in conversions:
+        enqueue(conversion)
+    return JsonResponse(conversion_batch.batch_status_payload(batch), status=202)
+
+def batch_status_view(request, batch_token):
+    batch = get_object_or_404(ConversionBatch, token=batch_token)
+    return JsonResponse(conversion_batch.batch_status_payload(batch))
+
+def batch_download_view(request, batch_token):
+    """
+    Archive ZIP des résultats du lot, envoyée au fil des conversions terminées :
+    le téléchargement peut commencer avant la fin du lot.
+    """
+    batch = get_object_or_404(ConversionBatch, token=batch_token)
+    conversions = batch.conversions.all()
+    if conversions.filter(status=Conversion.Status.EXPIRED).exists() and not conversions.exclude(
+        status__in=[Conversion.Status.EXPIRED, Conversion.Status.FAILED]
+    ).exists():
+        return JsonResponse({"status": "error", "message": "Batch results expired"}, status=410)
+    retention.mark_downloaded(conversions.filter(status__in=[Conversion.Status.SUCCEEDED, Conversion.Status.CACHED]))
+    response = StreamingHttpResponse(conversion_batch.stream_batch_archive(batch), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition_header(True, f"batch_{batch.token}.zip")
+    return response
+
+def metrics_view(request):
+    """
+    Expose les métriques de conversion au format texte de Prometheus, au
+    collecteur muni du jeton CONVERTER_METRICS_TOKEN (en-tête
+    "Authorization: Bearer <jeton>") ou à un administrateur connecté.
+    """
+    token = getattr(settings, "CONVERTER_METRICS_TOKEN", None)
+    authorized = bool(token) and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        return HttpResponse("Forbidden", status=403, content_type="text/plain")
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def upload_session_payload(session):
+    """Construit la réponse JSON décrivant l'état d'une session d'upload."""
+    received = chunked_upload.received_chunks(session)
+    received_set = set(received)
+    return {
+        "token": str(session.token),
+        "file_name": os.path.basename(session.file_name),
+        "total_size": session.total_size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received_chunks": received,
+        "missing_chunks": [index for index in range(session.total_chunks) if index not in received_set],
+        "finalized": session.finalized,
+        "expires_at": (session.updated_at + chunked_upload.get_session_ttl()).isoformat(),
+        "chunk_url": f"/converter/uploads/{session.token}/chunks/{{index}}/",
+        "finalize_url": f"/converter/uploads/{session.token}/finalize/",
+    }
+
+@csrf_exempt
+@require_POST
+def upload_session_create_view(request):
+    """Ouvre une session d'upload par morceaux."""
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid JSON body"}, status=400)
+
+    options = parse_options(data.get("options"))
+    if options is None:
+        return JsonResponse({"status": "error", "message": "Invalid conversion options"}, status=400)
+
+    try:
+        session = chunked_upload.create_session(
+            file_name=data.get("file_name"),
+            total_size=data.get("total_size") or 0,
+            target_format=data.get("target_format"),
+            options=options,
+            chunk_size=data.get("chunk_size"),
+        )
+    except (chunked_upload.ChunkError, ValueError, TypeError) as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+
+    return JsonResponse(upload_session_payload(session), status=201)
+
+def upload_session_view(request, session_token):
+    """Indique les morceaux déjà reçus pour permettre la reprise."""
+    session = get_object_or_404(UploadSession, token=session_token)
+    if chunked_upload.is_expired(session):
+        return JsonResponse({"status": "error", "message": "Upload session expired"}, status=410)
+    return JsonResponse(upload_session_payload(session))
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+def upload_chunk_view(request, session_token, index):
+    """Reçoit un morceau et l'écrit directement à sa position dans le fichier du job."""
+    session = get_object_or_404(UploadSession, token=session_token)
+    try:
+        sha256 = chunked_upload.write_chunk(session, index, request, checksum=request.headers.get("X-Chunk-SHA256"))
+    except chunked_upload.SessionExpired as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=410)
+    except chunked_upload.ChunkError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=400)
+    return JsonResponse({"index": index, "sha256": sha256})
+
+@csrf_exempt
+@require_POST
+def upload_session_finalize_view(request, session_token):
+    """Assemble la session en une conversion et la place dans la file."""
+    session = get_object_or_404(UploadSession, token=session_token)
+    if session.finalized:
+        conversion = get_object_or_404(Conversion, token=session.token)
+        return JsonResponse(conversion_status_payload(conversion), status=202)
+    if chunked_upload.is_expired(session):
+        return JsonResponse({"status": "error", "message": "Upload session expired"}, status=410)
+
+    try:
+        chunked_upload.check_complete(session)
+        source_format = chunked_upload.session_source_format(session)
+        check_admission(source_format, session.target_format)
+        conversion = chunked_upload.finalize_session(session, source_format)
+    except chunked_upload.SessionFinalized:
+        # Finalisée entre-temps par une requête concurrente, qui a placé la conversion en file
+        conversion = get_object_or_404(Conversion, token=session.token)
+        return JsonResponse(conversion_status_payload(conversion), status=202)
+    except chunked_upload.ChunkError as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=409)
+    except FormatMismatch as e:
+        return JsonResponse({"status": "error", "message": str(e)}, status=415)
+    except LaneFull as e:
+        return lane_full_response(e)
 
+    enqueue(conversion)
+    return JsonResponse(conversion_status_payload(conversion), status=202)
@@ -79,6 +79,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Plusieurs workers écrivent en même temps : journal WAL (les lectures ne
+        # bloquent plus les écritures), attente du verrou au lieu d'une erreur
+        # "database is locked", et transactions prenant le verrou d'écriture dès
+        # le début pour éviter les échecs de promotion de verrou.
+        'OPTIONS': {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            'timeout': 20,  # secondes (busy timeout)
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -126,3 +135,113 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Conversion job queue
+# Les conversions sont placées dans une file (table Conversion) et traitées par
+# un pool de workers lancé avec `python manage.py run_workers`.
+
+CONVERTER_WORKERS = int(os.environ.get('CONVERTER_WORKERS', 0)) or None  # None = nombre de coeurs
+CONVERTER_POLL_INTERVAL = 1.0  # secondes
+CONVERTER_QUEUE_EAGER = False  # True = conversion immédiate dans la requête (sans worker)
+# Moteurs importés au démarrage des workers ("all" ou liste, ex. ["image", "pdf_images"]).
+# Les processus web chargent les moteurs à la demande.
+CONVERTER_PREWARM_ENGINES = []
+
+# LibreOffice engine pool
+# Instances headless persistantes pilotées via UNO (nécessite pyuno). Avec une
+# taille de 0, ou sans pyuno, chaque conversion lance un `soffice` ponctuel.
+
+CONVERTER_LIBREOFFICE_BINARY = 'soffice'
+CONVERTER_LIBREOFFICE_POOL_SIZE = int(os.environ.get('CONVERTER_LIBREOFFICE_POOL_SIZE', 1))  # instances par processus
+CONVERTER_LIBREOFFICE_MAX_JOBS = 200  # recyclage d'une instance après N conversions
+CONVERTER_LIBREOFFICE_START_TIMEOUT = 30  # secondes
+CONVERTER_LIBREOFFICE_ACQUIRE_TIMEOUT = 60  # secondes
+CONVERTER_LIBREOFFICE_JOB_TIMEOUT = 300  # secondes ; au-delà, l'instance est tuée puis redémarrée
+
+# Conversion result cache
+# Résultats indexés par (SHA-256 de l'entrée, formats, options, version du convertisseur).
+
+CONVERTER_CACHE_ENABLED = True
+CONVERTER_CACHE_DIR = os.path.join(MEDIA_ROOT, 'cache')
+CONVERTER_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1 Go, éviction LRU au-delà
+CONVERTER_CACHE_VERSION = 1  # à incrémenter pour invalider tout le cache
+
+# PDF rasterization
+# Les pages sont rendues par lots (first_page/last_page) répartis sur plusieurs processus.
+
+CONVERTER_PDF_DPI = 200
+CONVERTER_PDF_BATCH_SIZE = 8  # pages par lot
+CONVERTER_PDF_RENDER_WORKERS = None  # None = nombre de coeurs / concurrence de la voie pdf-raster
+CONVERTER_SLIDE_THUMBNAIL_DPI = 48  # présentations : résolution des miniatures (option "thumbnails")
+
+# Image encoding
+# Préréglage des encodeurs quand la conversion n'en précise pas (option "preset") :
+# "fast" (compression minimale), "small" (fichiers les plus petits) ou "balanced"
+# (réglages par défaut de Pillow).
+
+CONVERTER_IMAGE_PRESET = "balanced"
+
+# Word documents
+# Rendu des DOCX en PDF quand la conversion n'en précise pas (option "renderer") :
+# "native" (python-docx, sans LibreOffice), "libreoffice", ou "auto" (natif sauf
+# pour les documents qu'il ne sait pas reproduire : suivi des modifications,
+# objets flottants, notes...).
+
+CONVERTER_DOCX_RENDERER = "auto"
+
+# Conversion scheduler
+# Une voie par moteur, chacune avec sa limite de concurrence (workers occupés),
+# de profondeur de file (au-delà, l'upload est refusé avec un HTTP 429) et ses
+# workers réservés (jamais occupés par les autres voies : par défaut, un worker
+# pour les images). Les valeurs par défaut sont dans converter.scheduler.DEFAULT_LANES.
+
+CONVERTER_LANES = {
+    # 'libreoffice': {'concurrency': 2, 'max_queue': 50, 'reserved': 0},
+}
+
+# Chunked uploads
+# Les gros fichiers sont envoyés par morceaux numérotés, écrits directement dans
+# le répertoire du job. Les sessions inactives expirent
+# (`python manage.py expire_upload_sessions`).
+
+CONVERTER_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 Mo
+CONVERTER_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024  # 64 Mo
+CONVERTER_UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024  # 4 Go (uploads directs et par morceaux)
+CONVERTER_UPLOAD_SESSION_TTL = 24 * 3600  # secondes sans activité
+
+# Batch conversions
+# Plusieurs fichiers (ou archives ZIP) envoyés en une requête sur /converter/batch/ :
+# une conversion par fichier, une archive des résultats envoyée au fil de l'eau.
+
+CONVERTER_BATCH_MAX_FILES = 1000  # archives décompressées comprises
+CONVERTER_BATCH_POLL_INTERVAL = 0.5  # secondes
+CONVERTER_BATCH_WAIT_TIMEOUT = 3600  # attente maximale des conversions pendant le téléchargement
+
+# Retention
+# Les fichiers des conversions terminées sont supprimés par `python manage.py sweep_storage`,
+# ou périodiquement par le superviseur de `run_workers` ; la conversion passe alors
+# à l'état "expired" et son téléchargement renvoie un HTTP 410.
+
+CONVERTER_INPUT_TTL = 24 * 3600  # secondes après la fin de la conversion
+CONVERTER_OUTPUT_TTL = 7 * 24 * 3600  # secondes après la fin de la conversion
+CONVERTER_STORAGE_QUOTA = 20 * 1024 * 1024 * 1024  # 20 Go, éviction LRU (dernier téléchargement) au-delà ; None = sans limite
+CONVERTER_STORAGE_SWEEP_INTERVAL = 600  # secondes ; 0 = pas de balayage par les workers
+
+# Downloads
+# 'python' : servi par Django (plages d'octets et requêtes conditionnelles gérées).
+# 'x-accel-redirect' : délégué à nginx, avec une location interne pointant sur MEDIA_ROOT :
+#     location /protected-media/ { internal; alias /chemin/vers/media/; }
+# 'x-sendfile' : délégué à Apache (mod_xsendfile) ou lighttpd.
+
+CONVERTER_DOWNLOAD_MODE = os.environ.get('CONVERTER_DOWNLOAD_MODE', 'python')
+CONVERTER_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+
+# Metrics
+# L'endpoint /converter/metrics/ n'est servi qu'aux administrateurs connectés et
+# au collecteur Prometheus envoyant "Authorization: Bearer <CONVERTER_METRICS_TOKEN>".
+
+CONVERTER_METRICS_TOKEN = os.environ.get('CONVERTER_METRICS_TOKEN')
+
+# Table conversions
+CONVERTER_TABLE_CHUNK_ROWS = 50000  # lignes lues et écrites à la fois